@@ -1,16 +1,176 @@
-import requests
 from typing import Any, Text, Dict, List
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import UserUtteranceReverted, SlotSet, FollowupAction
+import asyncio
 import re
-from datetime import datetime
 import os
 from dotenv import load_dotenv
 
+from actions import metrics, movies, tmdb
+from actions.allocator import get_allocator
+from actions.bookings import Booking, get_booking_writer
+from actions.catalogue import get_catalogue
+from actions.matcher import KeywordMatcher
+from actions.movies import get_movie_index
+from actions.recommender import get_recommender
+from actions.schedule import get_schedule
+from actions.seats import SeatsUnavailable, get_inventory
+from actions.timeparse import format_minutes, parse_clock, parse_time_expression, resolve as resolve_time
+
 # Load environment variables from .env file
 load_dotenv()
 
+NUMBER_PATTERN = re.compile(r"\b(\d+)\b")
+
+def _showtime_minutes(showtime):
+    """Minutes since midnight for a `showtime` slot value, or None."""
+    try:
+        return parse_clock(showtime) if showtime else None
+    except ValueError:
+        return None
+
+
+def _find_screening(tracker: Tracker, location: Text, cinema_letter: Text):
+    """The screening matching the movie/showtime slots at the chosen cinema."""
+    movie = tracker.get_slot("movie")
+    start = _showtime_minutes(tracker.get_slot("showtime"))
+    if not movie or start is None:
+        return None
+    screenings = get_schedule().next_screenings(movie, location, after=start, limit=1, cinema=cinema_letter)
+    return screenings[0] if screenings and screenings[0].start == start else None
+
+
+def _hold_seats(dispatcher: CollectingDispatcher, tracker: Tracker, screening_id: Text, seat_numbers: List[Text]):
+    """Hold the seats and return the slot events, or None if they can't be held."""
+    hall = get_catalogue().hall
+    indexes = [hall.index(code) for code in seat_numbers]
+    unknown = [code for code, index in zip(seat_numbers, indexes) if index is None]
+    if unknown:
+        dispatcher.utter_message(
+            text=f"{', '.join(unknown)} {'is not a seat' if len(unknown) == 1 else 'are not seats'} in this hall. "
+                 f"Rows go from {hall.rows[0]} to {hall.rows[-1]} with seats 1 to {hall.seats_per_row}."
+        )
+        return None
+
+    inventory = get_inventory(hall.size)
+    # Let go of seats held by an earlier attempt before trying again
+    previous_hold = tracker.get_slot("seat_hold")
+    if previous_hold:
+        inventory.release(previous_hold)
+    try:
+        hold_id = inventory.hold(screening_id, indexes)
+    except SeatsUnavailable as e:
+        taken = ", ".join(hall.code(seat) for seat in e.seats)
+        dispatcher.utter_message(
+            text=f"Sorry, {taken} {'is' if len(e.seats) == 1 else 'are'} already taken. Please choose other seats."
+        )
+        return None
+    return [SlotSet("seat_hold", hold_id)]
+
+
+def _menu_query(text: Text) -> Text:
+    """The words of a booking request that can narrow down the movie menu."""
+    return " ".join(word for word in movies.tokens(text) if word not in MENU_FILLER)
+
+
+def _liked_movie(text: Text):
+    """The movie in "something like Zodiac" or "similar to The Matrix", if any."""
+    match = LIKE_PATTERN.search(text)
+    if not match:
+        return None
+    phrase = match.group(1)
+    found = get_movie_index().search(phrase, limit=1)
+    # Only a title or alias counts; "like a crime movie" is a mood, not a movie
+    if found and set(movies.tokens(" ".join((found[0].title,) + found[0].aliases))) & set(movies.tokens(phrase)):
+        return found[0]
+    return None
+
+
+def _menu_example(titles: List[Text], first_number: int) -> Text:
+    return "e.g., " + ", ".join(f"{first_number + i} for {title}" for i, title in enumerate(titles[:2]))
+
+
+async def _show_movie_menu(dispatcher: CollectingDispatcher, query: Text, page: movies.MoviePage):
+    """Send one page of the movie menu and remember it in the `movie_menu` slot."""
+    # Overviews and posters come from TMDB when it knows the movie; all
+    # searches go out at once over the shared connection pool
+    results = await tmdb.get_client().search_movies([movie.title for movie in page.movies])
+    first_number = page.page * page.page_size + 1
+
+    for number, (movie, movie_info) in enumerate(zip(page.movies, results), start=first_number):
+        # A search can return a different movie with a similar name; keep
+        # our own description and poster unless the hit is really this one
+        if not movie_info or not movie.matches(movie_info):
+            movie_info = {}
+        movie_description = movie_info.get("overview") or movie.overview
+
+        # Use custom poster if available, otherwise fetch from TMDB
+        movie_poster = movie.poster or (
+            f"https://image.tmdb.org/t/p/w500{movie_info['poster_path']}" if movie_info.get("poster_path") else None
+        )
+
+        # Group title and description together
+        dispatcher.utter_message(text=f"{number}. {movie.title}\nDescription: {movie_description}")
+
+        # Send poster image
+        if movie_poster:
+            dispatcher.utter_message(image=movie_poster)
+
+    titles = [movie.title for movie in page.movies]
+    # Send a final prompt for user choice
+    prompt = f"Please reply with the number of your choice ({_menu_example(titles, first_number)})."
+    if page.has_more:
+        prompt += " Say \"more\" to see more movies."
+    dispatcher.utter_message(text=prompt)
+
+    return [SlotSet("movie_menu", {"query": query, "page": page.page, "titles": titles, "first_number": first_number})]
+
+
+# Keyword vocabularies for the free-text slot actions, compiled once
+LANGUAGE_MATCHER = KeywordMatcher({
+    "english": "english", "eng": "english",
+    "japanese": "japanese", "japan": "japanese", "jp": "japanese",
+    "chinese": "chinese", "china": "chinese", "mandarin": "chinese", "cn": "chinese", "chi": "chinese",
+})
+
+BOOKING_MATCHER = KeywordMatcher(
+    (keyword, "booking") for keyword in [
+        "movie", "movies", "book", "booking", "booked", "ticket", "tickets",
+        "film", "films", "show", "shows", "showing", "showtime", "showtimes",
+    ]
+)
+
+# Words of a booking request that say nothing about which movie
+MENU_FILLER = frozenset(BOOKING_MATCHER.labels) | movies.STOPWORDS | {
+    "i", "id", "im", "me", "we", "want", "would", "like", "love", "to", "see", "watch", "some", "something",
+    "any", "anything", "what", "whats", "can", "could", "you", "please", "now", "on", "today", "tonight",
+    "cinema", "cinemas", "playing", "lets", "go", "recommend", "suggest", "suggestions", "good", "new",
+    "more", "next", "other", "others", "one", "take", "ill", "choose", "select", "pick",
+}
+
+LIKE_PATTERN = re.compile(r"\b(?:like|similar to)\s+(.+)", re.IGNORECASE)
+
+MORE_PATTERN = re.compile(r"\b(?:more|next|others?)\b")
+
+SEAT_TYPE_MATCHER = KeywordMatcher({
+    "vip": "vip", "v.i.p": "vip",
+    "standard": "standard", "regular": "standard", "normal": "standard",
+    "couple": "couple", "couples": "couple", "couple seat": "couple",
+})
+
+# Replies that take the proposed best-available seats. Only "best" phrases
+# skip the proposal step; plain agreement just accepts a proposal shown.
+BEST_SEATS_MATCHER = KeywordMatcher(
+    [(keyword, "best") for keyword in ["best", "best seats", "best available", "recommended", "anywhere"]]
+    + [(keyword, "accept") for keyword in ["yes", "ok", "okay", "sure", "fine", "those", "take them"]]
+)
+
+PAYMENT_CHANNEL_MATCHER = KeywordMatcher({
+    "credit": "online", "card": "online", "online": "online",
+    "cash": "offline", "offline": "offline",
+})
+
 class ActionAskLanguage(Action):
     def name(self) -> Text:
         return "action_ask_language"
@@ -56,13 +216,14 @@ class ActionSetLanguage(Action):
         return "action_set_language"
 
     def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain):
-        selected_language = tracker.latest_message['text'].lower()
+        match = LANGUAGE_MATCHER.first(tracker.latest_message['text'])
+        selected_language = match.label if match else None
 
-        if "english" in selected_language or "eng" in selected_language:
+        if selected_language == "english":
             dispatcher.utter_message(response="utter_english_selected")
-        elif "japanese" in selected_language or "jp" in selected_language:
+        elif selected_language == "japanese":
             dispatcher.utter_message(response="utter_japanese_selected")
-        elif "chinese" in selected_language or "cn" in selected_language or 'chi' in selected_language:
+        elif selected_language == "chinese":
             dispatcher.utter_message(response="utter_chinese_selected")
         else:
             dispatcher.utter_message(text="Sorry, I didn't understand that.")
@@ -76,7 +237,7 @@ class ActionSetLanguage(Action):
                 text="I'm here to help with any inquiries about our Athena bot service! 😊")
             return [UserUtteranceReverted()]
 
-        return []
+        return [SlotSet("language", selected_language)]
 
 
 class ActionDetectBookingKeywords(Action):
@@ -84,11 +245,10 @@ class ActionDetectBookingKeywords(Action):
         return "action_detect_booking_keywords"
 
     def run(self, dispatcher, tracker, domain):
-        user_message = tracker.latest_message.get("text", "").lower()
+        user_message = tracker.latest_message.get("text", "")
 
-        # Define keywords to look for
-        keywords = ["movie", "book", "ticket", "film", "show"]
-        detected_keywords = [word for word in keywords if word in user_message]
+        # Look for booking keywords
+        detected_keywords = BOOKING_MATCHER.find_all(user_message)
 
         # Respond if keywords are found
         if detected_keywords:
@@ -105,15 +265,49 @@ class ActionDetectBookingKeywords(Action):
             return [UserUtteranceReverted()]
 
 
+def _recommend(user_input: Text, liked, user_language):
+    """Up to three recommendations, or [] when the recommender is unavailable."""
+    recommender = get_recommender()
+    if recommender is None:
+        return []
+    if liked:
+        return recommender.similar_to(liked, 3, user_language)
+    return recommender.for_text(_menu_query(user_input), 3, user_language)
+
+
 class ActionRecommendMovies(Action):
     def name(self):
         return "action_recommend_movies"
     
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         # Get the user's preferred language
-        user_language = tracker.get_slot("language")
-
-        dispatcher.utter_message(text="Here are some popular English movies:\n1. The Shawshank Redemption\n2. The Dark Knight\n3. Inception")
+        user_language = (tracker.get_slot("language") or "").lower() or None
+        user_input = tracker.latest_message.get("text", "")
+
+        index = get_movie_index()
+        liked = _liked_movie(user_input)
+        # The first call loads the spaCy model, and embedding the query is
+        # CPU work too, so keep both off the event loop
+        loop = asyncio.get_running_loop()
+        picks = await loop.run_in_executor(None, _recommend, user_input, liked, user_language)
+
+        if picks and liked:
+            intro = f"If you liked {liked.title}, you might enjoy:"
+        elif picks:
+            intro = "Here are some movies you might like:"
+        else:
+            # Nothing to go on (or no model): the catalogue's most popular ones
+            picks = [movie for movie in index.movies if movie.language == user_language][:3]
+            language_name = f"{user_language.capitalize()} " if picks else ""
+            picks = picks or list(index.movies[:3])
+            intro = f"Here are some popular {language_name}movies:"
+
+        now_showing = get_catalogue().showtimes_by_movie
+        lines = [
+            f"{number}. {movie.title}{' (in cinemas now)' if movie.title in now_showing else ''}"
+            for number, movie in enumerate(picks, start=1)
+        ]
+        dispatcher.utter_message(text="\n".join([intro] + lines))
 
         dispatcher.utter_message(text="The movies that are currently in cinemas are:")
         return [FollowupAction("action_fetch_movies")]
@@ -122,63 +316,26 @@ class ActionFetchMovies(Action):
     def name(self):
         return "action_fetch_movies"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain):
-        import requests
-
-        api_key = os.getenv("TMDB_API_KEY")
-        base_url = "https://api.themoviedb.org/3"
-
-        # Define the movies to fetch
-        movies_to_fetch = ["Zodiac", "Constantine"]
-
-        # Custom poster URLs
-        custom_posters = {
-            "Zodiac": "https://i.pinimg.com/736x/08/8c/43/088c43d5a8e9d47d2ea03719062699cf.jpg",
-            "Constantine": "https://media.posterlounge.com/img/products/760000/759054/759054_poster.jpg"
-        }
-
-        movie_details = []
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain):
+        now_showing = list(get_catalogue().showtimes_by_movie)
+        index = get_movie_index()
 
-        for movie in movies_to_fetch:
-            search_url = f"{base_url}/search/movie?api_key={api_key}&query={movie}"
-            response = requests.get(search_url)
-            results = response.json().get('results', [])
+        # "Any thrillers with Keanu?" narrows the menu; a plain booking
+        # request, or one for recommendations, lists everything showing
+        intent = (tracker.latest_message.get("intent") or {}).get("name")
+        query = _menu_query(tracker.latest_message.get("text", "")) if intent != "ask_for_suggestions" else ""
+        page = index.page(query, within=now_showing) if query else None
+        if not page or not page.total:
+            query = ""
+            page = index.page(None, within=now_showing)
 
-            if results:
-                movie_info = results[0]
-                movie_title = movie_info['title']
-                movie_description = movie_info['overview']
-
-                # Use custom poster if available, otherwise fetch from TMDB
-                movie_poster = custom_posters.get(
-                    movie_title,
-                    f"https://image.tmdb.org/t/p/w500{movie_info['poster_path']}" if movie_info.get('poster_path') else None
-                )
-
-                movie_details.append(
-                    (movie_title, movie_description, movie_poster))
-
-        if movie_details:
-            # Send details for each movie
-            for index, (title, description, poster) in enumerate(movie_details, start=1):
-                # Group title and description together
-                movie_message = f"{index}. {title}\nDescription: {description}"
-                dispatcher.utter_message(text=movie_message)
-
-                # Send poster image
-                if poster:
-                    dispatcher.utter_message(image=poster)
-
-            # Send a final prompt for user choice
-            dispatcher.utter_message(
-                text="Please reply with the number of your choice (e.g., 1 for Zodiac, 2 for Constantine)."
-            )
-        else:
+        if not page.movies:
             dispatcher.utter_message(
                 text="Sorry, I couldn't fetch the movie details."
             )
+            return []
 
-        return []
+        return await _show_movie_menu(dispatcher, query, page)
 
 class ActionSendMovieTemplate(Action):
     def name(self):
@@ -200,23 +357,23 @@ class ActionSetMovie(Action):
     def name(self):
         return "action_set_movie"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain):
-        # Movie mapping
-        movie_mapping = {
-            "1": "Zodiac",
-            "2": "Constantine"
-        }
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain):
+        now_showing = list(get_catalogue().showtimes_by_movie)
+        index = get_movie_index()
+
+        # Choices are resolved against the menu page the user was last shown
+        menu = tracker.get_slot("movie_menu") or {}
+        titles = menu.get("titles") or [movie.title for movie in index.page(None, within=now_showing).movies]
+        first_number = menu.get("first_number", 1)
 
         # Get user input
         user_input = tracker.latest_message.get("text", "").lower()
 
-        # Try to match a number first
-        import re
-        match = re.search(r"\b(1|2)\b", user_input)  # Matches "1" or "2"
+        match = NUMBER_PATTERN.search(user_input)
 
         if match:
-            movie_number = match.group(1)  # Extract the matched number
-            selected_movie = movie_mapping.get(movie_number)
+            choice = int(match.group(1)) - first_number
+            selected_movie = titles[choice] if 0 <= choice < len(titles) else None
 
             if selected_movie:
                 # If valid movie, confirm and set the slot
@@ -233,16 +390,37 @@ class ActionSetMovie(Action):
                 )
                 return [UserUtteranceReverted()]
         else:
-            # If no number is matched, search for the movie name
-            for movie_number, movie_name in movie_mapping.items():
-                if movie_name.lower() in user_input:
-                    dispatcher.utter_message(
-                        text=f"You have selected {movie_name}."
-                    )
-                    dispatcher.utter_message(
-                        text="Please select the desired time for the show."
-                    )
-                    return [SlotSet("movie", movie_name), FollowupAction("action_fetch_showtimes")]
+            # Otherwise search for the movie name, on the page shown first
+            query = _menu_query(user_input)
+            found = query and (
+                index.search(query, within=titles, limit=1) or index.search(query, within=now_showing, limit=1)
+            )
+            if found:
+                movie_name = found[0].title
+                dispatcher.utter_message(
+                    text=f"You have selected {movie_name}."
+                )
+                dispatcher.utter_message(
+                    text="Please select the desired time for the show."
+                )
+                return [SlotSet("movie", movie_name), FollowupAction("action_fetch_showtimes")]
+
+            if MORE_PATTERN.search(user_input):
+                page = index.page(menu.get("query") or None, menu.get("page", 0) + 1, within=now_showing)
+                if not page.movies:
+                    dispatcher.utter_message(text="That's all the movies showing right now. Here they are again:")
+                    page = index.page(menu.get("query") or None, 0, within=now_showing)
+                return await _show_movie_menu(dispatcher, menu.get("query", ""), page)
+
+            elsewhere = query and index.search(query, limit=1)
+            if elsewhere:
+                dispatcher.utter_message(
+                    text=f"Sorry, {elsewhere[0].title} isn't showing in our cinemas at the moment."
+                )
+                dispatcher.utter_message(
+                    text=f"Please reply with the number or name of one of the movies above ({_menu_example(titles, first_number)})."
+                )
+                return [UserUtteranceReverted()]
 
             # If neither number nor movie name is found
             dispatcher.utter_message(text="Sorry, I didn't understand that.")
@@ -253,7 +431,7 @@ class ActionSetMovie(Action):
                 text="Could you please provide more details or clarify what you meant?"
             )
             dispatcher.utter_message(
-                text="Please reply with the number or name of the movie you'd like to select (e.g., 1 for Zodiac, 2 for Constantine)."
+                text=f"Please reply with the number or name of the movie you'd like to select ({_menu_example(titles, first_number)})."
             )
             dispatcher.utter_message(
                 text="I'm here to help with any inquiries about our Athena bot service! 😊"
@@ -266,22 +444,17 @@ class ActionFetchShowtimes(Action):
         return "action_fetch_showtimes"
 
     def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain):
-        # Sample showtimes for demonstration purposes
-        showtime_mappings = {
-            "Zodiac": ["10:00 AM", "01:00 PM", "04:00 PM", "07:00 PM"],
-            "Constantine": ["11:00 AM", "02:00 PM", "05:00 PM", "08:00 PM"],
-        }
-
         selected_movie = tracker.get_slot("movie")
 
-        if not selected_movie or selected_movie not in showtime_mappings:
+        # Fetch showtimes for the selected movie
+        showtimes = get_catalogue().showtimes(selected_movie)
+
+        if not showtimes:
             dispatcher.utter_message(
                 text="I couldn't find showtimes for the selected movie. Could you please confirm the movie first?"
             )
             return []
 
-        # Fetch showtimes for the selected movie
-        showtimes = showtime_mappings[selected_movie]
         showtimes_list = "\n".join(
             [f"{i+1}: {time}" for i, time in enumerate(showtimes)])
 
@@ -300,76 +473,38 @@ class ActionSetShowtime(Action):
     def run(
         self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]
     ) -> List[Dict[Text, Any]]:
-        import re
-        from datetime import datetime
-
-        # Sample showtimes for demonstration purposes
-        showtime_mappings = {
-            "Zodiac": ["10:00 AM", "01:00 PM", "04:00 PM", "07:00 PM"],
-            "Constantine": ["11:00 AM", "02:00 PM", "05:00 PM", "08:00 PM"],
-        }
-
         selected_movie = tracker.get_slot("movie")
         user_input = tracker.latest_message.get("text", "").strip()
 
-        if not selected_movie or selected_movie not in showtime_mappings:
+        catalogue = get_catalogue()
+        showtimes = catalogue.showtimes(selected_movie)
+
+        if not showtimes:
             dispatcher.utter_message(
                 text="I couldn't find the movie you selected. Could you confirm the movie first?"
             )
             return [SlotSet("showtime", None)]
 
-        showtimes = showtime_mappings[selected_movie]
-
-        # Normalize available showtimes for consistent comparison
-        normalized_showtimes = [
-            datetime.strptime(st, "%I:%M %p").strftime("%I:%M %p") for st in showtimes
-        ]
-
-        # Regex pattern to match times, including "AM/PM" variations
-        time_pattern = r"\b(\d{1,2}(:\d{2})?\s?(?:AM|PM|A\.M\.|P\.M\.|A\.M|P\.M))\b"
-
-        # Check for time-based input first (explicit "AM/PM" or its variations)
-        match_time = re.search(time_pattern, user_input, re.IGNORECASE)
-        if match_time:
-            input_time = match_time.group(1).strip().upper().replace(".", "")  # Normalize to "AM"/"PM"
-
-            try:
-                # Normalize the user input time
-                parsed_time = (
-                    datetime.strptime(input_time, "%I:%M %p")
-                    if ":" in input_time
-                    else datetime.strptime(input_time, "%I %p")
-                )
-                normalized_input_time = parsed_time.strftime("%I:%M %p")
+        # Time expressions ("7 pm", "17:00", "5pm-ish", "evening", "the earliest one")
+        # first, resolved by bisecting the movie's sorted showtime minutes
+        time_query = parse_time_expression(user_input)
+        if time_query:
+            choice = resolve_time(catalogue.showtime_minutes[selected_movie], time_query)
+        else:
+            # Otherwise fall back to numeric choice
+            match_numeric = NUMBER_PATTERN.search(user_input)
+            choice = int(match_numeric.group(1)) - 1 if match_numeric else None  # Convert to zero-based index
 
-                # Compare against normalized showtimes
-                if normalized_input_time in normalized_showtimes:
-                    dispatcher.utter_message(
-                        text=f"You have selected {normalized_input_time} for {selected_movie}."
-                    )
-                    dispatcher.utter_message(
-                        text="Please select the location to watch the movie."
-                    )
-                    dispatcher.utter_message(response="utter_ask_location")
-                    return [SlotSet("showtime", normalized_input_time)]
-
-            except ValueError:
-                pass  # Continue if time parsing fails
-
-        # If no valid time-based input, fall back to numeric choice
-        match_numeric = re.search(r"\b(\d+)\b", user_input)
-        if match_numeric:
-            choice = int(match_numeric.group(1)) - 1  # Convert to zero-based index
-            if 0 <= choice < len(normalized_showtimes):
-                selected_showtime = normalized_showtimes[choice]
-                dispatcher.utter_message(
-                    text=f"You have selected {selected_showtime} for {selected_movie}."
-                )
-                dispatcher.utter_message(
-                    text="Please select the location to watch the movie."
-                )
-                dispatcher.utter_message(response="utter_ask_location")
-                return [SlotSet("showtime", selected_showtime)]
+        if choice is not None and 0 <= choice < len(showtimes):
+            selected_showtime = showtimes[choice]
+            dispatcher.utter_message(
+                text=f"You have selected {selected_showtime} for {selected_movie}."
+            )
+            dispatcher.utter_message(
+                text="Please select the location to watch the movie."
+            )
+            dispatcher.utter_message(response="utter_ask_location")
+            return [SlotSet("showtime", selected_showtime)]
 
         # If no valid input is found, prompt the user again
         dispatcher.utter_message(
@@ -385,24 +520,14 @@ class ActionSetLocation(Action):
         # Extract the latest user input
         user_input = tracker.latest_message.get("text", "").lower()
         
-        # List of possible locations
-        locations = ["hong kong", "singapore", "malaysia"]
-        
-        # Acronym mappings
-        acronym_mappings = {
-            "hk": "hong kong",
-            "sg": "singapore",
-            "my": "malaysia"
-        }
-        
-        # Normalize user input using acronyms if present
-        for acronym, full_name in acronym_mappings.items():
-            if acronym in user_input:
-                location = full_name
-                break
-        else:
-            # Search for any location in the user input
-            location = next((loc for loc in locations if loc in user_input), None)
+        # Full location names win over acronyms such as "my"
+        catalogue = get_catalogue()
+        matches = catalogue.location_matcher.find_all(user_input)
+        match = next((m for m in matches if m.keyword == m.label), matches[0] if matches else None)
+        if not match:
+            # Typos ("singapor") get a second chance through the trigram index
+            match = catalogue.location_index.best(user_input)
+        location = match.label if match else None
         
         if location:
             dispatcher.utter_message(
@@ -427,43 +552,17 @@ class ActionFetchCinemas(Action):
             # tracker.get_latest_entity_values("location"), None)
         user_location = tracker.get_slot("location")
 
-        # Cinema mappings
-        cinema_mappings = {
-            "hong kong": {
-                "a": "Golden Harvest G Ocean (Ocean Centre)",
-                "b": "The Sky (Olympian City)",
-                "c": "StagE (Tuen Mun Town Plaza Phase 1)"
-            },
-            "singapore": {
-                "a": "Golden Mile Tower",
-                "b": "Orchard Cinema (Cathay Cineleisure Orchard)"
-            },
-            "malaysia": {
-                "a": "GSC Mid Valley",
-                "b": "GSC Pavilion KL",
-                "c": "GSC Paradigm Mall"
-            }
-        }
-
-        # Acronym mappings
-        acronym_mappings = {
-            "hk": "hong kong",
-            "sg": "singapore",
-            "my": "malaysia"
-        }
-
         # Check if location is provided
         if not user_location:
             dispatcher.utter_message(
                 text="I couldn't detect your location. Could you please tell me where you are?")
             return []
 
-        # Normalize the location input
-        location = user_location.lower()
-        # Map acronyms to full names
-        location = acronym_mappings.get(location, location)
+        # Normalize the location input and map acronyms to full names
+        catalogue = get_catalogue()
+        location = catalogue.resolve_location(user_location)
 
-        if location not in cinema_mappings:
+        if not location:
             dispatcher.utter_message(text="Sorry, I didn't understand that.")
             dispatcher.utter_message(
                 text="It seems you tried to say something else.")
@@ -474,8 +573,29 @@ class ActionFetchCinemas(Action):
 
             return []
 
-        # Fetch cinemas for the user's location
-        cinemas = cinema_mappings[location]
+        # Fetch cinemas for the user's location, keeping only those that screen
+        # the chosen movie at the chosen time once both are known
+        cinemas = catalogue.cinemas(location)
+        selected_movie = tracker.get_slot("movie")
+        showtime = _showtime_minutes(tracker.get_slot("showtime"))
+        if selected_movie and showtime is not None:
+            schedule = get_schedule()
+            screenings = schedule.screenings_at(selected_movie, location, showtime)
+            if not screenings:
+                upcoming = schedule.next_screenings(selected_movie, location, after=showtime, limit=3)
+                if upcoming:
+                    upcoming_list = "\n".join(
+                        [f"- {format_minutes(s.start)} at {s.cinema_name}" for s in upcoming])
+                    dispatcher.utter_message(
+                        text=f"No cinema in {location.title()} shows {selected_movie} at {format_minutes(showtime)}. The next screenings are:\n{upcoming_list}"
+                    )
+                else:
+                    dispatcher.utter_message(
+                        text=f"There are no more screenings of {selected_movie} in {location.title()} today."
+                    )
+                return [SlotSet("location", location), SlotSet("showtime", None)]
+            cinemas = {s.cinema: s.cinema_name for s in screenings}
+
         cinema_list = "\n".join(
             [f"{key}: {name}" for key, name in cinemas.items()])
 
@@ -492,55 +612,51 @@ class ActionSetCinema(Action):
         return "action_set_cinema"
 
     def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain):
-        import re
         # Extract the user input
         user_input = tracker.latest_message.get("text", "").lower().strip()
         user_location = tracker.get_slot("location")
 
-        # Cinema mappings updated to use `a`, `b`, `c`
-        cinema_mappings = {
-            "hong kong": {
-                "a": "Golden Harvest G Ocean (Ocean Centre)",
-                "b": "The Sky (Olympian City)",
-                "c": "StagE (Tuen Mun Town Plaza Phase 1)"
-            },
-            "singapore": {
-                "a": "Golden Mile Tower",
-                "b": "Orchard Cinema (Cathay Cineleisure Orchard)"
-            },
-            "malaysia": {
-                "a": "GSC Mid Valley",
-                "b": "GSC Pavilion KL",
-                "c": "GSC Paradigm Mall"
-            }
-        }
+        catalogue = get_catalogue()
+        location = catalogue.resolve_location(user_location)
 
         # Validate the user's location
-        if not user_location or user_location.lower() not in cinema_mappings:
+        if not location:
             dispatcher.utter_message(
                 text="I couldn't determine your location. Please provide a valid location."
             )
             return [SlotSet("cinema", None)]
 
         # Fetch cinemas for the user's location
-        location_cinemas = cinema_mappings[user_location.lower()]
+        location_cinemas = catalogue.cinemas(location)
 
         # Match user input to cinema options (a, b, c)
         if user_input in location_cinemas:
             selected_cinema = location_cinemas[user_input]
+            screening = _find_screening(tracker, location, user_input)
             dispatcher.utter_message(
                 text=f"You have selected {selected_cinema} in {user_location.title()}. Enjoy your time at the cinema!"
             )
-            return [SlotSet("cinema", selected_cinema), FollowupAction("action_ask_seats_type")]
-
-        # Search for a cinema name
-        for cinema_letter, cinema_name in location_cinemas.items():
-            simplified_name = re.sub(r"\s*\(.*?\)", "", cinema_name).strip().lower()  # Remove parentheses and lowercase
-            if simplified_name in user_input:
-                dispatcher.utter_message(
-                    text=f"You have selected {cinema_name} in {user_location.title()}. Enjoy your time at the cinema!"
-                )
-                return [SlotSet("cinema", cinema_name), FollowupAction("action_ask_seats_type")]
+            return [
+                SlotSet("cinema", selected_cinema),
+                SlotSet("screening_id", screening.screening_id if screening else None),
+                FollowupAction("action_ask_seats_type"),
+            ]
+
+        # Search for a cinema name, its mall or a word only it has, allowing
+        # for typos ("pavillion", "olympain city")
+        match = catalogue.cinema_indexes[location].best(user_input)
+        if match:
+            cinema_letter = match.label
+            cinema_name = location_cinemas[cinema_letter]
+            screening = _find_screening(tracker, location, cinema_letter)
+            dispatcher.utter_message(
+                text=f"You have selected {cinema_name} in {user_location.title()}. Enjoy your time at the cinema!"
+            )
+            return [
+                SlotSet("cinema", cinema_name),
+                SlotSet("screening_id", screening.screening_id if screening else None),
+                FollowupAction("action_ask_seats_type"),
+            ]
 
         # If neither a letter nor a cinema name matches
         cinema_list = "\n".join(
@@ -560,37 +676,22 @@ class ActionAskSeatsType(Action):
         # Retrieve user's location
         user_location = tracker.get_slot("location")
 
-        # Location-based seat pricing with currencies
-        seat_prices_by_location = {
-            "malaysia": {
-                "prices": {"VIP": 50, "Standard": 30, "Couple": 80},
-                "currency": "MYR"
-            },
-            "hong kong": {
-                "prices": {"VIP": 150, "Standard": 100, "Couple": 250},
-                "currency": "HKD"
-            },
-            "singapore": {
-                "prices": {"VIP": 100, "Standard": 70, "Couple": 200},
-                "currency": "SGD"
-            }
-        }
+        catalogue = get_catalogue()
+        location = catalogue.resolve_location(user_location)
 
         # Validate user location
-        if not user_location or user_location.lower() not in seat_prices_by_location:
+        if not location:
             dispatcher.utter_message(
                 text="I couldn't determine your location for pricing. Please confirm your location first."
             )
             return []
 
         # Get seat prices and currency for the user's location
-        location_data = seat_prices_by_location[user_location.lower()]
-        location_seat_prices = location_data["prices"]
-        currency = location_data["currency"]
+        currency = catalogue.currencies[location]
 
         # Constructing the message with prices
         seat_options_with_prices = "\n".join(
-            [f"- {seat_type}: {price} {currency}" for seat_type, price in location_seat_prices.items()]
+            [f"- {seat_type}: {price} {currency}" for seat_type, price in catalogue.seat_options[location]]
         )
 
         dispatcher.utter_message(
@@ -611,50 +712,28 @@ class ActionSetSeatsType(Action):
         user_input = tracker.latest_message.get("text", "").lower()
         
         # Match for seat types in the text
-        selected_seats_type = None
-        if "vip" in user_input:
-            selected_seats_type = "vip"
-        elif "standard" in user_input:
-            selected_seats_type = "standard" 
-        elif "couple" in user_input:
-            selected_seats_type = "couple"
+        match = SEAT_TYPE_MATCHER.first(user_input)
+        selected_seats_type = match.label if match else None
         
         # Retrieve user's location
         user_location = tracker.get_slot("location")
 
-        # Location-based seat pricing with currencies
-        seat_prices_by_location = {
-            "malaysia": {
-                "prices": {"vip": 50, "standard": 30, "couple": 80},
-                "currency": "MYR"
-            },
-            "hong kong": {
-                "prices": {"vip": 150, "standard": 100, "couple": 250},
-                "currency": "HKD"
-            },
-            "singapore": {
-                "prices": {"vip": 100, "standard": 70, "couple": 200},
-                "currency": "SGD"
-            }
-        }
+        catalogue = get_catalogue()
+        location = catalogue.resolve_location(user_location)
 
         # Validate user location
-        if not user_location or user_location.lower() not in seat_prices_by_location:
+        if not location:
             dispatcher.utter_message(
                 text="I couldn't determine your location for pricing. Please confirm your location first."
             )
             return [SlotSet("seat_type", None)]
 
-        # Get seat prices and currency for the user's location
-        location_data = seat_prices_by_location[user_location.lower()]
-        location_seat_prices = location_data["prices"]
-        currency = location_data["currency"]
-
-        valid_seat_types = location_seat_prices.keys()
+        # Get seat price and currency for the user's location
+        price = catalogue.seat_price(location, selected_seats_type) if selected_seats_type else None
+        currency = catalogue.currencies[location]
 
         # Validate seat type
-        if selected_seats_type and selected_seats_type.lower() in valid_seat_types:
-            price = location_seat_prices[selected_seats_type.lower()]
+        if price is not None:
             dispatcher.utter_message(
                 text=f"You have selected the {selected_seats_type.capitalize()} section in {user_location.title()}. The price per seat is {price} {currency}."
             )
@@ -695,6 +774,18 @@ class ActionSetNumberOfSeats(Action):
         number_of_seats = int(match.group()) if match else None
 
         if number_of_seats and 1 <= number_of_seats <= 10:  # Assuming a max of 10 seats can be reserved.
+            events = [SlotSet("number_of_seats", number_of_seats)]
+            proposal = self._propose_seats(tracker, number_of_seats)
+            if proposal and "best" in BEST_SEATS_MATCHER.find_labels(user_message.lower()):
+                # "2 seats, best available": book the proposal straight away
+                hold_events = _hold_seats(dispatcher, tracker, tracker.get_slot("screening_id"), proposal)
+                if hold_events is not None:
+                    dispatcher.utter_message(
+                        text=f"I've picked the best available seats for you: {', '.join(proposal)}. Confirming your reservation now!"
+                    )
+                    return events + [SlotSet("seat_numbers", proposal), SlotSet("proposed_seats", None)] + hold_events
+                proposal = self._propose_seats(tracker, number_of_seats)
+
             if number_of_seats == 1:
                 dispatcher.utter_message(
                     text=f"You have selected {number_of_seats} seat. Please select the seat number."
@@ -704,11 +795,22 @@ class ActionSetNumberOfSeats(Action):
                     text=f"You have selected {number_of_seats} seats. Please select the seat numbers."
                 )
             
+            if proposal:
+                dispatcher.utter_message(
+                    text=f"The best available seats are {', '.join(proposal)}. "
+                         f"Reply \"best\" to take them, or tell me the seats you prefer."
+                )
+            elif tracker.get_slot("screening_id") and tracker.get_slot("seat_type"):
+                dispatcher.utter_message(
+                    text=f"There are no {number_of_seats} {tracker.get_slot('seat_type')} seats left side by side, "
+                         f"so please pick them individually."
+                )
+
             # Seating plan image URL
             image_url = "https://www.edrawsoft.com/templates/images/cinema-seating-plan.png"
             dispatcher.utter_message(image=image_url)
             
-            return [SlotSet("number_of_seats", number_of_seats), FollowupAction("action_ask_seat_numbers")]
+            return events + [SlotSet("proposed_seats", proposal), FollowupAction("action_ask_seat_numbers")]
         elif number_of_seats:  # Number is outside valid range
             dispatcher.utter_message(text="Please specify a valid number of seats (1-10).")
             return [UserUtteranceReverted()]
@@ -716,6 +818,17 @@ class ActionSetNumberOfSeats(Action):
             dispatcher.utter_message(text="I didn't understand that. Could you please specify the number of seats?")
             return [UserUtteranceReverted()]
 
+    @staticmethod
+    def _propose_seats(tracker: Tracker, number_of_seats: int):
+        """Codes of the best free block of seats of the chosen type, or None."""
+        screening_id = tracker.get_slot("screening_id")
+        seat_type = tracker.get_slot("seat_type")
+        if not screening_id or not seat_type:
+            return None
+        hall = get_catalogue().hall
+        seats = get_allocator(hall, get_inventory(hall.size)).propose(screening_id, seat_type, number_of_seats)
+        return [hall.code(seat) for seat in seats] if seats else None
+
 
 class ActionAskSeatNumbers(Action):
     def name(self):
@@ -748,17 +861,35 @@ class ActionSetSeatNumbers(Action):
         # Extract the latest user message
         user_message = tracker.latest_message.get("text", "")
         number_of_seats = tracker.get_slot("number_of_seats")
+        screening_id = tracker.get_slot("screening_id")
 
         # Try extracting seat numbers in the format (e.g., A1, B2, C10)
-        seat_numbers = re.findall(r"[A-Z]\d+", user_message)
+        seat_numbers = get_catalogue().hall.find_codes(user_message)
 
-        # If no seat format is found, fallback to extracting plain numbers
-        if not seat_numbers:
-            seat_numbers = re.findall(r"\d+", user_message)
+        # Take the proposed block when the user accepts it
+        proposed_seats = tracker.get_slot("proposed_seats")
+        if not seat_numbers and proposed_seats and BEST_SEATS_MATCHER.first(user_message.lower()):
+            seat_numbers = list(proposed_seats)
+
+        # Bare numbers ("3 and 4") don't say which row, so ask for seat codes
+        if not seat_numbers and NUMBER_PATTERN.search(user_message):
+            hall = get_catalogue().hall
+            dispatcher.utter_message(
+                text=f"Please include the row letter with each seat, e.g. {hall.rows[0]}3. "
+                     f"Rows go from {hall.rows[0]} to {hall.rows[-1]}."
+            )
+            return [UserUtteranceReverted()]
 
         if seat_numbers:
             # Check if the number of seats matches the slot value
             if number_of_seats and len(seat_numbers) == int(number_of_seats):
+                # Hold the seats for this screening so nobody else can take them
+                hold_events = []
+                if screening_id:
+                    hold_events = _hold_seats(dispatcher, tracker, screening_id, seat_numbers)
+                    if hold_events is None:
+                        return [UserUtteranceReverted()]
+
                 if len(seat_numbers) == 1:
                     dispatcher.utter_message(
                         text=f"You have selected the seat: {seat_numbers[0]}. Confirming your reservation now!"
@@ -767,7 +898,7 @@ class ActionSetSeatNumbers(Action):
                     dispatcher.utter_message(
                         text=f"You have selected the following seats: {', '.join(seat_numbers)}. Confirming your reservation now!"
                     )
-                return [SlotSet("seat_numbers", seat_numbers)]
+                return [SlotSet("seat_numbers", seat_numbers), SlotSet("proposed_seats", None)] + hold_events
             else:
                 dispatcher.utter_message(
                     text=f"You mentioned {number_of_seats} seats but provided {len(seat_numbers)} seat numbers. Please try again."
@@ -807,7 +938,12 @@ class ActionSetConfirmation(Action):
             dispatcher.utter_message(text="Your booking is confirmed!")
             return [SlotSet("decide", "confirm"), FollowupAction("action_ask_payment_option")]
         elif "cancel" in confirmation:
+            # Give the held seats back straight away
+            seat_hold = tracker.get_slot("seat_hold")
+            if seat_hold:
+                get_inventory(get_catalogue().hall.size).release(seat_hold)
             dispatcher.utter_message(text="Your booking has been canceled. Feel free to ask if you need anything else!")
+            return [SlotSet("seat_hold", None)] if seat_hold else []
         else:
             dispatcher.utter_message(text="Sorry, I didn't understand that.")
             dispatcher.utter_message(text="Please confirm your booking by replying with 'Confirm' or 'Cancel'.")
@@ -859,10 +995,10 @@ class DetectPaymentOption(Action):
         return "action_detect_payment_option"
     
     def run(self, dispatcher, tracker, domain):
-        text = tracker.latest_message.get("text", "").lower()
-        if "credit" in text or "card" in text or "online" in text:
+        match = PAYMENT_CHANNEL_MATCHER.first(tracker.latest_message.get("text", ""))
+        if match and match.label == "online":
             return [FollowupAction("tell_online_payment")]
-        elif "cash" in text or "offline" in text:
+        elif match and match.label == "offline":
             return [FollowupAction("tell_offline_payment")]
         else:
             dispatcher.utter_message("Sorry, I didn't understand that.")
@@ -938,6 +1074,7 @@ class ActionSetPaymentOption(Action):
             for option, keywords in self.payment_options_map.items() 
             for keyword in keywords
         }
+        self.keyword_matcher = KeywordMatcher(self.keyword_mapping)
 
     def run(
         self,
@@ -967,24 +1104,8 @@ class ActionSetPaymentOption(Action):
 
     def _match_payment_option(self, user_input: Text) -> Text:
         """Match user input against valid payment options."""
-        # Split user input into words
-        input_words = user_input.split()
-        
-        # Try exact match with complete input first
-        if user_input in self.keyword_mapping:
-            return self.keyword_mapping[user_input]
-        
-        # Try matching individual words
-        for word in input_words:
-            if word in self.keyword_mapping:
-                return self.keyword_mapping[word]
-                
-        # Try partial matches as a last resort
-        for keyword, option in self.keyword_mapping.items():
-            if keyword in user_input or any(word in keyword for word in input_words):
-                return option
-        
-        return None
+        match = self.keyword_matcher.first(user_input)
+        return match.label if match else None
 
     def _handle_valid_payment(
         self,
@@ -1042,6 +1163,21 @@ class ActionBookingConfirmed(Action):
         return "action_booking_confirmed"
 
     def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain):
+        # Turn the seat hold into sold seats; it may have expired meanwhile
+        seat_hold = tracker.get_slot("seat_hold")
+        if seat_hold and not get_inventory(get_catalogue().hall.size).commit(seat_hold):
+            dispatcher.utter_message(
+                text="Sorry, your seats were released because the booking took too long. Please choose your seats again.")
+            return [SlotSet("seat_hold", None), SlotSet("seat_numbers", None), FollowupAction("action_ask_seat_numbers")]
+
+        # Persisted by the background writer so the reply isn't held up
+        get_booking_writer().enqueue(Booking.from_slots(tracker.sender_id, tracker.current_slot_values()))
+
         dispatcher.utter_message(
             text="Your booking has been confirmed. Enjoy the movie!")
         return []
+
+
+# Latency, events, errors and outbound time of every action above, served
+# for Prometheus when ACTION_METRICS is set; a no-op otherwise
+metrics.instrument_actions(list(globals().values()))
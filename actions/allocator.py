@@ -0,0 +1,144 @@
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Text, Tuple
+
+from actions.seats import SeatInventory, SeatMap, is_past_screening
+
+_FREE_RUN = re.compile(b"\x00+")
+
+# A row further from the ideal one costs as much as being this many seats
+# off-centre
+ROW_WEIGHT = 2.0
+
+# How often (seconds) indexes of past screenings are dropped
+EVICT_INTERVAL = 600.0
+
+
+class FreeSpanIndex:
+    """Runs of free seats per row of one screening.
+
+    Built from an occupancy snapshot and refreshed row by row: rows whose
+    bytes did not change keep their spans, so only changed rows are
+    rescanned. `longest[row]` lets the allocator skip rows that cannot fit a
+    group at all.
+    """
+
+    def __init__(self, hall: SeatMap):
+        self.hall = hall
+        rows = len(hall.rows)
+        self._snapshot = [None] * rows
+        self.spans: List[List[Tuple[int, int]]] = [[] for _ in range(rows)]
+        self.longest = [0] * rows
+        # Inventory version the spans were built from, None if unknown
+        self.version: Optional[int] = None
+
+    def refresh(self, occupancy: bytes) -> int:
+        """Bring the index up to date; returns how many rows were rescanned."""
+        width = self.hall.seats_per_row
+        rescanned = 0
+        for row in range(len(self.hall.rows)):
+            row_states = occupancy[row * width:(row + 1) * width]
+            if row_states == self._snapshot[row]:
+                continue
+            spans = [(m.start(), m.end() - m.start()) for m in _FREE_RUN.finditer(row_states)]
+            self._snapshot[row] = row_states
+            self.spans[row] = spans
+            self.longest[row] = max((length for _, length in spans), default=0)
+            rescanned += 1
+        return rescanned
+
+
+class SeatAllocator:
+    """Proposes the best contiguous block of seats of one type.
+
+    "Best" means closest to the ideal row (about two thirds of the way back
+    among rows of that type) and as close to the centre of the row as
+    possible.
+
+    Each screening's index is only refreshed when the inventory reports a
+    new version for it (always, for inventories that cannot tell).
+    """
+
+    def __init__(self, hall: SeatMap, inventory: SeatInventory):
+        self.hall = hall
+        self.inventory = inventory
+        self._indexes: Dict[Text, FreeSpanIndex] = {}
+        self._lock = threading.Lock()
+        self._next_eviction = time.time() + EVICT_INTERVAL
+        # Rows of each seat type, most desirable first
+        self._preferred_rows: Dict[Text, List[Tuple[int, float]]] = {}
+        for seat_type in set(hall.row_types):
+            rows = [row for row, row_type in enumerate(hall.row_types) if row_type == seat_type]
+            ideal = rows[0] + (len(rows) - 1) * 2 / 3
+            self._preferred_rows[seat_type] = sorted(
+                ((row, abs(row - ideal)) for row in rows), key=lambda item: item[1]
+            )
+
+    def _index(self, screening_id: Text) -> FreeSpanIndex:
+        with self._lock:
+            if time.time() >= self._next_eviction:
+                self._evict()
+            index = self._indexes.get(screening_id)
+            if index is None:
+                index = self._indexes[screening_id] = FreeSpanIndex(self.hall)
+            # Read the version before the occupancy so a change in between
+            # shows up as a new version next time
+            version = self.inventory.version(screening_id)
+            if version is None or version != index.version:
+                index.refresh(self.inventory.occupancy(screening_id, self.hall.size))
+                index.version = version
+        return index
+
+    def _evict(self) -> None:
+        """Drop the indexes of screenings that are over. Called with the lock held."""
+        self._next_eviction = time.time() + EVICT_INTERVAL
+        for screening_id in [s for s in self._indexes if is_past_screening(s)]:
+            del self._indexes[screening_id]
+
+    def propose(self, screening_id: Text, seat_type: Text, count: int) -> Optional[List[int]]:
+        """Seat indexes of the best free block of `count` adjacent seats, or
+        None if no row of `seat_type` has one."""
+        rows = self._preferred_rows.get(seat_type.lower())
+        if not rows or count < 1:
+            return None
+
+        index = self._index(screening_id)
+        width = self.hall.seats_per_row
+        centre = (width - 1) / 2
+        best = None
+        for row, row_distance in rows:
+            row_cost = row_distance * ROW_WEIGHT
+            if best is not None and row_cost >= best[0]:
+                break  # rows are sorted, none further back can do better
+            if index.longest[row] < count:
+                continue
+            for start, length in index.spans[row]:
+                if length < count:
+                    continue
+                # Centre the block as far as this run allows
+                ideal_start = round(centre - (count - 1) / 2)
+                seat = min(max(ideal_start, start), start + length - count)
+                cost = row_cost + abs(seat + (count - 1) / 2 - centre)
+                if best is None or cost < best[0]:
+                    best = (cost, row * width + seat)
+        if best is None:
+            return None
+        return list(range(best[1], best[1] + count))
+
+
+_allocator: Optional[SeatAllocator] = None
+_allocator_lock = threading.Lock()
+
+
+def get_allocator(hall: SeatMap, inventory: SeatInventory) -> SeatAllocator:
+    """The allocator for `hall`, replaced (with its indexes) when the
+    catalogue reloads a new hall or the inventory changes."""
+    global _allocator
+    allocator = _allocator
+    if allocator is None or allocator.hall is not hall or allocator.inventory is not inventory:
+        with _allocator_lock:
+            allocator = _allocator
+            if allocator is None or allocator.hall is not hall or allocator.inventory is not inventory:
+                allocator = _allocator = SeatAllocator(hall, inventory)
+    return allocator
@@ -0,0 +1,287 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Text
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Text as TextColumn, create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool, StaticPool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATABASE_URL = "sqlite:///bookings.db"
+
+# Bookings that could not be written after every retry, one JSON row per line
+DEFAULT_DEAD_LETTER_PATH = "bookings_failed.jsonl"
+
+metadata = MetaData()
+
+bookings_table = Table(
+    "bookings",
+    metadata,
+    Column("booking_id", String(32), primary_key=True),
+    Column("sender_id", String(255), nullable=False, index=True),
+    Column("screening_id", String(255), index=True),
+    Column("movie", String(255)),
+    Column("location", String(64)),
+    Column("cinema", String(255)),
+    Column("showtime", String(32)),
+    Column("seat_type", String(32)),
+    Column("seats", TextColumn),  # JSON list of seat codes
+    Column("number_of_seats", Integer),
+    Column("payment_option", String(64)),
+    Column("hold_id", String(64)),
+    Column("created_at", Float, nullable=False),
+)
+
+
+class Booking(NamedTuple):
+    booking_id: Text
+    sender_id: Text
+    screening_id: Optional[Text]
+    movie: Optional[Text]
+    location: Optional[Text]
+    cinema: Optional[Text]
+    showtime: Optional[Text]
+    seat_type: Optional[Text]
+    seats: Sequence[Text]
+    number_of_seats: Optional[int]
+    payment_option: Optional[Text]
+    hold_id: Optional[Text]
+    created_at: float
+
+    @classmethod
+    def from_slots(cls, sender_id: Text, slots: Dict[Text, Any]) -> "Booking":
+        seats = slots.get("seat_numbers") or []
+        number_of_seats = slots.get("number_of_seats")
+        return cls(
+            booking_id=uuid.uuid4().hex,
+            sender_id=sender_id,
+            screening_id=slots.get("screening_id"),
+            movie=slots.get("movie"),
+            location=slots.get("location"),
+            cinema=slots.get("cinema"),
+            showtime=slots.get("showtime"),
+            seat_type=slots.get("seat_type"),
+            seats=list(seats),
+            number_of_seats=int(number_of_seats) if number_of_seats else len(seats) or None,
+            payment_option=slots.get("payment_option"),
+            hold_id=slots.get("seat_hold"),
+            created_at=time.time(),
+        )
+
+    def row(self) -> Dict[Text, Any]:
+        return {**self._asdict(), "seats": json.dumps(list(self.seats))}
+
+
+def _is_sqlite_memory(url: Text) -> bool:
+    database = url.split("://", 1)[-1].lstrip("/")
+    return not database or database.startswith(":memory:") or "mode=memory" in database
+
+
+def _make_engine(url: Text, pool_size: int, max_overflow: int) -> Engine:
+    if url.startswith("sqlite") and _is_sqlite_memory(url):
+        # Every new connection would open its own empty database, so the
+        # writer thread and readers must all share a single one
+        return create_engine(
+            url, poolclass=StaticPool, connect_args={"check_same_thread": False}, future=True,
+        )
+    if url.startswith("sqlite"):
+        # Pool SQLite connections too and share them across threads; WAL lets
+        # the writer run while other workers read.
+        engine = create_engine(
+            url,
+            poolclass=QueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            connect_args={"check_same_thread": False, "timeout": 30},
+            future=True,
+        )
+
+        @event.listens_for(engine, "connect")
+        def _set_pragmas(connection, _):
+            cursor = connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.close()
+
+        return engine
+    return create_engine(url, pool_size=pool_size, max_overflow=max_overflow, pool_pre_ping=True, future=True)
+
+
+class BookingRepository:
+    """Confirmed bookings in a SQL database, through a pooled engine."""
+
+    def __init__(self, url: Text = DEFAULT_DATABASE_URL, pool_size: int = 5, max_overflow: int = 10):
+        self.engine = _make_engine(url, pool_size, max_overflow)
+        metadata.create_all(self.engine)
+
+    def save_many(self, bookings: Sequence[Booking]) -> None:
+        """Insert `bookings` in one transaction."""
+        if not bookings:
+            return
+        with self.engine.begin() as connection:
+            connection.execute(bookings_table.insert(), [booking.row() for booking in bookings])
+
+    def for_sender(self, sender_id: Text) -> List[Dict[Text, Any]]:
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                bookings_table.select()
+                .where(bookings_table.c.sender_id == sender_id)
+                .order_by(bookings_table.c.created_at)
+            ).mappings().all()
+        return [{**row, "seats": json.loads(row["seats"] or "[]")} for row in rows]
+
+    def close(self) -> None:
+        self.engine.dispose()
+
+
+class BookingWriter:
+    """Write-behind queue in front of a `BookingRepository`.
+
+    `enqueue` returns at once; a background thread writes whatever has
+    queued up, up to `batch_size` bookings per transaction, at most
+    `flush_interval` seconds after the first one arrived. A failed batch
+    is retried with backoff up to `max_retries` times, then each booking
+    is tried on its own and those that still fail are appended to
+    `dead_letter_path` (and logged) instead of blocking the queue. `close`
+    (registered at exit by `get_booking_writer`) drains the queue before
+    returning.
+    """
+
+    def __init__(self, repository: BookingRepository, batch_size: int = 100, flush_interval: float = 0.2,
+                 max_retry_delay: float = 5.0, max_retries: int = 5, dead_letter_path: Optional[Text] = None):
+        self.repository = repository
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retry_delay = max_retry_delay
+        self.max_retries = max_retries
+        self.dead_letter_path = dead_letter_path
+        self._queue: "queue.Queue[Optional[Booking]]" = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.dead_lettered = 0
+        self._thread = threading.Thread(target=self._run, name="booking-writer", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, booking: Booking) -> None:
+        with self._lock:
+            if not self._closed:
+                self._queue.put(booking)
+                return
+        # Too late for the worker; write synchronously rather than lose it
+        self.repository.save_many([booking])
+
+    def flush(self) -> None:
+        """Block until everything enqueued so far is written."""
+        self._queue.join()
+
+    def _next_batch(self) -> List[Optional[Booking]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and batch[-1] is not None:
+            timeout = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = self._next_batch()
+            bookings = [booking for booking in batch if booking is not None]
+            stopping = len(bookings) < len(batch)
+            if bookings and not self._save_with_retries(bookings):
+                self._save_one_by_one(bookings)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _save_with_retries(self, bookings: List[Booking]) -> bool:
+        delay = 0.1
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.repository.save_many(bookings)
+            except Exception:
+                self.failures += 1
+                if attempt == self.max_retries:
+                    logger.exception(f"Writing {len(bookings)} bookings failed {attempt + 1} times; giving up")
+                    return False
+                logger.exception(f"Writing {len(bookings)} bookings failed; retrying in {delay:.1f}s")
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+            else:
+                self.written += len(bookings)
+                self.batches += 1
+                return True
+        return False
+
+    def _save_one_by_one(self, bookings: List[Booking]) -> None:
+        """Write what can be written of a failed batch, one booking per
+        transaction, and dead-letter the rest."""
+        failed = []
+        for booking in bookings:
+            try:
+                self.repository.save_many([booking])
+            except Exception as e:
+                logger.error(f"Booking {booking.booking_id} could not be written: {e}")
+                failed.append(booking)
+            else:
+                self.written += 1
+                self.batches += 1
+        if failed:
+            self._dead_letter(failed)
+
+    def _dead_letter(self, bookings: List[Booking]) -> None:
+        self.dead_lettered += len(bookings)
+        lines = [json.dumps({**booking._asdict(), "seats": list(booking.seats)}) for booking in bookings]
+        if self.dead_letter_path:
+            try:
+                with open(self.dead_letter_path, "a", encoding="utf-8") as dead_letters:
+                    dead_letters.write("".join(line + "\n" for line in lines))
+                logger.error(f"Dead-lettered {len(bookings)} bookings to {self.dead_letter_path}")
+                return
+            except OSError as e:
+                logger.error(f"Could not write dead-letter file {self.dead_letter_path}: {e}")
+        for line in lines:
+            logger.error(f"Unwritten booking: {line}")
+
+    def close(self, timeout: Optional[float] = 30.0) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error(f"Booking writer did not drain within {timeout}s; {self._queue.qsize()} bookings unwritten")
+
+
+_writer: Optional[BookingWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_booking_writer() -> BookingWriter:
+    """The process-wide booking writer for $BOOKINGS_DATABASE_URL (SQLite
+    file bookings.db by default), drained when the process exits. Bookings
+    it cannot write go to $BOOKINGS_DEAD_LETTER_PATH."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                repository = BookingRepository(os.getenv("BOOKINGS_DATABASE_URL", DEFAULT_DATABASE_URL))
+                _writer = BookingWriter(
+                    repository,
+                    dead_letter_path=os.getenv("BOOKINGS_DEAD_LETTER_PATH", DEFAULT_DEAD_LETTER_PATH),
+                )
+                atexit.register(_writer.close)
+    return _writer
@@ -0,0 +1,127 @@
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Text, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Bounded LRU cache with per-entry TTLs and a stale grace period.
+
+    Every entry is fresh until `ttl` runs out and may then still be served
+    as stale for another `stale_ttl` seconds while the caller refreshes it.
+    Timestamps are wall-clock so a snapshot stays meaningful across restarts.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0, stale_ttl: float = 86400.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        # key -> [value, fresh_until, stale_until], least recently used first
+        self._entries: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, key: Hashable) -> Tuple[bool, Any, bool]:
+        """Return `(found, value, fresh)` for `key`."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None, False
+            value, fresh_until, stale_until = entry
+            if now >= stale_until:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return False, None, False
+            self._entries.move_to_end(key)
+            if now < fresh_until:
+                self.hits += 1
+                return True, value, True
+            self.stale_hits += 1
+            return True, value, False
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        found, value, _ = self.lookup(key)
+        return value if found else default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        fresh_until = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = [value, fresh_until, fresh_until + self.stale_ttl]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[Text, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
+
+    def save(self, path: Text) -> None:
+        """Write a gzipped JSON snapshot, replacing `path` atomically."""
+        now = time.time()
+        with self._lock:
+            rows = [
+                [key, value, round(fresh_until, 1), round(stale_until, 1)]
+                for key, (value, fresh_until, stale_until) in self._entries.items()
+                if stale_until > now
+            ]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(rows, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def load(self, path: Text) -> int:
+        """Merge a snapshot written by `save`, skipping expired rows."""
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                rows = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache snapshot {path}: {e}")
+            return 0
+
+        now = time.time()
+        loaded = 0
+        with self._lock:
+            for key, value, fresh_until, stale_until in rows:
+                if stale_until <= now or key in self._entries:
+                    continue
+                self._entries[key] = [value, fresh_until, stale_until]
+                loaded += 1
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return loaded
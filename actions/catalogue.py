@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Text, Tuple
+
+from actions.fuzzy import FuzzyIndex
+from actions.matcher import KeywordMatcher
+from actions.seats import SeatMap
+from actions.timeparse import format_minutes, minutes_array
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "data", "catalogue.json")
+
+# How often (seconds) `get_catalogue` looks at the file's mtime
+RELOAD_CHECK_INTERVAL = 2.0
+
+
+# Words too common in cinema names to pick one out on their own
+GENERIC_CINEMA_WORDS = frozenset([
+    "the", "cinema", "cinemas", "gsc", "mall", "tower", "centre", "center", "plaza", "town", "city", "phase", "kl",
+])
+
+
+def _cinema_keys(cinemas: Mapping[Text, Text]) -> List[Tuple[Text, Text]]:
+    """What users call each cinema: its name with and without the "(Mall
+    Name)" part, the mall on its own, and any word only that cinema has."""
+    keys = []
+    words_by_letter = {}
+    for letter, name in cinemas.items():
+        short_name = re.sub(r"\s*\(.*?\)", "", name)
+        keys += [(name, letter), (short_name, letter)]
+        keys += [(area, letter) for area in re.findall(r"\((.*?)\)", name)]
+        words_by_letter[letter] = set(re.findall(r"[^\W_]+", name.lower())) - GENERIC_CINEMA_WORDS
+    for letter, words in words_by_letter.items():
+        others = set().union(*(other for key, other in words_by_letter.items() if key != letter))
+        keys += [(word, letter) for word in words - others if len(word) >= 4]
+    return keys
+
+
+class Catalogue:
+    """Immutable view of cinemas, showtimes and seat prices.
+
+    Built once from the catalogue file with every lookup the actions need
+    precomputed, so a request only does dict lookups. Keys are normalised:
+    locations, cinema letters and seat types are lowercase.
+    """
+
+    def __init__(self, data: Dict[Text, Any]):
+        location_aliases = {}
+        cinemas_by_location = {}
+        seat_prices = {}
+        seat_options = {}
+        currencies = {}
+        cinema_indexes = {}
+
+        for location, info in data["locations"].items():
+            location = location.lower()
+            location_aliases[location] = location
+            for alias in info.get("aliases", []):
+                location_aliases[alias.lower()] = location
+
+            cinemas = {letter.lower(): name for letter, name in info["cinemas"].items()}
+            cinemas_by_location[location] = MappingProxyType(cinemas)
+            cinema_indexes[location] = FuzzyIndex(_cinema_keys(cinemas))
+
+            currencies[location] = info["currency"]
+            seat_options[location] = tuple(info["seat_prices"].items())
+            for seat_type, price in info["seat_prices"].items():
+                seat_prices[(location, seat_type.lower())] = price
+
+        self.locations: Tuple[Text, ...] = tuple(cinemas_by_location)
+        self.location_aliases: Mapping[Text, Text] = MappingProxyType(location_aliases)
+        self.location_matcher = KeywordMatcher(location_aliases)
+        self.location_index = FuzzyIndex(location_aliases)
+        self.cinema_indexes: Mapping[Text, FuzzyIndex] = MappingProxyType(cinema_indexes)
+        self.cinemas_by_location: Mapping[Text, Mapping[Text, Text]] = MappingProxyType(cinemas_by_location)
+        self.seat_prices: Mapping[Tuple[Text, Text], int] = MappingProxyType(seat_prices)
+        self.seat_options: Mapping[Text, Tuple[Tuple[Text, int], ...]] = MappingProxyType(seat_options)
+        self.currencies: Mapping[Text, Text] = MappingProxyType(currencies)
+        # Showtimes are kept as sorted minutes since midnight for bisecting,
+        # with their display strings ("07:00 PM") in the same order
+        self.showtime_minutes = MappingProxyType(
+            {movie: minutes_array(times) for movie, times in data["showtimes"].items()}
+        )
+        self.showtimes_by_movie: Mapping[Text, Tuple[Text, ...]] = MappingProxyType(
+            {movie: tuple(format_minutes(m) for m in minutes) for movie, minutes in self.showtime_minutes.items()}
+        )
+        # Every screen shares one hall layout for now
+        self.hall = SeatMap.from_dict(data["hall"])
+
+    @classmethod
+    def from_file(cls, path: Text) -> "Catalogue":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def resolve_location(self, name: Optional[Text]) -> Optional[Text]:
+        """Map a location name or alias (any case) to its canonical key."""
+        if not name:
+            return None
+        return self.location_aliases.get(name.strip().lower())
+
+    def cinemas(self, location: Optional[Text]) -> Optional[Mapping[Text, Text]]:
+        return self.cinemas_by_location.get(self.resolve_location(location))
+
+    def cinema(self, location: Optional[Text], letter: Text) -> Optional[Text]:
+        cinemas = self.cinemas(location)
+        return cinemas.get(letter.strip().lower()) if cinemas else None
+
+    def showtimes(self, movie: Optional[Text]) -> Optional[Tuple[Text, ...]]:
+        return self.showtimes_by_movie.get(movie) if movie else None
+
+    def seat_price(self, location: Optional[Text], seat_type: Text) -> Optional[int]:
+        return self.seat_prices.get((self.resolve_location(location), seat_type.lower()))
+
+    def seat_types(self, location: Optional[Text]) -> List[Text]:
+        return [seat_type for seat_type, _ in self.seat_options.get(self.resolve_location(location), ())]
+
+
+class _CatalogueFile:
+    """Holds the current `Catalogue` and swaps it when the file changes."""
+
+    def __init__(self, path: Text):
+        self.path = path
+        self._lock = threading.Lock()
+        self._catalogue: Optional[Catalogue] = None
+        self._mtime = None
+        self._next_check = 0.0
+
+    def get(self) -> Catalogue:
+        now = time.monotonic()
+        if self._catalogue is None or now >= self._next_check:
+            self._reload_if_changed(now)
+        return self._catalogue
+
+    def _reload_if_changed(self, now: float) -> None:
+        with self._lock:
+            self._next_check = now + RELOAD_CHECK_INTERVAL
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                if self._catalogue is None:
+                    raise
+                logger.warning(f"Cannot stat catalogue {self.path}, keeping the loaded one: {e}")
+                return
+            if mtime == self._mtime and self._catalogue is not None:
+                return
+            try:
+                catalogue = Catalogue.from_file(self.path)
+            except (OSError, ValueError, KeyError) as e:
+                if self._catalogue is None:
+                    raise
+                logger.warning(f"Catalogue {self.path} is invalid, keeping the loaded one: {e}")
+                self._mtime = mtime
+                return
+            # Readers see either the old or the new catalogue, never a mix
+            self._catalogue = catalogue
+            self._mtime = mtime
+
+
+_file = _CatalogueFile(os.getenv("CATALOGUE_PATH", DEFAULT_PATH))
+
+
+def get_catalogue() -> Catalogue:
+    """Return the current catalogue, reloading it if the file changed."""
+    return _file.get()
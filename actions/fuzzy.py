@@ -0,0 +1,141 @@
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Text, Tuple, Union
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+class FuzzyMatch(NamedTuple):
+    name: Text
+    label: Text
+    distance: int
+
+
+def _words(text: Text) -> List[Text]:
+    return _WORD.findall(text.lower())
+
+
+def _trigrams(text: Text) -> set:
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def allowed_distance(name: Text, max_distance: int = 2) -> int:
+    """Typos tolerated in `name`: none up to 3 characters, one up to 7,
+    then `max_distance`."""
+    return min(max_distance, len(name) // 4)
+
+
+def bounded_distance(a: Text, b: Text, limit: int) -> int:
+    """Edit distance between `a` and `b`, counting a swap of two neighbouring
+    characters as one edit; `limit + 1` as soon as it must exceed `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class FuzzyIndex:
+    """Character-trigram index over short names -> label, for typo-tolerant
+    lookups ("pavillion", "olympain city", "singapor").
+
+    `search` slides a window over the words of a message. Candidates for a
+    window come from the postings of only its rarest few trigrams, are kept
+    if they share enough trigrams with it, and are then checked with an
+    edit distance that gives up past the allowed number of typos. The work
+    depends on the message and on those few postings, not on how many
+    names there are. Matching is case- and punctuation-insensitive.
+    """
+
+    def __init__(self, names: Union[Mapping[Text, Text], Iterable[Tuple[Text, Text]]], max_distance: int = 2):
+        items = names.items() if isinstance(names, Mapping) else names
+        self.max_distance = max_distance
+        self._names: List[Text] = []
+        self._labels: List[Text] = []
+        self._limits: List[int] = []
+        self._grams: List[frozenset] = []
+        postings: Dict[Tuple[Text, int], List[int]] = defaultdict(list)
+        seen = set()
+
+        for name, label in items:
+            name = " ".join(_words(name))
+            if not name or (name, label) in seen:
+                continue
+            seen.add((name, label))
+            entry = len(self._names)
+            self._names.append(name)
+            self._labels.append(label)
+            self._limits.append(allowed_distance(name, max_distance))
+            grams = frozenset(_trigrams(name))
+            self._grams.append(grams)
+            for gram in grams:
+                postings[gram, len(name)].append(entry)
+
+        self._postings = {gram: tuple(entries) for gram, entries in postings.items()}
+        self.max_words = max((name.count(" ") + 1 for name in self._names), default=0)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def search(self, text: Text, limit: int = 3) -> List[FuzzyMatch]:
+        """The closest indexed names found in `text`, at most one per label,
+        fewest typos first and then longest name first."""
+        words = _words(text)
+        best: Dict[Text, FuzzyMatch] = {}
+        for start in range(len(words)):
+            for end in range(start + 1, min(start + self.max_words, len(words)) + 1):
+                window = " ".join(words[start:end])
+                grams = _trigrams(window)
+                # Only names whose length is within the typos they allow
+                lengths = range(
+                    max(1, len(window) - self.max_distance), len(window) + self.max_distance + 1
+                )
+                postings = {
+                    gram: [entries for entries in (self._postings.get((gram, n)) for n in lengths) if entries]
+                    for gram in grams
+                }
+                # Each typo breaks at most four of the window's trigrams, so
+                # a close enough name has at least one of any 4k + 1 of them:
+                # only the postings of the rarest few are read
+                k = allowed_distance(" " * lengths[-1], self.max_distance)
+                probe = sorted(grams, key=lambda gram: sum(map(len, postings[gram])))
+                candidates = set()
+                for gram in probe[:4 * k + 1]:
+                    for entries in postings[gram]:
+                        candidates.update(entries)
+                for entry in candidates:
+                    allowed = self._limits[entry]
+                    entry_grams = self._grams[entry]
+                    if len(grams & entry_grams) < max(len(grams), len(entry_grams)) - 4 * allowed:
+                        continue
+                    name = self._names[entry]
+                    distance = 0 if window == name else bounded_distance(window, name, allowed)
+                    if distance > allowed:
+                        continue
+                    label = self._labels[entry]
+                    current = best.get(label)
+                    if current is None or (distance, -len(name)) < (current.distance, -len(current.name)):
+                        best[label] = FuzzyMatch(name, label, distance)
+        return sorted(best.values(), key=lambda m: (m.distance, -len(m.name)))[:limit]
+
+    def best(self, text: Text) -> Optional[FuzzyMatch]:
+        """The single closest match, or None if there is none or two labels
+        are equally close."""
+        matches = self.search(text, limit=2)
+        if not matches:
+            return None
+        if len(matches) > 1 and (matches[0].distance, len(matches[0].name)) == (matches[1].distance, len(matches[1].name)):
+            return None
+        return matches[0]
@@ -0,0 +1,98 @@
+from collections import deque
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Text, Tuple, Union
+
+
+class Match(NamedTuple):
+    start: int
+    end: int
+    keyword: Text
+    label: Text
+
+
+# Any whitespace in the message counts as a plain space
+_WHITESPACE = {ord(c): " " for c in "\t\n\r\x0b\x0c\xa0"}
+
+
+class KeywordMatcher:
+    """Aho–Corasick automaton over a keyword -> label vocabulary.
+
+    `find_all` reports every keyword occurrence in one left-to-right pass over
+    the message, so the cost depends on the message length and not on how
+    many keywords there are. Matches must sit on word boundaries: "my" does
+    not match inside "mystery" and "cn" does not match inside "cinema".
+    Matching is case-insensitive.
+    """
+
+    def __init__(self, keywords: Union[Mapping[Text, Text], Iterable[Tuple[Text, Text]]]):
+        items = keywords.items() if isinstance(keywords, Mapping) else keywords
+        self._goto: List[Dict[Text, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Per node: (keyword length, keyword, label) of every keyword ending there
+        self._out: List[Tuple[Tuple[int, Text, Text], ...]] = [()]
+        self.labels: Dict[Text, Text] = {}
+
+        for keyword, label in items:
+            keyword = " ".join(keyword.lower().split())
+            if not keyword:
+                continue
+            self.labels[keyword] = label
+            node = 0
+            for char in keyword:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                node = next_node
+            self._out[node] = ((len(keyword), keyword, label),)
+
+        # Breadth-first pass to fill in failure links and merge their outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[child] = fail if fail != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def find_all(self, text: Text) -> List[Match]:
+        """Return all word-bounded matches, ordered by start, longest first."""
+        text = text.lower().translate(_WHITESPACE)
+        goto, fail, out = self._goto, self._fail, self._out
+        size = len(text)
+        matches = []
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if not out[node]:
+                continue
+            end = i + 1
+            if end < size and char.isalnum() and text[end].isalnum():
+                continue
+            for length, keyword, label in out[node]:
+                start = end - length
+                if start > 0 and text[start - 1].isalnum() and keyword[0].isalnum():
+                    continue
+                matches.append(Match(start, end, keyword, label))
+        matches.sort(key=lambda m: (m.start, m.start - m.end))
+        return matches
+
+    def first(self, text: Text) -> Optional[Match]:
+        """Return the leftmost (and then longest) match, or None."""
+        matches = self.find_all(text)
+        return matches[0] if matches else None
+
+    def find_labels(self, text: Text) -> List[Text]:
+        """Return the distinct labels found, in order of first appearance."""
+        return list(dict.fromkeys(match.label for match in self.find_all(text)))
@@ -0,0 +1,283 @@
+"""Per-action latency, outcome and outbound-call metrics.
+
+Off unless $ACTION_METRICS is set (1/true/yes/on). When off nothing is
+wrapped, so the actions run exactly as written. When on,
+`instrument_actions` wraps the `run` of every action class, the TMDB
+client's requests and the transcription service's calls, and serves the
+numbers in the Prometheus text format at
+http://$ACTION_METRICS_HOST:$ACTION_METRICS_PORT/metrics
+(127.0.0.1:9105 by default).
+"""
+import bisect
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Text, Tuple
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("ACTION_METRICS", "").lower() in ("1", "true", "yes", "on")
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 9105
+
+# Seconds; actions are mostly sub-millisecond, TMDB and the recognizer not
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# The action whose run() is executing in this thread / task
+_current_action: contextvars.ContextVar[Optional[Text]] = contextvars.ContextVar("current_action", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, as Prometheus expects."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        # A bucket counts values <= its bound; the last one is +Inf
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[Text, int]]:
+        total = 0
+        rows = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            rows.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return rows
+
+
+def _label(value: Text) -> Text:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(**labels: Text) -> Text:
+    return ",".join(f'{key}="{_label(value)}"' for key, value in labels.items())
+
+
+class Registry:
+    """Everything recorded so far, and its rendering as Prometheus text."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: Dict[Text, Histogram] = defaultdict(Histogram)
+        self.events: Dict[Tuple[Text, Text], int] = defaultdict(int)
+        self.errors: Dict[Tuple[Text, Text], int] = defaultdict(int)
+        self.outbound: Dict[Text, Histogram] = defaultdict(Histogram)
+        self.action_outbound: Dict[Tuple[Text, Text], List[float]] = defaultdict(lambda: [0, 0.0])
+
+    def observe_action(self, action: Text, seconds: float, events: Any, error: Optional[Text]) -> None:
+        with self._lock:
+            self.latency[action].observe(seconds)
+            if error:
+                self.errors[action, error] += 1
+            for event in events or ():
+                event_type = event.get("event") if isinstance(event, dict) else type(event).__name__
+                self.events[action, event_type or "unknown"] += 1
+
+    def observe_outbound(self, target: Text, seconds: float) -> None:
+        action = _current_action.get() or "none"
+        with self._lock:
+            self.outbound[target].observe(seconds)
+            totals = self.action_outbound[action, target]
+            totals[0] += 1
+            totals[1] += seconds
+
+    def reset(self) -> None:
+        with self._lock:
+            for table in (self.latency, self.events, self.errors, self.outbound, self.action_outbound):
+                table.clear()
+
+    def render(self) -> Text:
+        with self._lock:
+            lines: List[Text] = []
+
+            def histogram(name: Text, help_text: Text, series: Dict[Text, Histogram], label: Text) -> None:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, hist in sorted(series.items()):
+                    labels = _labels(**{label: key})
+                    for bound, count in hist.cumulative():
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f"{name}_sum{{{labels}}} {hist.sum!r}")
+                    lines.append(f"{name}_count{{{labels}}} {hist.count}")
+
+            def counter(name: Text, help_text: Text, series: Iterable[Tuple[Dict[Text, Text], Any]]) -> None:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in series:
+                    lines.append(f"{name}{{{_labels(**labels)}}} {value!r}")
+
+            histogram("action_latency_seconds", "Time spent in Action.run.", self.latency, "action")
+            counter("action_events_total", "Events returned by actions, by event type.", (
+                ({"action": action, "event": event}, count) for (action, event), count in sorted(self.events.items())
+            ))
+            counter("action_errors_total", "Exceptions raised by actions, by exception type.", (
+                ({"action": action, "error": error}, count) for (action, error), count in sorted(self.errors.items())
+            ))
+            histogram("outbound_call_seconds", "Duration of calls to external services.", self.outbound, "target")
+            counter("action_outbound_calls_total", "Calls to external services made while an action ran.", (
+                ({"action": action, "target": target}, calls)
+                for (action, target), (calls, _) in sorted(self.action_outbound.items())
+            ))
+            counter("action_outbound_seconds_total", "Time in external calls made while an action ran "
+                    "(concurrent calls are summed).", (
+                ({"action": action, "target": target}, seconds)
+                for (action, target), (_, seconds) in sorted(self.action_outbound.items())
+            ))
+            return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class _OutboundTimer:
+    __slots__ = ("target", "started")
+
+    def __init__(self, target: Text):
+        self.target = target
+
+    def __enter__(self) -> "_OutboundTimer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        registry.observe_outbound(self.target, time.perf_counter() - self.started)
+
+
+def outbound(target: Text) -> _OutboundTimer:
+    """Context manager timing one call to an external service."""
+    return _OutboundTimer(target)
+
+
+def _timed_run(run: Callable) -> Callable:
+    if inspect.iscoroutinefunction(run):
+        @functools.wraps(run)
+        async def timed(self, dispatcher, tracker, domain):
+            action = self.name()
+            token = _current_action.set(action)
+            started = time.perf_counter()
+            events = error = None
+            try:
+                events = await run(self, dispatcher, tracker, domain)
+                return events
+            except Exception as e:
+                error = type(e).__name__
+                raise
+            finally:
+                registry.observe_action(action, time.perf_counter() - started, events, error)
+                _current_action.reset(token)
+    else:
+        @functools.wraps(run)
+        def timed(self, dispatcher, tracker, domain):
+            action = self.name()
+            token = _current_action.set(action)
+            started = time.perf_counter()
+            events = error = None
+            try:
+                events = run(self, dispatcher, tracker, domain)
+                return events
+            except Exception as e:
+                error = type(e).__name__
+                raise
+            finally:
+                registry.observe_action(action, time.perf_counter() - started, events, error)
+                _current_action.reset(token)
+    timed.instrumented = True
+    return timed
+
+
+def _timed_call(method: Callable, target: Text) -> Callable:
+    if getattr(method, "instrumented", False):
+        return method
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def timed(*args, **kwargs):
+            with outbound(target):
+                return await method(*args, **kwargs)
+    else:
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            with outbound(target):
+                return method(*args, **kwargs)
+    timed.instrumented = True
+    return timed
+
+
+def _instrument_outbound() -> None:
+    from actions.tmdb import TMDBClient
+
+    # Only real requests: cache hits and coalesced searches never get here
+    TMDBClient._fetch = _timed_call(TMDBClient._fetch, "tmdb")
+    try:
+        from transcriber.service import TranscriptionService
+    except ImportError:
+        return
+    TranscriptionService.transcribe = _timed_call(TranscriptionService.transcribe, "recognizer")
+    TranscriptionService.transcribe_async = _timed_call(TranscriptionService.transcribe_async, "recognizer")
+
+
+def instrument_actions(objects: Iterable[Any]) -> None:
+    """Time every action class among `objects` (e.g. a module's globals),
+    its outbound calls, and start the metrics endpoint; does nothing unless
+    metrics are enabled."""
+    if not ENABLED:
+        return
+    from rasa_sdk import Action
+
+    for obj in list(objects):
+        if isinstance(obj, type) and issubclass(obj, Action) and "run" in vars(obj):
+            if not getattr(obj.run, "instrumented", False):
+                obj.run = _timed_run(obj.run)
+    _instrument_outbound()
+    start_server()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_server(host: Optional[Text] = None, port: Optional[int] = None) -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics from a background thread (once per process)."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            host = host or os.getenv("ACTION_METRICS_HOST", DEFAULT_HOST)
+            port = port if port is not None else int(os.getenv("ACTION_METRICS_PORT", DEFAULT_PORT))
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                logger.warning(f"Cannot serve action metrics on {host}:{port}: {e}")
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="action-metrics", daemon=True).start()
+            logger.info(f"Serving action metrics on http://{host}:{port}/metrics")
+    return _server
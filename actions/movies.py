@@ -0,0 +1,285 @@
+import bisect
+import heapq
+import json
+import logging
+import operator
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Text, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "data", "movies.json")
+
+PAGE_SIZE = 5
+
+# How much a hit in each field is worth; a movie scores a query token by its
+# best field
+FIELD_WEIGHTS = (("title", 3.0), ("aliases", 2.5), ("cast", 1.5), ("genres", 1.0), ("language", 1.0))
+
+# A word typed only partly ("incep") matches the words it starts, for less
+PREFIX_WEIGHT = 0.6
+MIN_PREFIX_LENGTH = 3
+MAX_PREFIX_EXPANSIONS = 32
+
+STOPWORDS = frozenset(["a", "an", "and", "at", "by", "for", "in", "is", "of", "on", "the", "to", "with"])
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def tokens(text: Text) -> List[Text]:
+    # "Ocean's" -> "oceans", "Mad Max: Fury Road" -> mad, max, fury, road
+    return _TOKEN.findall(text.lower().replace("'", "").replace("’", ""))
+
+
+def _key(words: Iterable[Text]) -> Text:
+    return " ".join(word for word in words if word not in STOPWORDS)
+
+
+class Movie(NamedTuple):
+    title: Text
+    year: Optional[int]
+    language: Optional[Text]
+    genres: Tuple[Text, ...]
+    cast: Tuple[Text, ...]
+    aliases: Tuple[Text, ...]
+    overview: Text
+    poster: Optional[Text]
+
+    @classmethod
+    def from_dict(cls, data: Dict[Text, Any]) -> "Movie":
+        return cls(
+            title=data["title"],
+            year=data.get("year"),
+            language=data.get("language"),
+            genres=tuple(data.get("genres", ())),
+            cast=tuple(data.get("cast", ())),
+            aliases=tuple(data.get("aliases", ())),
+            overview=data.get("overview", ""),
+            poster=data.get("poster"),
+        )
+
+    def matches(self, info: Dict[Text, Any]) -> bool:
+        """Whether a TMDB search hit is this movie: its title (or original
+        title) equals our title or an alias once normalised, and its release
+        year is ours when we know it."""
+        names = {_key(tokens(name)) for name in (self.title,) + self.aliases}
+        if not any(_key(tokens(info.get(field) or "")) in names for field in ("title", "original_title")):
+            return False
+        if self.year is None:
+            return True
+        released = (info.get("release_date") or "")[:4]
+        return released.isdigit() and int(released) == self.year
+
+
+class MoviePage(NamedTuple):
+    movies: List[Movie]
+    page: int
+    total: int
+    page_size: int
+
+    @property
+    def has_more(self) -> bool:
+        return (self.page + 1) * self.page_size < self.total
+
+
+# One query word: the index words it stands for, with the factor they count for
+_Term = Tuple[Tuple[Text, float], ...]
+
+
+class MovieIndex:
+    """Inverted index over the movie catalogue.
+
+    Every word of a movie's title, aliases, cast, genres and language maps
+    to the movies containing it and the weight of its best field. A query
+    word matches itself, its singular ("thrillers"), or, when it is not a
+    word of the index, the words it is a prefix of ("zodi"). Words that
+    match nothing ("please", "book") are ignored.
+
+    Movies matching every query word are ranked by score, and by catalogue
+    order (most popular first) on ties; only if there are none do partial
+    matches count, ranked by how many words they match. An exact title or
+    alias always comes first. Candidates come from intersecting postings
+    starting with the rarest word, only the requested page is fully
+    sorted, and a single-word query just reads a list ranked at build time.
+    """
+
+    def __init__(self, movies: Sequence[Movie]):
+        self.movies: Tuple[Movie, ...] = tuple(movies)
+        self.doc_ids: Dict[Text, int] = {}
+        postings: Dict[Text, Dict[int, float]] = {}
+        exact: Dict[Text, List[int]] = {}
+
+        for doc, movie in enumerate(self.movies):
+            self.doc_ids.setdefault(movie.title, doc)
+            for field, weight in FIELD_WEIGHTS:
+                values = getattr(movie, field)
+                for value in (values,) if isinstance(values, str) else values or ():
+                    for token in tokens(value):
+                        if token in STOPWORDS:
+                            continue
+                        docs = postings.setdefault(token, {})
+                        if docs.get(doc, 0.0) < weight:
+                            docs[doc] = weight
+            for name in (movie.title,) + movie.aliases:
+                exact.setdefault(_key(tokens(name)), []).append(doc)
+
+        self._postings = postings
+        self._ranked = {
+            token: tuple(sorted(docs, key=lambda doc, docs=docs: (-docs[doc], doc)))
+            for token, docs in postings.items()
+        }
+        self._vocabulary = sorted(postings)
+        self._exact = {key: tuple(docs) for key, docs in exact.items()}
+
+    @classmethod
+    def from_file(cls, path: Text) -> "MovieIndex":
+        with open(path, encoding="utf-8") as f:
+            return cls([Movie.from_dict(movie) for movie in json.load(f)["movies"]])
+
+    def __len__(self) -> int:
+        return len(self.movies)
+
+    def get(self, title: Optional[Text]) -> Optional[Movie]:
+        doc = self.doc_ids.get(title) if title else None
+        return self.movies[doc] if doc is not None else None
+
+    def _term(self, token: Text) -> _Term:
+        if token in self._postings:
+            return ((token, 1.0),)
+        if token.endswith("s") and token[:-1] in self._postings:
+            return ((token[:-1], 1.0),)
+        if len(token) < MIN_PREFIX_LENGTH:
+            return ()
+        vocabulary = self._vocabulary
+        start = bisect.bisect_left(vocabulary, token)
+        end = min(start + MAX_PREFIX_EXPANSIONS, len(vocabulary))
+        expansions = []
+        for word in vocabulary[start:end]:
+            if not word.startswith(token):
+                break
+            expansions.append((word, PREFIX_WEIGHT))
+        return tuple(expansions)
+
+    def _weights(self, term: _Term) -> Dict[int, float]:
+        """Movie -> weight of its best match for one query word."""
+        if len(term) == 1 and term[0][1] == 1.0:
+            return self._postings[term[0][0]]
+        weights: Dict[int, float] = {}
+        for token, factor in term:
+            for doc, weight in self._postings[token].items():
+                weight *= factor
+                if weight > weights.get(doc, 0.0):
+                    weights[doc] = weight
+        return weights
+
+    def search_ids(
+        self,
+        query: Text,
+        within: Optional[Set[int]] = None,
+        limit: Optional[int] = None,
+    ) -> Tuple[Sequence[int], int]:
+        """The ids of the best `limit` (default all) movies matching `query`,
+        optionally only those in `within`, and how many match in total."""
+        words = [word for word in tokens(query) if word not in STOPWORDS]
+        matched_words = []
+        terms = []
+        for word in words:
+            term = self._term(word)
+            if term:
+                matched_words.append(word)
+                terms.append(term)
+        if not terms:
+            return (), 0
+
+        exact = list(dict.fromkeys(
+            doc for key in (_key(words), _key(matched_words))
+            for doc in self._exact.get(key, ())
+            if within is None or doc in within
+        ))
+        room = None if limit is None else limit + len(exact)
+
+        ranked: Sequence[int]
+        if len(terms) == 1 and len(terms[0]) == 1 and within is None:
+            # Ranked when the index was built
+            ranked = self._ranked[terms[0][0][0]]
+            total = len(ranked)
+            ranked = ranked[:room]
+        else:
+            # Intersect from the rarest word up; the set operations iterate
+            # the smaller side
+            weights = sorted((self._weights(term) for term in terms), key=len)
+            candidates = weights[0].keys() & within if within is not None else weights[0].keys()
+            for other in weights[1:]:
+                candidates = other.keys() & candidates
+            if candidates:
+                # Summed column by column so the loops stay in C
+                docs = list(candidates)
+                totals = map(weights[0].__getitem__, docs)
+                for other in weights[1:]:
+                    totals = map(operator.add, totals, map(other.__getitem__, docs))
+                scored = list(zip(map(operator.neg, totals), docs))
+            else:
+                # Nothing matches every word; rank by how many words match
+                candidates = set().union(*(w.keys() for w in weights))
+                if within is not None:
+                    candidates &= within
+                scored = []
+                for doc in candidates:
+                    hits = [w[doc] for w in weights if doc in w]
+                    scored.append((-len(hits), -sum(hits), doc))
+            total = len(scored)
+            scored = sorted(scored) if room is None else heapq.nsmallest(room, scored)
+            ranked = [key[-1] for key in scored]
+
+        if exact:
+            first = set(exact)
+            ranked = exact + [doc for doc in ranked if doc not in first]
+        return ranked[:limit], total
+
+    def search(self, query: Text, within: Optional[Iterable[Text]] = None, limit: Optional[int] = None) -> List[Movie]:
+        """Movies matching `query`, best first; `within` restricts the
+        results to those titles."""
+        ranked, _ = self.search_ids(query, self._ids(within), limit)
+        return [self.movies[doc] for doc in ranked]
+
+    def page(
+        self,
+        query: Optional[Text],
+        page: int = 0,
+        page_size: int = PAGE_SIZE,
+        within: Optional[Iterable[Text]] = None,
+    ) -> MoviePage:
+        """One page of the results for `query`. Without a query, the page
+        lists `within` (or the whole catalogue) in catalogue order."""
+        ids = self._ids(within)
+        start = page * page_size
+        if query:
+            ranked, total = self.search_ids(query, ids, start + page_size)
+        else:
+            ranked = sorted(ids) if ids is not None else range(len(self.movies))
+            total = len(ranked)
+        return MoviePage([self.movies[doc] for doc in ranked[start:start + page_size]], page, total, page_size)
+
+    def _ids(self, titles: Optional[Iterable[Text]]) -> Optional[Set[int]]:
+        if titles is None:
+            return None
+        return {self.doc_ids[title] for title in titles if title in self.doc_ids}
+
+
+_index: Optional[MovieIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_movie_index() -> MovieIndex:
+    """The movie index for $MOVIES_PATH (actions/data/movies.json by default),
+    built on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                path = os.getenv("MOVIES_PATH", DEFAULT_PATH)
+                _index = MovieIndex.from_file(path)
+                logger.info(f"Indexed {len(_index)} movies from {path}")
+    return _index
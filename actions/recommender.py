@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Text
+
+import numpy as np
+
+from actions.movies import Movie, MovieIndex, get_movie_index
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "en_core_web_md"
+DEFAULT_CACHE_DIR = ".cache"
+
+
+def movie_text(movie: Movie) -> Text:
+    """What a movie's embedding is computed from."""
+    return f"{movie.overview} {' '.join(movie.genres)}"
+
+
+class SpacyVectors:
+    """Averaged word vectors from a spaCy model; only its tokenizer and
+    vector table are loaded."""
+
+    def __init__(self, model: Text = DEFAULT_MODEL):
+        import spacy
+
+        self.model = model
+        self._nlp = spacy.load(
+            model, exclude=["tok2vec", "tagger", "parser", "senter", "attribute_ruler", "lemmatizer", "ner"]
+        )
+
+    def embed(self, text: Text) -> np.ndarray:
+        return self._nlp.make_doc(text).vector
+
+    def embed_many(self, texts: Sequence[Text]) -> np.ndarray:
+        return np.vstack([doc.vector for doc in self._nlp.tokenizer.pipe(texts)])
+
+
+def _normalise(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def load_embeddings(index: MovieIndex, vectors: SpacyVectors, cache_dir: Text = DEFAULT_CACHE_DIR) -> np.ndarray:
+    """Unit-length embeddings of the catalogue, one row per movie, memory-mapped
+    read-only from a .npy file.
+
+    The file is named after a hash of the model and the movie texts, so it
+    is computed once per catalogue and then shared through the page cache
+    by every action-server process that maps it.
+    """
+    texts = [movie_text(movie) for movie in index.movies]
+    digest = hashlib.blake2b(json.dumps([vectors.model, texts]).encode(), digest_size=8).hexdigest()
+    path = os.path.join(cache_dir, f"movie_embeddings-{digest}.npy")
+    if not os.path.exists(path):
+        logger.info(f"Computing embeddings for {len(texts)} movies into {path}")
+        matrix = _normalise(vectors.embed_many(texts))
+        os.makedirs(cache_dir, exist_ok=True)
+        # Workers racing to build it each write their own file; the last
+        # rename wins and they are identical anyway
+        partial = f"{path}.{os.getpid()}.tmp"
+        with open(partial, "wb") as f:
+            np.save(f, matrix)
+        os.replace(partial, path)
+    return np.load(path, mmap_mode="r")
+
+
+class Recommender:
+    """Movies closest to a mood or to another movie by cosine similarity.
+
+    `matrix` holds one unit-length embedding per movie of `index`, so a
+    query is one matrix-vector product followed by an `argpartition` for
+    the top k; only those k are sorted.
+    """
+
+    def __init__(self, index: MovieIndex, matrix: np.ndarray, embed: Callable[[Text], np.ndarray]):
+        if len(matrix) != len(index):
+            raise ValueError(f"{len(matrix)} embeddings for {len(index)} movies")
+        self.index = index
+        self.matrix = matrix
+        self._embed = embed
+        languages = np.array([movie.language or "" for movie in index.movies])
+        self._language_masks: Dict[Text, np.ndarray] = {
+            language: languages == language for language in set(languages.tolist()) if language
+        }
+
+    def _top(self, query: np.ndarray, k: int, language: Optional[Text], exclude: Optional[int] = None) -> List[Movie]:
+        scores = self.matrix @ query
+        mask = self._language_masks.get(language.lower()) if language else None
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        if exclude is not None:
+            scores[exclude] = -np.inf
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [self.index.movies[i] for i in top if np.isfinite(scores[i])]
+
+    def similar_to(self, movie: Movie, k: int = 5, language: Optional[Text] = None) -> List[Movie]:
+        """The `k` movies most like `movie`, optionally only in `language`."""
+        doc = self.index.doc_ids[movie.title]
+        return self._top(np.asarray(self.matrix[doc]), k, language, exclude=doc)
+
+    def for_text(self, text: Text, k: int = 5, language: Optional[Text] = None) -> List[Movie]:
+        """The `k` movies closest to a free-text description or mood; none if
+        no word of it is known to the model."""
+        query = self._embed(text)
+        if not np.any(query):
+            return []
+        return self._top(_normalise(query), k, language)
+
+
+_recommender: Optional[Recommender] = None
+_unavailable = False
+_recommender_lock = threading.Lock()
+
+
+def get_recommender() -> Optional[Recommender]:
+    """The process-wide recommender over the movie catalogue, using the
+    $RECOMMENDER_MODEL spaCy model (en_core_web_md by default). None if the
+    model or the embeddings cannot be loaded."""
+    global _recommender, _unavailable
+    if _recommender is None and not _unavailable:
+        with _recommender_lock:
+            if _recommender is None and not _unavailable:
+                try:
+                    vectors = SpacyVectors(os.getenv("RECOMMENDER_MODEL", DEFAULT_MODEL))
+                    index = get_movie_index()
+                    # An unwritable cache dir or a corrupt .npy must not
+                    # take the actions down with it
+                    matrix = load_embeddings(index, vectors, os.getenv("RECOMMENDER_CACHE_DIR", DEFAULT_CACHE_DIR))
+                    _recommender = Recommender(index, matrix, vectors.embed)
+                except (ImportError, OSError, ValueError) as e:
+                    logger.warning(f"Recommendations are unavailable, the model or embeddings could not be loaded: {e}")
+                    _unavailable = True
+                    return None
+    return _recommender
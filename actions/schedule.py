@@ -0,0 +1,167 @@
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import date
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Text, Tuple
+
+from actions.catalogue import Catalogue, get_catalogue
+
+
+class Screening(NamedTuple):
+    screening_id: Text
+    movie: Text
+    location: Text
+    cinema: Text  # cinema letter within the location
+    cinema_name: Text
+    start: int  # minutes since midnight
+    screen: int
+    day: Text  # ISO date of the showing
+
+
+def screening_id(location: Text, cinema: Text, screen: int, start: int, day: Text) -> Text:
+    """Identifies one showing, so seats sold for today's slot stay free for
+    the same slot on later days."""
+    return f"{day}|{location}|{cinema}|{screen}|{start}"
+
+
+class Schedule:
+    """Screenings of movie x cinema x time, stored column-wise.
+
+    Rows are sorted by (movie, location, start) and mirrored by a packed
+    integer key per row, so "screenings of X in L from time T" is one bisect
+    followed by a slice. A second key/permutation pair sorted by
+    (movie, cinema, start) answers the same question for a single cinema.
+    """
+
+    def __init__(
+        self,
+        movies: Sequence[Text],
+        cinemas: Sequence[Tuple[Text, Text, Text]],
+        rows: Iterable[Tuple[int, int, int, int]],
+    ):
+        """`cinemas` holds (location, letter, name) triples and `rows` holds
+        (movie id, cinema id, start minute, screen) tuples, ids being
+        positions in `movies` and `cinemas`."""
+        self.movies = tuple(movies)
+        self.cinemas = tuple(cinemas)
+        self.locations = tuple(dict.fromkeys(location for location, _, _ in self.cinemas))
+        self._movie_ids = {movie: i for i, movie in enumerate(self.movies)}
+        self._location_ids = {location: i for i, location in enumerate(self.locations)}
+        self._cinema_ids = {(location, letter): i for i, (location, letter, _) in enumerate(self.cinemas)}
+        cinema_location = [self._location_ids[location] for location, _, _ in self.cinemas]
+
+        rows = sorted(rows, key=lambda row: (row[0], cinema_location[row[1]], row[2], row[1]))
+        self.movie = array("H", (row[0] for row in rows))
+        self.cinema = array("H", (row[1] for row in rows))
+        self.start = array("H", (row[2] for row in rows))
+        self.screen = array("H", (row[3] for row in rows))
+        self._location_key = array("Q", (
+            _pack(movie, cinema_location[cinema], start)
+            for movie, cinema, start in zip(self.movie, self.cinema, self.start)
+        ))
+
+        by_cinema = sorted(range(len(rows)), key=lambda i: (self.movie[i], self.cinema[i], self.start[i]))
+        self._cinema_rows = array("I", by_cinema)
+        self._cinema_key = array("Q", (_pack(self.movie[i], self.cinema[i], self.start[i]) for i in by_cinema))
+
+    def __len__(self) -> int:
+        return len(self.movie)
+
+    @classmethod
+    def from_catalogue(cls, catalogue: Catalogue) -> "Schedule":
+        """Every cinema screens every catalogue movie at its showtimes, one
+        movie per screen."""
+        movies = list(catalogue.showtime_minutes)
+        cinemas = [
+            (location, letter, name)
+            for location in catalogue.locations
+            for letter, name in catalogue.cinemas_by_location[location].items()
+        ]
+        rows = [
+            (movie_id, cinema_id, start, movie_id + 1)
+            for movie_id, movie in enumerate(movies)
+            for cinema_id in range(len(cinemas))
+            for start in catalogue.showtime_minutes[movie]
+        ]
+        return cls(movies, cinemas, rows)
+
+    def _screening(self, row: int, day: Text) -> Screening:
+        location, letter, name = self.cinemas[self.cinema[row]]
+        return Screening(
+            screening_id(location, letter, self.screen[row], self.start[row], day),
+            self.movies[self.movie[row]], location, letter, name, self.start[row], self.screen[row], day,
+        )
+
+    def next_screenings(
+        self,
+        movie: Text,
+        location: Text,
+        after: int = 0,
+        limit: int = 5,
+        cinema: Optional[Text] = None,
+        day: Optional[date] = None,
+    ) -> List[Screening]:
+        """The first `limit` screenings of `movie` in `location` (optionally
+        one `cinema` letter there) starting at or after minute `after` on
+        `day` (today by default)."""
+        movie_id = self._movie_ids.get(movie)
+        if movie_id is None:
+            return []
+
+        if cinema is not None:
+            cinema_id = self._cinema_ids.get((location, cinema))
+            if cinema_id is None:
+                return []
+            keys, rows = self._cinema_key, self._cinema_rows
+            low, high = _pack(movie_id, cinema_id, after), _pack(movie_id, cinema_id + 1, 0)
+        else:
+            location_id = self._location_ids.get(location)
+            if location_id is None:
+                return []
+            keys, rows = self._location_key, None
+            low, high = _pack(movie_id, location_id, after), _pack(movie_id, location_id + 1, 0)
+
+        begin = bisect_left(keys, low)
+        end = min(bisect_left(keys, high, begin), begin + limit)
+        day = _iso_day(day)
+        return [self._screening(rows[i] if rows is not None else i, day) for i in range(begin, end)]
+
+    def screenings_at(
+        self, movie: Text, location: Text, start: int, day: Optional[date] = None
+    ) -> List[Screening]:
+        """All screenings of `movie` in `location` starting exactly at `start`
+        on `day` (today by default)."""
+        movie_id, location_id = self._movie_ids.get(movie), self._location_ids.get(location)
+        if movie_id is None or location_id is None:
+            return []
+        key = _pack(movie_id, location_id, start)
+        begin = bisect_left(self._location_key, key)
+        end = bisect_left(self._location_key, key + 1, begin)
+        day = _iso_day(day)
+        return [self._screening(i, day) for i in range(begin, end)]
+
+
+def _pack(movie: int, place: int, start: int) -> int:
+    return (movie << 32) | (place << 16) | start
+
+
+def _iso_day(day: Optional[date]) -> Text:
+    return (day or date.today()).isoformat()
+
+
+_lock = threading.Lock()
+_cached: Tuple[Optional[Catalogue], Optional[Schedule]] = (None, None)
+
+
+def get_schedule() -> Schedule:
+    """Schedule for the current catalogue, rebuilt when the catalogue reloads."""
+    global _cached
+    catalogue = get_catalogue()
+    cached_catalogue, schedule = _cached
+    if cached_catalogue is not catalogue:
+        with _lock:
+            cached_catalogue, schedule = _cached
+            if cached_catalogue is not catalogue:
+                schedule = Schedule.from_catalogue(catalogue)
+                _cached = (catalogue, schedule)
+    return schedule
@@ -0,0 +1,409 @@
+import itertools
+import os
+from abc import ABC, abstractmethod
+from datetime import date
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Text, Tuple
+
+FREE, HELD, SOLD = 0, 1, 2
+
+# How long (seconds) a hold keeps seats away from other users
+DEFAULT_HOLD_TTL = 600.0
+
+# How often (seconds) the in-memory inventory drops expired holds and the
+# halls of screenings that are empty or already past
+SWEEP_INTERVAL = 60.0
+
+SEAT_CODE_PATTERN = re.compile(r"\b([A-Za-z])(\d{1,2})\b")
+
+
+class SeatsUnavailable(Exception):
+    def __init__(self, seats: Sequence[Text]):
+        super().__init__(f"Seats not available: {', '.join(map(str, seats))}")
+        self.seats = list(seats)
+
+
+class SeatMap:
+    """Layout of a hall: lettered rows of numbered seats, each row of one type.
+
+    Seats are addressed by a flat index `row * seats_per_row + (number - 1)`,
+    which is what the inventories store.
+    """
+
+    def __init__(self, rows: Sequence[Tuple[Text, Text]], seats_per_row: int):
+        self.rows = tuple(letter.upper() for letter, _ in rows)
+        self.row_types = tuple(seat_type.lower() for _, seat_type in rows)
+        self.seats_per_row = seats_per_row
+        self.size = len(self.rows) * seats_per_row
+        self._row_index = {letter: i for i, letter in enumerate(self.rows)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[Text, Any]) -> "SeatMap":
+        return cls([tuple(row) for row in data["rows"]], data["seats_per_row"])
+
+    def index(self, code: Text) -> Optional[int]:
+        """Flat index of a seat code like "C7", or None if no such seat."""
+        match = SEAT_CODE_PATTERN.fullmatch(code.strip())
+        if not match:
+            return None
+        row = self._row_index.get(match.group(1).upper())
+        number = int(match.group(2))
+        if row is None or not 1 <= number <= self.seats_per_row:
+            return None
+        return row * self.seats_per_row + number - 1
+
+    def code(self, index: int) -> Text:
+        row, seat = divmod(index, self.seats_per_row)
+        return f"{self.rows[row]}{seat + 1}"
+
+    def seat_type(self, index: int) -> Text:
+        return self.row_types[index // self.seats_per_row]
+
+    def find_codes(self, text: Text) -> List[Text]:
+        """Seat codes mentioned in free text, normalised to "A1" form."""
+        return [f"{letter.upper()}{int(number)}" for letter, number in SEAT_CODE_PATTERN.findall(text)]
+
+
+class SeatInventory(ABC):
+    """Seat states per screening with expiring multi-seat holds.
+
+    A hold takes all requested seats or none of them; `commit` turns a live
+    hold into sold seats and `release` gives them back. Seats of an expired
+    hold count as free again, and committing it fails.
+    """
+
+    @abstractmethod
+    def is_free(self, screening_id: Text, seat: int) -> bool:
+        ...
+
+    @abstractmethod
+    def occupancy(self, screening_id: Text, size: int) -> bytes:
+        """One byte per seat: FREE, HELD or SOLD (expired holds read FREE)."""
+
+    @abstractmethod
+    def hold(self, screening_id: Text, seats: Sequence[int], ttl: float = DEFAULT_HOLD_TTL) -> Text:
+        """Hold `seats` and return the hold id, or raise `SeatsUnavailable`
+        listing the seat indexes that are taken. Holding no seats is a
+        `ValueError`."""
+
+    @abstractmethod
+    def commit(self, hold_id: Text) -> bool:
+        """Sell the seats of a live hold; False if it expired or is unknown."""
+
+    @abstractmethod
+    def release(self, hold_id: Text) -> None:
+        ...
+
+    def version(self, screening_id: Text) -> Optional[int]:
+        """A number that changes whenever the screening's occupancy does, or
+        None if this inventory cannot tell."""
+        return None
+
+
+class _Hall:
+    __slots__ = ("states", "owners", "expires", "version", "next_expiry")
+
+    def __init__(self, size: int):
+        self.states = bytearray(size)
+        self.owners = array("Q", bytes(8 * size))
+        self.expires = array("d", bytes(8 * size))
+        self.version = 0
+        # No live hold of this hall expires before this time
+        self.next_expiry = float("inf")
+
+    def grow(self, size: int) -> None:
+        """Add free seats up to `size`, for a hall that gained seats after a
+        catalogue reload."""
+        extra = size - len(self.states)
+        if extra > 0:
+            self.states.extend(bytes(extra))
+            self.owners.extend(array("Q", bytes(8 * extra)))
+            self.expires.extend(array("d", bytes(8 * extra)))
+
+
+class InMemorySeatInventory(SeatInventory):
+    """Process-local inventory: a byte array of states per screening plus
+    per-seat hold owner and expiry, guarded by one lock.
+
+    Every `SWEEP_INTERVAL` seconds a hold sweeps out expired holds and the
+    halls of screenings that are past or have no taken seats, so a
+    long-running server only keeps what is still live. Halls start at `size`
+    seats and grow when a hold or `resize` asks for more.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._halls: Dict[Text, _Hall] = {}
+        # hold id -> (screening id, seats, expiry)
+        self._holds: Dict[Text, Tuple[Text, Tuple[int, ...], float]] = {}
+        self._serial = itertools.count(1)
+        # Shared by all halls, so a swept and recreated hall never repeats a version
+        self._versions = itertools.count(1)
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def resize(self, size: int) -> None:
+        """Give halls created from now on `size` seats; existing halls grow
+        when a hold reaches past their end."""
+        with self._lock:
+            self.size = size
+
+    def _hall(self, screening_id: Text) -> _Hall:
+        hall = self._halls.get(screening_id)
+        if hall is None:
+            hall = self._halls[screening_id] = _Hall(self.size)
+        return hall
+
+    def is_free(self, screening_id: Text, seat: int) -> bool:
+        hall = self._halls.get(screening_id)
+        if hall is None or seat >= len(hall.states):
+            return True
+        state = hall.states[seat]
+        return state == FREE or (state == HELD and hall.expires[seat] < time.time())
+
+    def occupancy(self, screening_id: Text, size: int) -> bytes:
+        hall = self._halls.get(screening_id)
+        if hall is None:
+            return bytes(size)
+        now = time.time()
+        with self._lock:
+            states = bytearray(hall.states[:size])
+            for seat, state in enumerate(states):
+                if state == HELD and hall.expires[seat] < now:
+                    states[seat] = FREE
+        return bytes(states) + bytes(size - len(states))
+
+    def hold(self, screening_id: Text, seats: Sequence[int], ttl: float = DEFAULT_HOLD_TTL) -> Text:
+        seats = tuple(dict.fromkeys(seats))
+        if not seats:
+            raise ValueError("No seats to hold")
+        now = time.time()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            hall = self._hall(screening_id)
+            hall.grow(max(seats) + 1)
+            taken = [
+                seat for seat in seats
+                if hall.states[seat] == SOLD or (hall.states[seat] == HELD and hall.expires[seat] >= now)
+            ]
+            if taken:
+                raise SeatsUnavailable(taken)
+            serial = next(self._serial)
+            for seat in seats:
+                hall.states[seat] = HELD
+                hall.owners[seat] = serial
+                hall.expires[seat] = now + ttl
+            hall.version = next(self._versions)
+            hall.next_expiry = min(hall.next_expiry, now + ttl)
+            hold_id = f"h{serial}"
+            self._holds[hold_id] = (screening_id, seats, now + ttl)
+        return hold_id
+
+    def commit(self, hold_id: Text) -> bool:
+        now = time.time()
+        with self._lock:
+            screening_id, seats, _ = self._holds.pop(hold_id, (None, (), 0.0))
+            if screening_id is None:
+                return False
+            serial = int(hold_id[1:])
+            hall = self._halls[screening_id]
+            if not all(
+                hall.states[seat] == HELD and hall.owners[seat] == serial and hall.expires[seat] >= now
+                for seat in seats
+            ):
+                self._release(hall, serial, seats)
+                return False
+            for seat in seats:
+                hall.states[seat] = SOLD
+            hall.version = next(self._versions)
+        return True
+
+    def release(self, hold_id: Text) -> None:
+        with self._lock:
+            screening_id, seats, _ = self._holds.pop(hold_id, (None, (), 0.0))
+            if screening_id is not None:
+                self._release(self._halls[screening_id], int(hold_id[1:]), seats)
+
+    def _sweep(self, now: float) -> None:
+        """Drop expired holds and the halls of past or empty screenings.
+        Called with the lock held."""
+        self._next_sweep = now + SWEEP_INTERVAL
+        today = date.today().isoformat()
+        for hold_id, (screening_id, seats, expires) in list(self._holds.items()):
+            if expires < now or is_past_screening(screening_id, today):
+                del self._holds[hold_id]
+                self._release(self._halls[screening_id], int(hold_id[1:]), seats)
+        for screening_id, hall in list(self._halls.items()):
+            if is_past_screening(screening_id, today) or hall.states.count(FREE) == len(hall.states):
+                del self._halls[screening_id]
+
+    def _release(self, hall: _Hall, serial: int, seats: Iterable[int]) -> None:
+        for seat in seats:
+            if hall.states[seat] == HELD and hall.owners[seat] == serial:
+                hall.states[seat] = FREE
+        hall.version = next(self._versions)
+
+    def version(self, screening_id: Text) -> Optional[int]:
+        hall = self._halls.get(screening_id)
+        if hall is None:
+            return 0
+        now = time.time()
+        if now > hall.next_expiry:
+            # A hold ran out, which frees its seats without any call to us
+            with self._lock:
+                if now > hall.next_expiry:
+                    hall.version = next(self._versions)
+                    hall.next_expiry = min(
+                        (hall.expires[seat] for seat, state in enumerate(hall.states)
+                         if state == HELD and hall.expires[seat] >= now),
+                        default=float("inf"),
+                    )
+        return hall.version
+
+
+def is_past_screening(screening_id: Text, today: Optional[Text] = None) -> bool:
+    """Whether the ISO date leading a screening id is before `today`."""
+    day = screening_id.split("|", 1)[0]
+    return len(day) == 10 and day < (today or date.today().isoformat())
+
+
+class SQLiteSeatInventory(SeatInventory):
+    """Inventory shared by several action-server workers through SQLite.
+
+    Only taken seats have rows. Holds and commits run inside
+    `BEGIN IMMEDIATE` transactions, so concurrent workers cannot both take
+    the same seat.
+    """
+
+    def __init__(self, path: Text, timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connection() as db:
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS seats (
+                    screening_id TEXT NOT NULL,
+                    seat INTEGER NOT NULL,
+                    state INTEGER NOT NULL,
+                    hold_id TEXT,
+                    expires_at REAL,
+                    PRIMARY KEY (screening_id, seat)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS seats_by_hold ON seats (hold_id);
+                CREATE TABLE IF NOT EXISTS holds (
+                    hold_id TEXT PRIMARY KEY,
+                    seat_count INTEGER NOT NULL
+                );
+            """)
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def is_free(self, screening_id: Text, seat: int) -> bool:
+        row = self._connection().execute(
+            "SELECT state, expires_at FROM seats WHERE screening_id = ? AND seat = ?",
+            (screening_id, seat),
+        ).fetchone()
+        return row is None or (row[0] == HELD and row[1] < time.time())
+
+    def occupancy(self, screening_id: Text, size: int) -> bytes:
+        states = bytearray(size)
+        now = time.time()
+        for seat, state, expires_at in self._connection().execute(
+            "SELECT seat, state, expires_at FROM seats WHERE screening_id = ?", (screening_id,)
+        ):
+            if state == SOLD or expires_at >= now:
+                states[seat] = state
+        return bytes(states)
+
+    def hold(self, screening_id: Text, seats: Sequence[int], ttl: float = DEFAULT_HOLD_TTL) -> Text:
+        seats = tuple(dict.fromkeys(seats))
+        if not seats:
+            raise ValueError("No seats to hold")
+        now = time.time()
+        hold_id = uuid.uuid4().hex
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            placeholders = ",".join("?" * len(seats))
+            taken = [seat for seat, in db.execute(
+                f"SELECT seat FROM seats WHERE screening_id = ? AND seat IN ({placeholders})"
+                " AND (state = ? OR expires_at >= ?)",
+                (screening_id, *seats, SOLD, now),
+            )]
+            if taken:
+                raise SeatsUnavailable(taken)
+            db.executemany(
+                "INSERT OR REPLACE INTO seats (screening_id, seat, state, hold_id, expires_at) VALUES (?, ?, ?, ?, ?)",
+                [(screening_id, seat, HELD, hold_id, now + ttl) for seat in seats],
+            )
+            db.execute("INSERT INTO holds (hold_id, seat_count) VALUES (?, ?)", (hold_id, len(seats)))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return hold_id
+
+    def commit(self, hold_id: Text) -> bool:
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT seat_count FROM holds WHERE hold_id = ?", (hold_id,)).fetchone()
+            db.execute("DELETE FROM holds WHERE hold_id = ?", (hold_id,))
+            live = db.execute(
+                "SELECT count(*) FROM seats WHERE hold_id = ? AND state = ? AND expires_at >= ?",
+                (hold_id, HELD, time.time()),
+            ).fetchone()[0]
+            if row is None or live != row[0]:
+                db.execute("DELETE FROM seats WHERE hold_id = ? AND state = ?", (hold_id, HELD))
+                db.execute("COMMIT")
+                return False
+            db.execute("UPDATE seats SET state = ?, expires_at = NULL WHERE hold_id = ?", (SOLD, hold_id))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return True
+
+    def release(self, hold_id: Text) -> None:
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("DELETE FROM seats WHERE hold_id = ? AND state = ?", (hold_id, HELD))
+            db.execute("DELETE FROM holds WHERE hold_id = ?", (hold_id,))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+
+_inventory: Optional[SeatInventory] = None
+_inventory_lock = threading.Lock()
+
+
+def get_inventory(size: int) -> SeatInventory:
+    """The process-wide inventory: SQLite at $SEAT_INVENTORY_DB when set (needed
+    with several action-server workers), in-memory otherwise. A larger `size`
+    than before, after a catalogue reload enlarged the hall, grows the
+    in-memory halls."""
+    global _inventory
+    if _inventory is None:
+        with _inventory_lock:
+            if _inventory is None:
+                path = os.getenv("SEAT_INVENTORY_DB")
+                _inventory = SQLiteSeatInventory(path) if path else InMemorySeatInventory(size)
+    if isinstance(_inventory, InMemorySeatInventory) and size > _inventory.size:
+        _inventory.resize(size)
+    return _inventory
@@ -0,0 +1,40 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Text, Tuple
+
+
+class SingleFlight:
+    """Collapses concurrent identical async calls into one.
+
+    The first caller for a key starts the call; everyone who asks for the
+    same key while it is running awaits that same call and gets its result
+    (or exception). The call runs as its own task, so one caller being
+    cancelled does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Tuple[int, Hashable], asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        # Tasks belong to one loop, so flights are kept per loop
+        flight = (id(loop), key)
+        task = self._flights.get(flight)
+        if task is None:
+            task = loop.create_task(call())
+            self._flights[flight] = task
+            task.add_done_callback(lambda done: self._land(flight, done))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _land(self, flight: Tuple[int, Hashable], task: asyncio.Task) -> None:
+        if self._flights.get(flight) is task:
+            del self._flights[flight]
+        if not task.cancelled():
+            task.exception()  # callers see it; don't warn if they all left
+
+    def stats(self) -> Dict[Text, int]:
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._flights)}
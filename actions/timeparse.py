@@ -0,0 +1,166 @@
+import re
+from array import array
+from bisect import bisect_left
+from typing import NamedTuple, Optional, Sequence, Text
+
+MINUTES_PER_DAY = 24 * 60
+
+# Named parts of the day as [start, end) minute ranges
+DAY_PARTS = {
+    "morning": (6 * 60, 12 * 60),
+    "noon": (11 * 60 + 30, 13 * 60 + 30),
+    "lunchtime": (11 * 60 + 30, 14 * 60),
+    "afternoon": (12 * 60, 17 * 60),
+    "evening": (17 * 60, 21 * 60),
+    "tonight": (17 * 60, MINUTES_PER_DAY),
+    "night": (19 * 60, MINUTES_PER_DAY),
+    "midnight": (23 * 60, MINUTES_PER_DAY),
+}
+
+_EARLIEST = re.compile(r"\b(?:earliest|first|soonest|earlier one)\b")
+_LATEST = re.compile(r"\b(?:latest|last|later one)\b")
+_CLOCK = re.compile(
+    r"\b(?P<hour>\d{1,2})(?:[:.](?P<minute>\d{2}))?\s*(?P<meridiem>[ap])\.?\s?m\b\.?"
+    r"|\b(?P<hour24>\d{1,2})[:h](?P<minute24>\d{2})\b"
+)
+_APPROX = re.compile(r"\b(?:around|about|roughly|approximately)\b|ish\b")
+_AFTER = re.compile(r"\b(?:after|from|later than)\s*$")
+_BEFORE = re.compile(r"\b(?:before|until|by|earlier than)\s*$")
+_DAY_PART = re.compile(r"\b(" + "|".join(DAY_PARTS) + r")\b")
+
+
+class TimeQuery(NamedTuple):
+    """A parsed time expression; minutes count from midnight.
+
+    `kind` is "exact", "approx", "range", "before", "earliest" or "latest".
+    Ranges are half-open `[start, end)`; "before" is the range up to a time,
+    where the showtime closest to that time is wanted. For the other kinds
+    `start == end`.
+    `ambiguous` marks clock times without am/pm ("5:00"), which may also
+    mean twelve hours later.
+    """
+    kind: Text
+    start: int = 0
+    end: int = 0
+    ambiguous: bool = False
+
+
+def parse_clock(value: Text) -> int:
+    """Parse a catalogue time like "07:00 PM" into minutes since midnight."""
+    query = parse_time_expression(value)
+    if query is None or query.kind not in ("exact", "approx"):
+        raise ValueError(f"Not a clock time: {value!r}")
+    return query.start
+
+
+def format_minutes(minutes: int) -> Text:
+    """Format minutes since midnight the way showtimes are shown: "07:00 PM"."""
+    hour, minute = divmod(minutes % MINUTES_PER_DAY, 60)
+    return f"{(hour % 12) or 12:02d}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+def parse_time_expression(text: Text) -> Optional[TimeQuery]:
+    """Map free text such as "17:00", "5pm-ish", "evening" or "the earliest
+    one" to a `TimeQuery`, or None if it names no time."""
+    text = text.lower()
+
+    clock = _CLOCK.search(text)
+    if clock:
+        if clock.group("hour") is not None:
+            hour, minute = int(clock.group("hour")), int(clock.group("minute") or 0)
+            if not 1 <= hour <= 12 or minute > 59:
+                return None
+            hour = hour % 12 + (12 if clock.group("meridiem") == "p" else 0)
+            ambiguous = False
+        else:
+            hour, minute = int(clock.group("hour24")), int(clock.group("minute24"))
+            if hour > 23 or minute > 59:
+                return None
+            ambiguous = 1 <= hour <= 11
+        minutes = hour * 60 + minute
+
+        before = text[:clock.start()]
+        if _AFTER.search(before):
+            return TimeQuery("range", minutes + 1, MINUTES_PER_DAY)
+        if _BEFORE.search(before):
+            return TimeQuery("before", 0, minutes)
+        kind = "approx" if _APPROX.search(text) else "exact"
+        return TimeQuery(kind, minutes, minutes, ambiguous)
+
+    if _EARLIEST.search(text):
+        return TimeQuery("earliest")
+    if _LATEST.search(text):
+        return TimeQuery("latest")
+
+    part = _DAY_PART.search(text)
+    if part:
+        start, end = DAY_PARTS[part.group(1)]
+        return TimeQuery("range", start, end)
+    return None
+
+
+def minutes_array(times: Sequence[Text]) -> array:
+    """Sorted array of minutes for the given catalogue time strings."""
+    return array("H", sorted(parse_clock(time) for time in times))
+
+
+def nearest(minutes: Sequence[int], target: int) -> Optional[int]:
+    """Index of the value in sorted `minutes` closest to `target`."""
+    if not minutes:
+        return None
+    index = bisect_left(minutes, target)
+    if index == 0:
+        return 0
+    if index == len(minutes):
+        return index - 1
+    return index if minutes[index] - target < target - minutes[index - 1] else index - 1
+
+
+def first_in_range(minutes: Sequence[int], start: int, end: int) -> Optional[int]:
+    """Index of the first value in sorted `minutes` within `[start, end)`."""
+    index = bisect_left(minutes, start)
+    return index if index < len(minutes) and minutes[index] < end else None
+
+
+def last_in_range(minutes: Sequence[int], start: int, end: int) -> Optional[int]:
+    """Index of the last value in sorted `minutes` within `[start, end)`."""
+    index = bisect_left(minutes, end) - 1
+    return index if index >= 0 and minutes[index] >= start else None
+
+
+def resolve(minutes: Sequence[int], query: TimeQuery, tolerance: int = 90) -> Optional[int]:
+    """Index of the showtime in sorted `minutes` that `query` asks for.
+
+    Exact times must match (trying +12h for ambiguous ones), approximate
+    times take the nearest showtime within `tolerance` minutes. Ranges take
+    their first showtime, except "before 5pm", which takes the last one
+    before 5pm.
+    """
+    if not minutes:
+        return None
+    if query.kind == "earliest":
+        return 0
+    if query.kind == "latest":
+        return len(minutes) - 1
+    if query.kind == "range":
+        return first_in_range(minutes, query.start, query.end)
+    if query.kind == "before":
+        return last_in_range(minutes, query.start, query.end)
+
+    targets = [query.start]
+    if query.ambiguous:
+        targets.append(query.start + 12 * 60)
+    if query.kind == "exact":
+        for target in targets:
+            index = bisect_left(minutes, target)
+            if index < len(minutes) and minutes[index] == target:
+                return index
+        return None
+
+    best = None
+    for target in targets:
+        index = nearest(minutes, target)
+        distance = abs(minutes[index] - target)
+        if distance <= tolerance and (best is None or distance < best[0]):
+            best = (distance, index)
+    return best[1] if best else None
@@ -0,0 +1,199 @@
+import asyncio
+import atexit
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Text
+
+import aiohttp
+
+from actions.cache import TTLCache
+from actions.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# What a failed search can raise: network errors, timeouts, and a body that
+# isn't the JSON we expect (an HTML error page from a proxy, say)
+FETCH_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, ValueError)
+
+DEFAULT_BASE_URL = "https://api.themoviedb.org/3"
+DEFAULT_CACHE_PATH = os.path.join(".cache", "tmdb_search.json.gz")
+
+
+class TMDBClient:
+    """Shared TMDB client with a persistent connection pool.
+
+    All searches of one action go out concurrently over the same pooled
+    connections, so the action costs about one round trip no matter how
+    many titles it asks for.
+
+    Results are kept in a `TTLCache` keyed by the normalised query. Stale
+    entries are answered immediately and refreshed in the background, and
+    the cache is snapshotted to `cache_path` so it survives restarts.
+
+    Concurrent searches for the same query (a promo spike, or one title
+    listed twice) share a single in-flight request.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[Text] = None,
+        base_url: Optional[Text] = None,
+        timeout: float = 5.0,
+        max_connections: int = 20,
+        cache: Optional[TTLCache] = None,
+        cache_path: Optional[Text] = None,
+        negative_ttl: float = 300.0,
+        snapshot_interval: float = 60.0,
+    ):
+        self.api_key = api_key if api_key is not None else os.getenv("TMDB_API_KEY", "")
+        self.base_url = (base_url or os.getenv("TMDB_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.cache = cache if cache is not None else TTLCache(maxsize=2048, ttl=6 * 3600, stale_ttl=7 * 86400)
+        self.cache_path = cache_path
+        self.negative_ttl = negative_ttl
+        self.snapshot_interval = snapshot_interval
+        self._last_snapshot = time.monotonic()
+        self._snapshot_pending = False
+        self._flights = SingleFlight()
+        self._refreshing: Set[Text] = set()
+        self._background: Set[asyncio.Task] = set()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop = None
+
+        if self.cache_path:
+            self.cache.load(self.cache_path)
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # A session is bound to the loop it was created on, so re-create it
+        # if the action server hands us a different loop (e.g. in scripts).
+        loop = asyncio.get_running_loop()
+        if self._session is not None and (self._session.closed or self._session_loop is not loop):
+            # Dropped before closing it, so concurrent searches don't close it twice
+            stale, stale_loop = self._session, self._session_loop
+            self._session = None
+            if not stale.closed:
+                await self._close_stale_session(stale, stale_loop)
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                ttl_dns_cache=300,
+                keepalive_timeout=30,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._session_loop = loop
+        return self._session
+
+    @staticmethod
+    async def _close_stale_session(session: aiohttp.ClientSession, loop: asyncio.AbstractEventLoop) -> None:
+        # Closed on its own loop when that loop still runs in another thread
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+            return
+        try:
+            await session.close()
+        except RuntimeError as e:
+            # Its loop is closed; the sockets went with it
+            logger.debug(f"Could not close the previous TMDB session cleanly: {e}")
+
+    async def search_movie(self, query: Text) -> Optional[Dict[Text, Any]]:
+        """Return the best TMDB search hit for `query`, or None."""
+        key = " ".join(query.lower().split())
+        found, value, fresh = self.cache.lookup(key)
+        if found:
+            if not fresh and key not in self._refreshing:
+                self._refresh_in_background(key, query)
+            return value
+
+        try:
+            return await self._flights.do(key, lambda: self._fetch_and_store(key, query))
+        except FETCH_ERRORS as e:
+            logger.warning(f"TMDB search for '{query}' failed: {e}")
+            return None
+
+    async def _fetch_and_store(self, key: Text, query: Text) -> Optional[Dict[Text, Any]]:
+        result = await self._fetch(query)
+        self._store(key, result)
+        return result
+
+    async def _fetch(self, query: Text) -> Optional[Dict[Text, Any]]:
+        session = await self._get_session()
+        params = {"api_key": self.api_key, "query": query}
+        async with session.get(f"{self.base_url}/search/movie", params=params) as response:
+            response.raise_for_status()
+            payload = await response.json(content_type=None)
+
+        if not isinstance(payload, dict):
+            raise ValueError(f"unexpected TMDB response: {type(payload).__name__}")
+        results = payload.get("results", [])
+        return results[0] if results else None
+
+    def _store(self, key: Text, result: Optional[Dict[Text, Any]]) -> None:
+        # Empty results are cached too, but only briefly
+        self.cache.set(key, result, ttl=None if result else self.negative_ttl)
+        if (
+            self.cache_path
+            and not self._snapshot_pending
+            and time.monotonic() - self._last_snapshot >= self.snapshot_interval
+        ):
+            self._save_cache_in_background()
+
+    def _save_cache_in_background(self) -> None:
+        # Compressing and writing the snapshot would hold up every other
+        # conversation on the loop, so it happens on a worker thread
+        self._last_snapshot = time.monotonic()
+        self._snapshot_pending = True
+        future = asyncio.get_running_loop().run_in_executor(None, self.save_cache)
+        future.add_done_callback(lambda _: setattr(self, "_snapshot_pending", False))
+
+    def _refresh_in_background(self, key: Text, query: Text) -> None:
+        async def refresh() -> None:
+            try:
+                await self._flights.do(key, lambda: self._fetch_and_store(key, query))
+            except FETCH_ERRORS as e:
+                # Keep serving the stale entry until a refresh succeeds
+                logger.debug(f"Background refresh of '{query}' failed: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        self._refreshing.add(key)
+        task = asyncio.get_running_loop().create_task(refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def save_cache(self) -> None:
+        if not self.cache_path:
+            return
+        self._last_snapshot = time.monotonic()
+        try:
+            self.cache.save(self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write TMDB cache snapshot {self.cache_path}: {e}")
+
+    async def search_movies(self, queries: Iterable[Text]) -> List[Optional[Dict[Text, Any]]]:
+        """Search all `queries` concurrently, keeping their order."""
+        return list(await asyncio.gather(*(self.search_movie(query) for query in queries)))
+
+    def stats(self) -> Dict[Text, Any]:
+        return {"cache": self.cache.stats(), "requests": self._flights.stats()}
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+_client: Optional[TMDBClient] = None
+
+
+def get_client() -> TMDBClient:
+    """Return the process-wide TMDB client."""
+    global _client
+    if _client is None:
+        _client = TMDBClient(cache_path=os.getenv("TMDB_CACHE_PATH", DEFAULT_CACHE_PATH))
+        atexit.register(_client.save_cache)
+    return _client
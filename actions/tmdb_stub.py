@@ -0,0 +1,104 @@
+"""Local stand-in for the TMDB search endpoint, for offline runs and benchmarks.
+
+Serve it and point the action server at it:
+
+    python -m actions.tmdb_stub --port 8089 --delay 0.2
+    TMDB_BASE_URL=http://127.0.0.1:8089/3 rasa run actions
+
+Or compare the old serial fetch with the pooled concurrent client:
+
+    python -m actions.tmdb_stub --bench --delay 0.2 --titles 8
+"""
+import argparse
+import asyncio
+import time
+from typing import Text
+
+from aiohttp import web
+
+from actions.movies import get_movie_index
+from actions.tmdb import TMDBClient
+
+
+def make_app(delay: float = 0.0) -> web.Application:
+    async def search_movie(request: web.Request) -> web.Response:
+        query = request.query.get("query", "")
+        if delay:
+            await asyncio.sleep(delay)
+        results = []
+        if query:
+            # Known movies come back with their real year, as TMDB would
+            movie = get_movie_index().get(query)
+            results.append({
+                "id": abs(hash(query)) % 1_000_000,
+                "title": query,
+                "release_date": f"{movie.year}-01-01" if movie and movie.year else "",
+                "overview": f"Stub overview for {query}.",
+                "poster_path": f"/{query.lower().replace(' ', '_')}.jpg",
+            })
+        return web.json_response({"page": 1, "results": results, "total_results": len(results)})
+
+    app = web.Application()
+    app.router.add_get("/3/search/movie", search_movie)
+    return app
+
+
+async def _start(host: Text, port: int, delay: float) -> web.AppRunner:
+    runner = web.AppRunner(make_app(delay))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def _bench(host: Text, port: int, delay: float, titles: int, rounds: int) -> None:
+    import requests
+
+    runner = await _start(host, port, delay)
+    base_url = f"http://{host}:{port}/3"
+    queries = [f"Movie {i}" for i in range(titles)]
+    client = TMDBClient(api_key="stub", base_url=base_url)
+
+    def serial() -> None:
+        for query in queries:
+            requests.get(f"{base_url}/search/movie", params={"api_key": "stub", "query": query}).json()
+
+    try:
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await loop.run_in_executor(None, serial)
+        serial_time = (time.perf_counter() - start) / rounds
+
+        await client.search_movies(queries)  # warm the pool
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await client.search_movies(queries)
+        pooled_time = (time.perf_counter() - start) / rounds
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+    print(f"{titles} titles, {delay * 1000:.0f} ms server delay, {rounds} rounds")
+    print(f"serial requests.get: {serial_time * 1000:8.1f} ms/action")
+    print(f"pooled concurrent:   {pooled_time * 1000:8.1f} ms/action")
+    print(f"speedup:             {serial_time / pooled_time:8.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before each response")
+    parser.add_argument("--bench", action="store_true", help="run the serial vs pooled comparison and exit")
+    parser.add_argument("--titles", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.bench:
+        asyncio.run(_bench(args.host, args.port, args.delay, args.titles, args.rounds))
+    else:
+        web.run_app(make_app(args.delay), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
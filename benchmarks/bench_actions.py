@@ -0,0 +1,367 @@
+"""Microbenchmarks for every custom action, against a stored baseline.
+
+    python -m benchmarks.bench_actions                      # run and compare
+    python -m benchmarks.bench_actions --save-baseline      # record this machine
+    python -m benchmarks.bench_actions --only set_movie --min-time 2
+
+Each scenario drives one action with a representative message and slots
+through a `FakeTracker` and `FakeDispatcher`; TMDB is the local stub from
+`actions.tmdb_stub`, bookings go to a throwaway SQLite file and seat holds
+are released after each call. Per scenario it reports calls per second
+and p50/p99 latency from the best of a few timed rounds, and from a
+separate tracemalloc pass the peak bytes allocated by one call and the
+bytes it leaves behind.
+
+With a baseline (benchmarks/baseline.json by default) each scenario is
+compared to it, and the run exits with status 1 if its p50, throughput
+or peak allocation regressed by more than --tolerance plus a small
+absolute slack; a p99 beyond twice that is reported but doesn't fail.
+Baselines are per machine: record one with --save-baseline on the
+machine that runs the comparison, and widen --tolerance on shared or
+single-core ones. Set ACTION_METRICS=1 to benchmark the instrumented
+actions instead.
+"""
+import argparse
+import asyncio
+import inspect
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Text, Tuple
+
+from benchmarks.fakes import FakeDispatcher, FakeTracker
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Changes smaller than these are noise: timer jitter and the odd cache miss
+# on microsecond calls, free lists and interned strings for allocations
+LATENCY_SLACK_US = 2.0
+ALLOCATION_SLACK = 1024
+
+
+class Scenario(NamedTuple):
+    name: Text
+    action: Any
+    text: Text = ""
+    slots: Dict[Text, Any] = {}
+    intent: Optional[Text] = None
+    # Extra slots made fresh for each call, outside the timed region
+    prepare: Optional[Callable[[], Dict[Text, Any]]] = None
+    # Undoes a call's side effects given its events, outside the timed region
+    cleanup: Optional[Callable[[List[Dict[Text, Any]]], None]] = None
+
+
+class Result(NamedTuple):
+    calls: int
+    ops_per_sec: float
+    p50_us: float
+    p99_us: float
+    alloc_peak_bytes: int
+    alloc_retained_bytes: int
+
+    def to_dict(self) -> Dict[Text, Any]:
+        return self._asdict()
+
+
+def _percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def _release_holds(events: List[Dict[Text, Any]]) -> None:
+    from actions.catalogue import get_catalogue
+    from actions.seats import get_inventory
+
+    for event in events or ():
+        if event.get("event") == "slot" and event.get("name") == "seat_hold" and event.get("value"):
+            get_inventory(get_catalogue().hall.size).release(event["value"])
+
+
+def build_scenarios() -> List[Scenario]:
+    """Every action in actions.actions, on its common paths."""
+    from actions import actions as a
+    from actions import tmdb
+    from actions.catalogue import get_catalogue
+    from actions.movies import get_movie_index
+    from actions.schedule import get_schedule
+    from actions.seats import get_inventory
+
+    catalogue = get_catalogue()
+    screening = get_schedule().next_screenings("Zodiac", "hong kong", limit=1)[0]
+    now_showing = list(catalogue.showtimes_by_movie)
+    menu = {
+        "query": "",
+        "page": 0,
+        "titles": [movie.title for movie in get_movie_index().page(None, within=now_showing).movies],
+        "first_number": 1,
+    }
+    booking = {
+        "language": "english",
+        "movie": screening.movie,
+        "showtime": catalogue.showtimes(screening.movie)[0],
+        "location": screening.location,
+        "cinema": screening.cinema_name,
+        "screening_id": screening.screening_id,
+        "seat_type": "standard",
+        "number_of_seats": 2,
+        "seat_number": "E5, E6",
+        "seat_numbers": ["E5", "E6"],
+        "payment_option": "visa",
+    }
+    inventory = get_inventory(catalogue.hall.size)
+    hold_ids = itertools.count()
+
+    def cold_tmdb() -> Dict[Text, Any]:
+        tmdb.get_client().cache.clear()
+        return {}
+
+    def fresh_hold() -> Dict[Text, Any]:
+        # A screening of its own per call, since committing sells the seat
+        return {"seat_hold": inventory.hold(f"benchmark|{next(hold_ids)}", [0])}
+
+    return [
+        Scenario("welcome", a.ActionWelcome()),
+        Scenario("ask_language", a.ActionAskLanguage()),
+        Scenario("set_language", a.ActionSetLanguage(), "I'd like to use japanese please"),
+        Scenario("set_language_unknown", a.ActionSetLanguage(), "klingon"),
+        Scenario("detect_booking_keywords", a.ActionDetectBookingKeywords(), "can I book two tickets for tonight"),
+        Scenario("detect_booking_keywords_miss", a.ActionDetectBookingKeywords(), "what's the weather like"),
+        Scenario("recommend_movies_like", a.ActionRecommendMovies(), "something like the matrix", {"language": "english"}),
+        Scenario("recommend_movies_mood", a.ActionRecommendMovies(), "a dark crime thriller", {"language": "english"}),
+        Scenario("fetch_movies", a.ActionFetchMovies(), "I want to book a movie"),
+        Scenario("fetch_movies_query", a.ActionFetchMovies(), "any thrillers with keanu?"),
+        Scenario("fetch_movies_cold_tmdb", a.ActionFetchMovies(), "I want to book a movie", prepare=cold_tmdb),
+        Scenario("send_movie_template", a.ActionSendMovieTemplate()),
+        Scenario("set_movie_number", a.ActionSetMovie(), "2", {"movie_menu": menu}),
+        Scenario("set_movie_name", a.ActionSetMovie(), "inception please", {"movie_menu": menu}),
+        Scenario("set_movie_more", a.ActionSetMovie(), "show me more", {"movie_menu": menu}),
+        Scenario("set_movie_not_showing", a.ActionSetMovie(), "parasite", {"movie_menu": menu}),
+        Scenario("fetch_showtimes", a.ActionFetchShowtimes(), "", {"movie": "Zodiac"}),
+        Scenario("set_showtime_number", a.ActionSetShowtime(), "2", {"movie": "Zodiac"}),
+        Scenario("set_showtime_expression", a.ActionSetShowtime(), "around 7 pm", {"movie": "Zodiac"}),
+        Scenario("set_location", a.ActionSetLocation(), "hong kong"),
+        Scenario("set_location_typo", a.ActionSetLocation(), "in singapor please"),
+        Scenario("fetch_cinemas", a.ActionFetchCinemas(), "", {"location": "hong kong"}),
+        Scenario("fetch_cinemas_screening", a.ActionFetchCinemas(), "",
+                 {k: booking[k] for k in ("location", "movie", "showtime")}),
+        Scenario("set_cinema_letter", a.ActionSetCinema(), "a", {k: booking[k] for k in ("location", "movie", "showtime")}),
+        Scenario("set_cinema_typo", a.ActionSetCinema(), "olympain city",
+                 {k: booking[k] for k in ("location", "movie", "showtime")}),
+        Scenario("ask_seats_type", a.ActionAskSeatsType(), "", {"location": "hong kong"}),
+        Scenario("set_seats_type", a.ActionSetSeatsType(), "vip seats please", {"location": "hong kong"}),
+        Scenario("ask_number_of_seats", a.ActionAskNumberOfSeats()),
+        Scenario("set_number_of_seats", a.ActionSetNumberOfSeats(), "2 seats", booking),
+        Scenario("set_number_of_seats_best", a.ActionSetNumberOfSeats(), "2 seats, best available", booking,
+                 cleanup=_release_holds),
+        Scenario("ask_seat_numbers", a.ActionAskSeatNumbers(), "", booking),
+        Scenario("set_seat_numbers", a.ActionSetSeatNumbers(), "E5 and E6", booking, cleanup=_release_holds),
+        Scenario("set_seat_numbers_mismatch", a.ActionSetSeatNumbers(), "E5", booking),
+        Scenario("ask_confirmation", a.ActionAskConfirmation()),
+        Scenario("set_confirmation", a.ActionSetConfirmation(), "confirm", booking),
+        Scenario("set_confirmation_cancel", a.ActionSetConfirmation(), "cancel", booking, prepare=fresh_hold),
+        Scenario("confirm_booking", a.ActionConfirmBooking(), "confirm", booking),
+        Scenario("detect_payment_option", a.DetectPaymentOption(), "I'll pay by card"),
+        Scenario("tell_online_payment", a.TellOnlinePayment()),
+        Scenario("tell_offline_payment", a.TellOfflinePayment()),
+        Scenario("ask_payment_option", a.ActionAskPaymentOptions()),
+        Scenario("set_payment_option", a.ActionSetPaymentOption(), "paypal please"),
+        Scenario("set_payment_option_unknown", a.ActionSetPaymentOption(), "bitcoin"),
+        Scenario("booking_confirmed", a.ActionBookingConfirmed(), "", booking),
+        Scenario("booking_confirmed_hold", a.ActionBookingConfirmed(), "", booking, prepare=fresh_hold),
+    ]
+
+
+def _inputs(scenario: Scenario) -> Tuple[FakeTracker, FakeDispatcher]:
+    slots = scenario.slots
+    if scenario.prepare:
+        slots = {**slots, **scenario.prepare()}
+    return FakeTracker(scenario.text, slots, scenario.intent), FakeDispatcher()
+
+
+async def _invoke(scenario: Scenario, tracker: FakeTracker, dispatcher: FakeDispatcher) -> List[Dict[Text, Any]]:
+    events = scenario.action.run(dispatcher, tracker, {})
+    if inspect.isawaitable(events):
+        events = await events
+    return events
+
+
+async def _timed_call(scenario: Scenario) -> int:
+    """Run the scenario once; nanoseconds spent in the action."""
+    tracker, dispatcher = _inputs(scenario)
+    started = time.perf_counter_ns()
+    events = await _invoke(scenario, tracker, dispatcher)
+    elapsed = time.perf_counter_ns() - started
+    if scenario.cleanup:
+        scenario.cleanup(events)
+    return elapsed
+
+
+async def measure(
+    scenario: Scenario, min_time: float, min_calls: int, warmup: int, rounds: int, alloc_calls: int
+) -> Result:
+    for _ in range(warmup):
+        await _timed_call(scenario)
+
+    # The round with the lowest median is the one least disturbed by the
+    # rest of the machine
+    timings: List[int] = []
+    for _ in range(max(1, rounds)):
+        round_timings: List[int] = []
+        deadline = time.perf_counter() + min_time
+        while len(round_timings) < min_calls or time.perf_counter() < deadline:
+            round_timings.append(await _timed_call(scenario))
+        round_timings.sort()
+        if not timings or _percentile(round_timings, 0.50) < _percentile(timings, 0.50):
+            timings = round_timings
+
+    # A separate pass, so tracing doesn't slow down the timed calls
+    peaks = []
+    retained = 0
+    tracemalloc.start()
+    try:
+        for _ in range(alloc_calls):
+            tracker, dispatcher = _inputs(scenario)
+            start, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            events = await _invoke(scenario, tracker, dispatcher)
+            peaks.append(tracemalloc.get_traced_memory()[1] - start)
+            if scenario.cleanup:
+                scenario.cleanup(events)
+            # What is still held once the call's inputs and events are gone
+            del tracker, dispatcher, events
+            retained += tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    peaks.sort()
+
+    return Result(
+        calls=len(timings),
+        ops_per_sec=len(timings) * 1e9 / sum(timings),
+        p50_us=_percentile(timings, 0.50) / 1000,
+        p99_us=_percentile(timings, 0.99) / 1000,
+        alloc_peak_bytes=int(_percentile(peaks, 0.50)),
+        alloc_retained_bytes=max(0, retained) // max(1, alloc_calls),
+    )
+
+
+def compare(name: Text, result: Result, baseline: Dict[Text, Any], tolerance: float) -> Tuple[List[Text], List[Text]]:
+    """What regressed in `result` against the baseline entry for `name`, and
+    what only looks worse (p99, too noisy to fail a run on)."""
+    regressions: List[Text] = []
+    warnings: List[Text] = []
+    old = baseline.get(name)
+    if not old:
+        return regressions, warnings
+    if result.p50_us > old["p50_us"] * (1 + tolerance) + LATENCY_SLACK_US:
+        regressions.append(f"p50 {old['p50_us']:.1f} -> {result.p50_us:.1f} us")
+    if result.p99_us > old["p99_us"] * (1 + 2 * tolerance) + LATENCY_SLACK_US:
+        warnings.append(f"p99 {old['p99_us']:.1f} -> {result.p99_us:.1f} us")
+    # Compared as mean time per call, so the slack applies here too
+    if 1e6 / result.ops_per_sec > 1e6 / old["ops_per_sec"] * (1 + tolerance) + LATENCY_SLACK_US:
+        regressions.append(f"ops/s {old['ops_per_sec']:.0f} -> {result.ops_per_sec:.0f}")
+    if result.alloc_peak_bytes > old["alloc_peak_bytes"] * (1 + tolerance) + ALLOCATION_SLACK:
+        regressions.append(f"peak alloc {old['alloc_peak_bytes']} -> {result.alloc_peak_bytes} B")
+    return regressions, warnings
+
+
+def _environment() -> Dict[Text, Any]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "action_metrics": bool(os.getenv("ACTION_METRICS")),
+    }
+
+
+async def _run(args: argparse.Namespace) -> int:
+    from actions.tmdb_stub import _start
+
+    runner = await _start("127.0.0.1", 0, 0.0)
+    host, port = runner.addresses[0][:2]
+    os.environ["TMDB_BASE_URL"] = f"http://{host}:{port}/3"
+    os.environ["TMDB_API_KEY"] = "stub"
+    os.environ["TMDB_CACHE_PATH"] = ""
+    workdir = tempfile.TemporaryDirectory(prefix="action-bench-")
+    os.environ["BOOKINGS_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir.name, 'bookings.db')}"
+    # Seats are held and sold in memory, never in a shared inventory
+    os.environ.pop("SEAT_INVENTORY_DB", None)
+
+    from actions import tmdb
+    from actions.bookings import get_booking_writer
+
+    try:
+        scenarios = [s for s in build_scenarios() if not args.only or any(o in s.name for o in args.only)]
+        baseline: Dict[Text, Any] = {}
+        if not args.save_baseline and os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                stored = json.load(f)
+            baseline = stored["results"]
+            if stored.get("environment") != _environment():
+                print(f"Warning: {args.baseline} was recorded on {stored.get('environment')}", file=sys.stderr)
+
+        results: Dict[Text, Result] = {}
+        failed = []
+        print(f"{'scenario':32} {'ops/s':>10} {'p50 us':>9} {'p99 us':>9} {'peak B':>8} {'kept B':>7}")
+        for scenario in scenarios:
+            result = await measure(
+                scenario, args.min_time, args.min_calls, args.warmup, args.rounds, args.alloc_calls
+            )
+            results[scenario.name] = result
+            regressions, warnings = compare(scenario.name, result, baseline, args.tolerance)
+            if regressions:
+                failed.append(scenario.name)
+                status = "REGRESSED: " + "; ".join(regressions + warnings)
+            elif warnings:
+                status = "slower tail: " + "; ".join(warnings)
+            else:
+                status = "" if not baseline or scenario.name in baseline else "(no baseline)"
+            print(
+                f"{scenario.name:32} {result.ops_per_sec:10.0f} {result.p50_us:9.1f} {result.p99_us:9.1f} "
+                f"{result.alloc_peak_bytes:8d} {result.alloc_retained_bytes:7d}  {status}".rstrip()
+            )
+    finally:
+        await tmdb.get_client().close()
+        await runner.cleanup()
+        get_booking_writer().close()
+        workdir.cleanup()
+
+    report = {"environment": _environment(), "results": {name: r.to_dict() for name, r in results.items()}}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline for {len(results)} scenarios to {args.baseline}")
+    elif not baseline:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+
+    if failed:
+        print(f"{len(failed)} scenario(s) regressed beyond {args.tolerance:.0%}: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="run the scenarios whose name contains NAME")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds of timed calls per round")
+    parser.add_argument("--min-calls", type=int, default=100, help="timed calls per round, at least")
+    parser.add_argument("--rounds", type=int, default=3, help="timed rounds per scenario; the best one counts")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--alloc-calls", type=int, default=100, help="calls traced for allocations")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="record this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression, as a fraction")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_run(args)))
+
+
+if __name__ == "__main__":
+    main()
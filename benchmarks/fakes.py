@@ -0,0 +1,65 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Text
+
+
+class FakeTracker:
+    """The parts of rasa_sdk's `Tracker` the actions use, without its event
+    history, so building one per call costs next to nothing."""
+
+    __slots__ = ("sender_id", "slots", "latest_message")
+
+    def __init__(
+        self,
+        text: Text = "",
+        slots: Optional[Dict[Text, Any]] = None,
+        intent: Optional[Text] = None,
+        entities: Sequence[Dict[Text, Any]] = (),
+        sender_id: Text = "benchmark",
+    ):
+        self.sender_id = sender_id
+        self.slots = dict(slots or {})
+        self.latest_message = {
+            "text": text,
+            "intent": {"name": intent, "confidence": 1.0} if intent else {},
+            "entities": list(entities),
+        }
+
+    def get_slot(self, key: Text) -> Any:
+        return self.slots.get(key)
+
+    def current_slot_values(self) -> Dict[Text, Any]:
+        return dict(self.slots)
+
+    def get_latest_entity_values(
+        self,
+        entity_type: Text,
+        entity_role: Optional[Text] = None,
+        entity_group: Optional[Text] = None,
+    ) -> Iterator[Text]:
+        return (
+            entity.get("value")
+            for entity in self.latest_message["entities"]
+            if entity.get("entity") == entity_type
+            and entity.get("group") == entity_group
+            and entity.get("role") == entity_role
+        )
+
+
+class FakeDispatcher:
+    """Collects what the actions send, like `CollectingDispatcher`."""
+
+    __slots__ = ("messages",)
+
+    def __init__(self):
+        self.messages: List[Dict[Text, Any]] = []
+
+    def utter_message(
+        self,
+        text: Optional[Text] = None,
+        image: Optional[Text] = None,
+        json_message: Optional[Dict[Text, Any]] = None,
+        response: Optional[Text] = None,
+        **kwargs: Any,
+    ) -> None:
+        message = {"text": text, "image": image, "custom": json_message, "response": response}
+        message.update(kwargs)
+        self.messages.append(message)
@@ -1,27 +1,308 @@
-from typing import List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Text, Tuple
 from rasa.engine.recipes.default_recipe import DefaultV1Recipe
 from rasa.engine.graph import GraphComponent
 from rasa.engine.storage.resource import Resource
 from rasa.engine.storage.storage import ModelStorage
+from rasa.shared.core.trackers import DialogueStateTracker
 from rasa.shared.nlu.training_data.message import Message
-from rasa.shared.nlu.constants import TEXT
+from rasa.shared.nlu.training_data.training_data import TrainingData
+from rasa.shared.nlu.constants import (
+    TEXT,
+    INTENT,
+    INTENT_NAME_KEY,
+    INTENT_RANKING_KEY,
+    PREDICTED_CONFIDENCE_KEY,
+    ENTITIES,
+    ENTITY_ATTRIBUTE_TYPE,
+    ENTITY_ATTRIBUTE_VALUE,
+    ENTITY_ATTRIBUTE_START,
+    ENTITY_ATTRIBUTE_END,
+    EXTRACTOR,
+)
+import os
 import re
+import time
+
+# Filler words and "?"/"." are dropped by one compiled pattern; the
+# split/join then collapses the whitespace they leave behind.
+_NOISE = re.compile(r"[?.]|\b(?:p(?:lease|l[sz])|kindly)\b")
+
+
+def normalize_text(text: Text) -> Text:
+    return " ".join(_NOISE.sub("", text.lower()).split())
+
+
+def normalize_with_offsets(text: Text) -> Tuple[Text, Optional[List[Optional[int]]]]:
+    """`normalize_text(text)`, and where each character of `text` ended up in
+    it (None if it was dropped). No positions if lowercasing changed the
+    length of the text, since they can't be traced then."""
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        return normalize_text(text), None
+    dropped = bytearray(len(text))
+    for match in _NOISE.finditer(lowered):
+        dropped[match.start():match.end()] = b"\x01" * (match.end() - match.start())
+
+    # Same result as normalize_text: whitespace runs between words become one space
+    chars: List[Text] = []
+    positions: List[Optional[int]] = [None] * len(text)
+    space = False
+    for i, char in enumerate(lowered):
+        if dropped[i]:
+            continue
+        if char.isspace():
+            space = bool(chars)
+            continue
+        if space:
+            chars.append(" ")
+            space = False
+        positions[i] = len(chars)
+        chars.append(char)
+    return "".join(chars), positions
+
+
+def _remap_entities(entities: List[Dict[Text, Any]], positions: List[Optional[int]]) -> Optional[List[Dict[Text, Any]]]:
+    """The entities with their offsets moved into the normalized text, or None
+    if one of them was dropped entirely."""
+    remapped = []
+    for entity in entities:
+        kept = [
+            position for position in positions[entity[ENTITY_ATTRIBUTE_START]:entity[ENTITY_ATTRIBUTE_END]]
+            if position is not None
+        ]
+        if not kept:
+            return None
+        remapped.append({**entity, ENTITY_ATTRIBUTE_START: kept[0], ENTITY_ATTRIBUTE_END: kept[-1] + 1})
+    return remapped
+
+
+def clean_example(
+    text: Text, entities: Optional[List[Dict[Text, Any]]]
+) -> Tuple[Text, Optional[List[Dict[Text, Any]]]]:
+    """A training example's text and entities after normalization. Annotated
+    spans have to follow the text they point into; an example whose spans
+    can't be moved comes back as it was."""
+    if not entities:
+        return normalize_text(text), entities
+    clean_text, positions = normalize_with_offsets(text)
+    remapped = _remap_entities(entities, positions) if positions is not None else None
+    if remapped is None:
+        return text, entities
+    return clean_text, remapped
+
+
+def _clean_pair(example: Tuple[Text, Optional[List[Dict[Text, Any]]]]):
+    return clean_example(*example)
+
+
+def normalize_batch(
+    examples: List[Tuple[Text, Optional[List[Dict[Text, Any]]]]],
+    workers: Optional[int] = None,
+    chunksize: int = 2048,
+) -> List[Tuple[Text, Optional[List[Dict[Text, Any]]]]]:
+    """`clean_example` over many (text, entities) pairs, spreading them over
+    `workers` processes if > 1."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(examples) <= chunksize:
+        return [clean_example(text, entities) for text, entities in examples]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_clean_pair, examples, chunksize=chunksize))
+
 
 @DefaultV1Recipe.register([GraphComponent], is_trainable=False)
 class CleanInput(GraphComponent):
     def __init__(self, config: dict):
-        self.config = config
+        self.config = {**self.get_default_config(), **config}
+        # Inference traffic is dominated by short replies like "1", "a" or
+        # "confirm", so those are memoised.
+        self._memo_max_length = self.config["memo_max_length"]
+        self._normalize_short = lru_cache(maxsize=self.config["memo_size"])(normalize_text)
+
+    @staticmethod
+    def get_default_config() -> Dict[Text, Any]:
+        return {
+            # entries kept in the inference memo cache
+            "memo_size": 1024,
+            # only texts up to this many characters are memoised
+            "memo_max_length": 32,
+            # worker processes for training data; None uses every CPU
+            "batch_workers": None,
+            # below this many training examples, stay in-process
+            "parallel_min_examples": 20000,
+        }
 
     @staticmethod
     def create(config: dict, model_storage: ModelStorage, resource: Resource):
         return CleanInput(config)
 
+    def _normalize(self, text: Text) -> Text:
+        if len(text) <= self._memo_max_length:
+            return self._normalize_short(text)
+        return normalize_text(text)
+
     def process(self, messages: List[Message]):  # Use typing.List for compatibility
         for message in messages:
-            text = message.get(TEXT, "")
-            clean_text = re.sub(r'\b(please|pls|plz|kindly)\b', '', text.lower())
-            clean_text = re.sub(r'[?.]', '', clean_text)  # Remove punctuation
-            message.set(TEXT, clean_text.strip())
+            message.set(TEXT, self._normalize(message.get(TEXT, "")))
         return messages
 
+    def process_training_data(self, training_data: TrainingData) -> TrainingData:
+        examples = [example for example in training_data.training_examples if example.get(TEXT)]
+        pairs = [(example.get(TEXT), example.get(ENTITIES)) for example in examples]
+        workers = self.config["batch_workers"] if len(pairs) >= self.config["parallel_min_examples"] else 1
+        for example, (clean_text, entities) in zip(examples, normalize_batch(pairs, workers=workers)):
+            example.set(TEXT, clean_text)
+            if entities:
+                example.set(ENTITIES, entities)
+        return training_data
+
+
+# Closed-form replies from the booking funnel: (intent, pattern, entity type,
+# slot). Patterns are matched against the whole lowercased message; an
+# `entity` group marks the entity value. They mirror the short examples in
+# data/nlu.yml. A bare "2" or "a" may answer the movie menu, the showtimes,
+# the seat count or the cinemas, so rules with a slot only apply while the bot
+# is asking for that slot; the others mean the same thing at every step.
+REPLY_RULES = [
+    ("set_movie", r"\d{1,2}", None, "movie"),
+    ("set_showtime", r"\d{1,2}", None, "showtime"),
+    ("select_cinema", r"[abc]", None, "cinema"),
+    ("select_number_of_seats", r"\d{1,2}", None, "number_of_seats"),
+    ("set_movie", r"movie\s+\d{1,2}", None, None),
+    ("set_movie", r"(?:show\s+(?:me\s+)?)?(?:more|next)(?:\s+(?:movies|page|ones))?", None, None),
+    ("set_showtime", r"showtime\s+\d{1,2}", None, None),
+    ("set_showtime", r"\d{1,2}(?::\d{2})?\s*(?:am|pm|a\.m|p\.m)", None, None),
+    ("select_cinema", r"cinema\s+[abc]", None, None),
+    ("select_seat", r"(?P<entity>vip|standard|couple)(?:\s+seats?)?", "seat_type", None),
+    ("select_number_of_seats", r"\d{1,2}\s+(?:seats?|tickets?|spots?)", None, None),
+    ("select_seat_numbers", r"[a-z]\d{1,2}(?:\s*(?:,|and)?\s*[a-z]\d{1,2})*", None, None),
+    ("select_seat_numbers", r"(?:the\s+)?best(?:\s+(?:seats|available))?", None, None),
+    ("confirm_booking", r"(?:yes,?\s+)?(?P<entity>confirm)(?:\s+(?:it|booking|my booking))?", "decide", None),
+    ("cancel_booking", r"(?P<entity>cancel)(?:\s+(?:it|booking|my booking))?", "decide", None),
+    ("select_payment_option",
+     r"(?P<entity>visa|master|mastercard|paypal|cash|credit card|debit card)(?:\s+card)?", "payment_option", None),
+    ("english", r"english", None, None),
+    ("japanese", r"japanese", None, None),
+    ("chinese", r"chinese", None, None),
+    ("select_location", r"(?P<entity>hong kong|singapore|malaysia|hk|sg)", "location", None),
+]
+
+
+def _compile_rules(rules):
+    # One alternation with a named group per rule; `lastgroup` tells which
+    # rule matched, so routing is a single regex call.
+    parts = []
+    for index, (_, pattern, _, _) in enumerate(rules):
+        pattern = pattern.replace("(?P<entity>", f"(?P<e{index}>")
+        parts.append(f"(?P<r{index}>{pattern})")
+    return re.compile("|".join(parts))
+
+
+@DefaultV1Recipe.register(
+    [DefaultV1Recipe.ComponentType.INTENT_CLASSIFIER, DefaultV1Recipe.ComponentType.ENTITY_EXTRACTOR],
+    is_trainable=False,
+)
+class ReplyIntentRouter(GraphComponent):
+    """Deterministic intents for the tiny replies of the booking funnel.
+
+    Rasa runs every pipeline node, so this doesn't save the classifier any
+    work: list it after the classifier, where on a hit it replaces the
+    model's prediction with a confident one and on a miss it leaves the
+    message alone. Bare numbers and letters are read against the slot the
+    bot asked for, which Rasa passes in as the conversation tracker.
+    """
+
+    def __init__(self, config: dict):
+        self.config = {**self.get_default_config(), **config}
+        # The rules that apply while each slot is requested, slot-specific ones first
+        shared = [rule for rule in REPLY_RULES if rule[3] is None]
+        self._routes = {None: (shared, _compile_rules(shared))}
+        for slot in {rule[3] for rule in REPLY_RULES} - {None}:
+            rules = [rule for rule in REPLY_RULES if rule[3] == slot] + shared
+            self._routes[slot] = (rules, _compile_rules(rules))
+        self.hits = 0
+        self.misses = 0
+        self._route_times = deque(maxlen=self.config["latency_window"])
+
+    @staticmethod
+    def get_default_config() -> Dict[Text, Any]:
+        return {
+            # confidence reported for fast-path intents
+            "confidence": 1.0,
+            # number of recent messages kept for the latency percentiles
+            "latency_window": 2048,
+            # slot holding the name of the slot the bot is asking for
+            "active_slot": "requested_slot",
+        }
+
+    @staticmethod
+    def create(config: dict, model_storage: ModelStorage, resource: Resource):
+        return ReplyIntentRouter(config)
+
+    def route(self, text: Text, active_slot: Optional[Text] = None) -> Optional[Dict[Text, Any]]:
+        """Return `{"intent", "entities"}` for a closed-form reply to a question
+        about `active_slot`, else None."""
+        rules, pattern = self._routes.get(active_slot, self._routes[None])
+        stripped = text.strip()
+        offset = len(text) - len(text.lstrip())
+        match = pattern.fullmatch(stripped.lower().rstrip(".!?"))
+        if not match:
+            return None
+
+        index = int(match.lastgroup[1:])
+        intent, _, entity_type, _ = rules[index]
+        entities = []
+        if entity_type:
+            start, end = match.span(f"e{index}")
+            entities.append({
+                ENTITY_ATTRIBUTE_TYPE: entity_type,
+                ENTITY_ATTRIBUTE_VALUE: stripped[start:end],
+                ENTITY_ATTRIBUTE_START: start + offset,
+                ENTITY_ATTRIBUTE_END: end + offset,
+                EXTRACTOR: self.__class__.__name__,
+            })
+        return {"intent": intent, "entities": entities}
+
+    def process(self, messages: List[Message], tracker: Optional[DialogueStateTracker] = None):
+        active_slot = tracker.get_slot(self.config["active_slot"]) if tracker else None
+        for message in messages:
+            start = time.perf_counter()
+            routed = self.route(message.get(TEXT, ""), active_slot)
+            self._route_times.append(time.perf_counter() - start)
+
+            if routed is None:
+                self.misses += 1
+                continue
+
+            self.hits += 1
+            intent = {INTENT_NAME_KEY: routed["intent"], PREDICTED_CONFIDENCE_KEY: self.config["confidence"]}
+            message.set(INTENT, intent, add_to_output=True)
+            message.set(INTENT_RANKING_KEY, [intent], add_to_output=True)
+            if routed["entities"]:
+                # Keep what other extractors found, minus clashing entity types
+                types = {entity[ENTITY_ATTRIBUTE_TYPE] for entity in routed["entities"]}
+                entities = [
+                    entity for entity in message.get(ENTITIES, [])
+                    if entity.get(ENTITY_ATTRIBUTE_TYPE) not in types
+                ]
+                message.set(ENTITIES, entities + routed["entities"], add_to_output=True)
+        return messages
+
+    def stats(self) -> Dict[Text, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "route_p50_ms": _median(self._route_times) * 1000,
+        }
+
 
+def _median(samples) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[len(ordered) // 2]
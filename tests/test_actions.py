@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("rasa_sdk")
+
+from actions import actions  # noqa: E402
+from actions.catalogue import get_catalogue  # noqa: E402
+from actions.schedule import get_schedule  # noqa: E402
+from benchmarks.fakes import FakeDispatcher, FakeTracker  # noqa: E402
+
+
+@pytest.fixture
+def booking():
+    catalogue = get_catalogue()
+    screening = get_schedule().next_screenings("Zodiac", "hong kong", limit=1)[0]
+    return {
+        "movie": screening.movie,
+        "showtime": catalogue.showtimes(screening.movie)[0],
+        "location": screening.location,
+        "screening_id": screening.screening_id,
+        "seat_type": "standard",
+        "number_of_seats": 2,
+    }
+
+
+def _events(action, text, slots):
+    dispatcher = FakeDispatcher()
+    events = action.run(dispatcher, FakeTracker(text, slots), {})
+    return events, [message["text"] for message in dispatcher.messages]
+
+
+def test_bare_seat_numbers_ask_for_row_letters(booking):
+    events, texts = _events(actions.ActionSetSeatNumbers(), "3 and 4", booking)
+    assert events == [actions.UserUtteranceReverted()]
+    assert "row letter" in texts[0]
+
+
+def test_seat_codes_are_held(booking):
+    events, texts = _events(actions.ActionSetSeatNumbers(), "a3 and a4", booking)
+    slots = {event["name"]: event["value"] for event in events if event.get("event") == "slot"}
+    assert slots["seat_numbers"] == ["A3", "A4"]
+    assert slots["seat_hold"]
+    hall = get_catalogue().hall
+    actions.get_inventory(hall.size).release(slots["seat_hold"])
+
+
+class _FakeTMDB:
+    def __init__(self, results):
+        self.results = results
+
+    async def search_movies(self, titles):
+        return [self.results.get(title) for title in titles]
+
+
+def test_movie_menu_uses_tmdb_only_for_the_same_movie(monkeypatch):
+    index = actions.get_movie_index()
+    zodiac, constantine = index.get("Zodiac"), index.get("Constantine")
+    monkeypatch.setattr(actions.tmdb, "get_client", lambda: _FakeTMDB({
+        "Zodiac": {"title": "Zodiac", "release_date": "2007-03-02", "overview": "TMDB Zodiac."},
+        "Constantine": {"title": "Constantine", "release_date": "2019-01-01", "overview": "Someone else."},
+    }))
+    page = actions.movies.MoviePage([zodiac, constantine], 0, 2, 5)
+    dispatcher = FakeDispatcher()
+    asyncio.run(actions._show_movie_menu(dispatcher, "", page))
+    texts = [message["text"] for message in dispatcher.messages if message["text"]]
+    assert texts[0].endswith("Description: TMDB Zodiac.")
+    assert texts[1].endswith(f"Description: {constantine.overview}")
+
+
+def test_recommender_loads_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def get_recommender():
+        threads.append(threading.current_thread())
+        return None
+
+    monkeypatch.setattr(actions, "get_recommender", get_recommender)
+    dispatcher = FakeDispatcher()
+    events = asyncio.run(actions.ActionRecommendMovies().run(
+        dispatcher, FakeTracker("something like zodiac", {"language": "english"}), {},
+    ))
+    assert threads and threads[0] is not threading.main_thread()
+    assert "popular" in dispatcher.messages[0]["text"]
+    assert events == [actions.FollowupAction("action_fetch_movies")]
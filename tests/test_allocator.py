@@ -0,0 +1,116 @@
+from datetime import date, timedelta
+
+import pytest
+
+from actions import allocator as allocator_module
+from actions.allocator import FreeSpanIndex, SeatAllocator, get_allocator
+from actions.seats import HELD, SOLD, InMemorySeatInventory, SeatMap, SQLiteSeatInventory
+
+TODAY = date.today().isoformat()
+SCREENING = f"{TODAY}|hong kong|a|1|600"
+
+
+@pytest.fixture
+def hall():
+    # Rows A-D standard, E-F premium, 8 seats each
+    return SeatMap([(letter, "standard") for letter in "ABCD"] + [("E", "premium"), ("F", "premium")], 8)
+
+
+@pytest.fixture
+def inventory(hall):
+    return InMemorySeatInventory(hall.size)
+
+
+def _codes(hall, seats):
+    return [hall.code(seat) for seat in seats]
+
+
+def test_free_span_index_rescans_changed_rows_only(hall):
+    index = FreeSpanIndex(hall)
+    occupancy = bytearray(hall.size)
+    assert index.refresh(bytes(occupancy)) == 6
+    assert index.spans[0] == [(0, 8)] and index.longest[0] == 8
+
+    occupancy[2] = occupancy[3] = SOLD
+    assert index.refresh(bytes(occupancy)) == 1
+    assert index.spans[0] == [(0, 2), (4, 4)] and index.longest[0] == 4
+    assert index.refresh(bytes(occupancy)) == 0
+
+
+def test_proposes_centre_of_the_ideal_row(hall, inventory):
+    allocator = SeatAllocator(hall, inventory)
+    # Ideal standard row is two thirds back among A-D, i.e. C
+    assert _codes(hall, allocator.propose(SCREENING, "standard", 2)) == ["C4", "C5"]
+    assert _codes(hall, allocator.propose(SCREENING, "Premium", 1)) == ["F5"]
+
+
+def test_unknown_type_or_bad_count(hall, inventory):
+    allocator = SeatAllocator(hall, inventory)
+    assert allocator.propose(SCREENING, "vip", 2) is None
+    assert allocator.propose(SCREENING, "standard", 0) is None
+    assert allocator.propose(SCREENING, "standard", 9) is None
+
+
+def test_proposal_follows_holds_and_releases(hall, inventory):
+    allocator = SeatAllocator(hall, inventory)
+    hold_id = inventory.hold(SCREENING, [hall.index(code) for code in ("C3", "C4", "C5", "C6")])
+    # B and D are equally far from C; the earlier row wins the tie
+    assert _codes(hall, allocator.propose(SCREENING, "standard", 2)) == ["B4", "B5"]
+    inventory.release(hold_id)
+    assert _codes(hall, allocator.propose(SCREENING, "standard", 2)) == ["C4", "C5"]
+
+
+def test_index_is_not_rebuilt_while_the_version_is_unchanged(hall, inventory, monkeypatch):
+    allocator = SeatAllocator(hall, inventory)
+    inventory.hold(SCREENING, [0])
+    allocator.propose(SCREENING, "standard", 2)
+
+    reads = []
+    occupancy = inventory.occupancy
+    monkeypatch.setattr(inventory, "occupancy", lambda *args: reads.append(args) or occupancy(*args))
+    allocator.propose(SCREENING, "standard", 2)
+    allocator.propose(SCREENING, "standard", 3)
+    assert reads == []
+
+    inventory.hold(SCREENING, [1])
+    allocator.propose(SCREENING, "standard", 2)
+    assert len(reads) == 1
+
+
+def test_expired_hold_bumps_the_version(hall, inventory):
+    allocator = SeatAllocator(hall, inventory)
+    centre = [hall.index(code) for code in ("C4", "C5")]
+    inventory.hold(SCREENING, centre, ttl=0.05)
+    assert _codes(hall, allocator.propose(SCREENING, "standard", 2)) != ["C4", "C5"]
+    inventory._halls[SCREENING].expires[centre[0]] = inventory._halls[SCREENING].expires[centre[1]] = 0.0
+    inventory._halls[SCREENING].next_expiry = 0.0
+    assert _codes(hall, allocator.propose(SCREENING, "standard", 2)) == ["C4", "C5"]
+
+
+def test_inventory_without_versions_is_always_reread(hall, tmp_path):
+    inventory = SQLiteSeatInventory(str(tmp_path / "seats.db"))
+    allocator = SeatAllocator(hall, inventory)
+    assert _codes(hall, allocator.propose(SCREENING, "standard", 1)) == ["C5"]
+    inventory.hold(SCREENING, [hall.index("C5")])
+    assert inventory.occupancy(SCREENING, hall.size)[hall.index("C5")] == HELD
+    assert _codes(hall, allocator.propose(SCREENING, "standard", 1)) == ["C4"]
+
+
+def test_indexes_of_past_screenings_are_evicted(hall, inventory, monkeypatch):
+    allocator = SeatAllocator(hall, inventory)
+    yesterday = f"{(date.today() - timedelta(days=1)).isoformat()}|hong kong|a|1|600"
+    allocator.propose(yesterday, "standard", 2)
+    allocator.propose(SCREENING, "standard", 2)
+    monkeypatch.setattr(allocator_module, "EVICT_INTERVAL", 0.0)
+    allocator._next_eviction = 0.0
+
+    allocator.propose(SCREENING, "standard", 2)
+    assert set(allocator._indexes) == {SCREENING}
+
+
+def test_get_allocator_is_replaced_with_the_hall(hall, inventory):
+    allocator = get_allocator(hall, inventory)
+    assert get_allocator(hall, inventory) is allocator
+    new_hall = SeatMap([("A", "standard")], 8)
+    replacement = get_allocator(new_hall, inventory)
+    assert replacement is not allocator and replacement.hall is new_hall
@@ -0,0 +1,115 @@
+import io
+import struct
+import wave
+
+import pytest
+
+from transcriber.audio import (
+    AudioFormatError,
+    NegotiationStats,
+    _flac_info,
+    _opus_info,
+    _wav_pcm,
+    decode_to_pcm,
+    prepare_audio,
+)
+
+
+def _wav(rate=16000, channels=1, width=2, frames=1600) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(width)
+        wav.setframerate(rate)
+        wav.writeframes(bytes(frames * channels * width))
+    return buffer.getvalue()
+
+
+def _ogg_page(packet: bytes, granule: int = 0) -> bytes:
+    header = b"OggS" + bytes([0, 0]) + struct.pack("<qIII", granule, 1, 0, 0) + bytes([1, len(packet)])
+    return header + packet
+
+
+def _opus(input_rate=16000, pre_skip=312, seconds=1.0, padding=b"") -> bytes:
+    head = b"OpusHead" + bytes([1, 1]) + struct.pack("<HIhB", pre_skip, input_rate, 0, 0)
+    last = _ogg_page(b"\x00" * 10, granule=pre_skip + int(seconds * 48000))
+    return _ogg_page(head) + padding + last
+
+
+def _flac(rate=16000, channels=1, samples=16000) -> bytes:
+    packed = (rate << 44) | ((channels - 1) << 41) | (15 << 36) | samples
+    streaminfo = struct.pack(">HH", 4096, 4096) + bytes(6) + struct.pack(">Q", packed) + bytes(16)
+    return b"fLaC" + bytes([0x80, 0, 0, len(streaminfo)]) + streaminfo
+
+
+def test_wav_pcm_is_a_view_into_the_file():
+    content = _wav()
+    pcm = _wav_pcm(memoryview(content))
+    assert pcm.sample_rate == 16000 and len(pcm.data) == 3200
+    assert pcm.duration == pytest.approx(0.1)
+    assert pcm.data.obj is content
+
+
+@pytest.mark.parametrize("content", [_wav(channels=2), _wav(width=1), b"RIFF" + bytes(8), b"not audio"])
+def test_wav_pcm_other_files_need_converting(content):
+    assert _wav_pcm(memoryview(content)) is None
+
+
+def test_wav_pcm_truncated_fmt_chunk():
+    content = _wav()
+    fmt = content.index(b"fmt ")
+    with pytest.raises(AudioFormatError, match="truncated"):
+        _wav_pcm(memoryview(content[:fmt + 14]))
+    short_fmt = content[:fmt + 4] + struct.pack("<I", 8) + content[fmt + 8:fmt + 16]
+    with pytest.raises(AudioFormatError):
+        _wav_pcm(memoryview(short_fmt))
+
+
+def test_decode_to_pcm_detects_wav_without_a_format():
+    assert decode_to_pcm(_wav(rate=8000)).sample_rate == 8000
+
+
+def test_opus_info():
+    assert _opus_info(memoryview(_opus())) == (16000, pytest.approx(1.0))
+    assert _opus_info(memoryview(_opus(input_rate=44100)))[0] == 48000
+
+
+def test_opus_info_without_a_last_page_falls_back():
+    # The last 64 KiB hold no page header at all
+    content = _opus(padding=bytes(70000))[:-40]
+    assert _opus_info(memoryview(content)) is None
+
+
+@pytest.mark.parametrize("content", [
+    b"OggS" + bytes(60),
+    _ogg_page(b"\x01vorbis" + bytes(40)),
+    _opus()[:40],
+])
+def test_opus_info_rejects_other_streams(content):
+    assert _opus_info(memoryview(content)) is None
+
+
+def test_flac_info():
+    assert _flac_info(memoryview(_flac())) == (16000, 1.0)
+    assert _flac_info(memoryview(_flac(channels=2))) is None
+
+
+@pytest.mark.parametrize("content, encoding, rate", [
+    (_opus(), "OGG_OPUS", 16000),
+    (_flac(), "FLAC", 16000),
+    (_wav(rate=22050), "LINEAR16", 22050),
+])
+def test_prepare_audio_passes_supported_audio_through(content, encoding, rate):
+    prepared = prepare_audio(content)
+    assert prepared.path == "passthrough"
+    assert (prepared.config.encoding, prepared.config.sample_rate_hertz) == (encoding, rate)
+
+
+def test_negotiation_stats_count_saved_bytes():
+    stats = NegotiationStats()
+    prepared = prepare_audio(_flac())
+    stats.record(prepared)
+    recorded = stats.stats()
+    assert recorded["clips"] == {"passthrough": 1, "transcode": 0}
+    assert recorded["encodings"] == {"FLAC": 1}
+    assert recorded["bytes_saved"] == 32000 - len(prepared.content)
@@ -0,0 +1,94 @@
+import io
+import json
+import wave
+
+import pytest
+
+from transcriber import batch
+
+
+def _wav(seconds=0.5, rate=16000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(bytes(int(seconds * rate) * 2))
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def clips(tmp_path):
+    folder = tmp_path / "notes"
+    (folder / "b").mkdir(parents=True)
+    (folder / "one.wav").write_bytes(_wav())
+    (folder / "b" / "two.wav").write_bytes(_wav())
+    (folder / "readme.txt").write_text("not audio")
+    return folder
+
+
+def _records(output):
+    return [json.loads(line) for line in output.read_text().splitlines()]
+
+
+def test_iter_sources_walks_directories_in_order(clips):
+    assert [path[len(str(clips)) + 1:] for path in batch.iter_sources(str(clips))] == ["one.wav", "b/two.wav"]
+
+
+def test_iter_sources_reads_manifests(tmp_path):
+    manifest = tmp_path / "clips.jsonl"
+    manifest.write_text('{"path": "a.wav"}\n\n/abs/b.ogg\n')
+    assert list(batch.iter_sources(str(manifest))) == [str(tmp_path / "a.wav"), "/abs/b.ogg"]
+
+
+def test_load_checkpoint_last_record_wins(tmp_path):
+    output = tmp_path / "out.jsonl"
+    output.write_text("\n".join([
+        json.dumps({"path": "a", "error": "boom"}),
+        json.dumps({"path": "a", "transcript": "hi"}),
+        json.dumps({"path": "b", "transcript": "hi"}),
+        json.dumps({"path": "b", "error": "boom"}),
+        '{"path": "c", "transcr',
+    ]))
+    assert batch.load_checkpoint(str(output)) == {"a"}
+
+
+def test_compact_keeps_the_last_record_per_path(tmp_path):
+    output = tmp_path / "out.jsonl"
+    output.write_text("\n".join(json.dumps(record) for record in [
+        {"path": "a", "error": "boom"}, {"path": "b", "transcript": "x"}, {"path": "a", "transcript": "y"},
+    ]) + "\n")
+    batch.compact(str(output))
+    assert _records(output) == [{"path": "b", "transcript": "x"}, {"path": "a", "transcript": "y"}]
+
+
+def test_run_transcribes_then_resumes(clips, tmp_path):
+    output = tmp_path / "out.jsonl"
+    summary = batch.run(str(clips), str(output), workers=2, fake_transcript="two tickets")
+    assert (summary["clips"], summary["skipped"], summary["failed"]) == (2, 0, 0)
+    assert summary["audio_seconds"] == pytest.approx(1.0)
+    assert {record["transcript"] for record in _records(output)} == {"two tickets"}
+
+    summary = batch.run(str(clips), str(output), workers=1, fake_transcript="two tickets")
+    assert (summary["clips"], summary["skipped"]) == (0, 2)
+
+
+def test_skipped_counts_only_this_source(clips, tmp_path):
+    output = tmp_path / "out.jsonl"
+    output.write_text(json.dumps({"path": "/elsewhere/other.wav", "transcript": "x"}) + "\n")
+    summary = batch.run(str(clips), str(output), workers=1, fake_transcript="hi")
+    assert (summary["clips"], summary["skipped"]) == (2, 0)
+
+
+def test_failed_clip_is_retried_and_replaced(clips, tmp_path):
+    output = tmp_path / "out.jsonl"
+    broken = clips / "one.wav"
+    broken.write_bytes(b"RIFF" + bytes(4) + b"WAVEfmt " + bytes(6))
+    summary = batch.run(str(clips), str(output), workers=1, fake_transcript="hi")
+    assert (summary["clips"], summary["failed"]) == (1, 1)
+
+    broken.write_bytes(_wav())
+    summary = batch.run(str(clips), str(output), workers=1, fake_transcript="hi")
+    assert (summary["clips"], summary["skipped"], summary["failed"]) == (1, 1, 0)
+    records = _records(output)
+    assert len(records) == 2 and not any("error" in record for record in records)
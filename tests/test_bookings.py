@@ -0,0 +1,114 @@
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from actions.bookings import Booking, BookingRepository, BookingWriter, _is_sqlite_memory  # noqa: E402
+
+SLOTS = {
+    "screening_id": "2024-03-01|hong kong|a|1|600",
+    "movie": "Zodiac",
+    "location": "hong kong",
+    "cinema": "Cinema A",
+    "showtime": "10:00 AM",
+    "seat_type": "standard",
+    "seat_numbers": ["E5", "E6"],
+    "number_of_seats": "2",
+    "payment_option": "visa",
+    "seat_hold": "h1",
+}
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = BookingRepository(f"sqlite:///{tmp_path / 'bookings.db'}")
+    yield repository
+    repository.close()
+
+
+def test_booking_from_slots():
+    booking = Booking.from_slots("user", SLOTS)
+    assert booking.number_of_seats == 2 and booking.seats == ["E5", "E6"]
+    assert booking.hold_id == "h1"
+    assert Booking.from_slots("user", {"seat_numbers": ["A1"]}).number_of_seats == 1
+    assert json.loads(booking.row()["seats"]) == ["E5", "E6"]
+
+
+def test_repository_round_trip(repository):
+    repository.save_many([Booking.from_slots("user", SLOTS), Booking.from_slots("other", SLOTS)])
+    rows = repository.for_sender("user")
+    assert len(rows) == 1
+    assert rows[0]["seats"] == ["E5", "E6"] and rows[0]["movie"] == "Zodiac"
+
+
+@pytest.mark.parametrize("url, memory", [
+    ("sqlite://", True),
+    ("sqlite:///:memory:", True),
+    ("sqlite:///file:bookings?mode=memory&uri=true", True),
+    ("sqlite:///bookings.db", False),
+    ("sqlite:////var/lib/bookings.db", False),
+])
+def test_is_sqlite_memory(url, memory):
+    assert _is_sqlite_memory(url) is memory
+
+
+def test_in_memory_database_is_shared_with_the_writer_thread():
+    repository = BookingRepository("sqlite://")
+    writer = BookingWriter(repository, flush_interval=0.01)
+    writer.enqueue(Booking.from_slots("user", SLOTS))
+    writer.close()
+    assert len(repository.for_sender("user")) == 1
+
+
+def test_writer_batches_and_drains_on_close(repository):
+    writer = BookingWriter(repository, batch_size=10, flush_interval=0.05)
+    for _ in range(25):
+        writer.enqueue(Booking.from_slots("user", SLOTS))
+    writer.flush()
+    assert writer.written == 25 and writer.batches >= 3
+    writer.close()
+    writer.enqueue(Booking.from_slots("user", SLOTS))  # written synchronously after close
+    assert len(repository.for_sender("user")) == 26
+
+
+class _FlakyRepository:
+    """Fails every batch that contains a booking for sender "poison"."""
+
+    def __init__(self):
+        self.saved = []
+        self.attempts = 0
+        self.lock = threading.Lock()
+
+    def save_many(self, bookings):
+        with self.lock:
+            self.attempts += 1
+            if any(booking.sender_id == "poison" for booking in bookings):
+                raise RuntimeError("constraint failed")
+            self.saved.extend(bookings)
+
+
+def test_failing_batch_is_retried_then_dead_lettered(tmp_path):
+    repository = _FlakyRepository()
+    dead_letters = tmp_path / "failed.jsonl"
+    writer = BookingWriter(repository, flush_interval=0.05, max_retry_delay=0.0, max_retries=2,
+                           dead_letter_path=str(dead_letters))
+    writer.enqueue(Booking.from_slots("user", SLOTS))
+    writer.enqueue(Booking.from_slots("poison", SLOTS))
+    writer.close(timeout=5)
+
+    # 3 batch attempts, then one per booking
+    assert repository.attempts == 5
+    assert [booking.sender_id for booking in repository.saved] == ["user"]
+    assert writer.failures == 3 and writer.dead_lettered == 1
+    lines = [json.loads(line) for line in dead_letters.read_text().splitlines()]
+    assert [(line["sender_id"], line["seats"]) for line in lines] == [("poison", ["E5", "E6"])]
+
+
+def test_dead_letters_are_logged_without_a_file(caplog):
+    writer = BookingWriter(_FlakyRepository(), flush_interval=0.01, max_retry_delay=0.0, max_retries=0)
+    writer.enqueue(Booking.from_slots("poison", SLOTS))
+    writer.close(timeout=5)
+    assert writer.dead_lettered == 1
+    assert any("Unwritten booking" in record.getMessage() for record in caplog.records)
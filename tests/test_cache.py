@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+
+from actions.cache import TTLCache
+from actions.tmdb import TMDBClient
+
+
+def test_fresh_then_stale_then_expired(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = TTLCache(ttl=10, stale_ttl=5)
+    cache.set("zodiac", {"id": 1})
+
+    assert cache.lookup("zodiac") == (True, {"id": 1}, True)
+    now[0] += 12
+    assert cache.lookup("zodiac") == (True, {"id": 1}, False)
+    now[0] += 5
+    assert cache.lookup("zodiac") == (False, None, False)
+    assert len(cache) == 0
+    assert cache.stats()["expirations"] == 1
+
+
+def test_per_entry_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = TTLCache(ttl=100, stale_ttl=0)
+    cache.set("missing", None, ttl=1)
+    now[0] += 2
+    assert cache.lookup("missing") == (False, None, False)
+
+
+def test_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_snapshot_round_trip_skips_expired(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    path = str(tmp_path / "cache" / "tmdb.json.gz")
+    cache = TTLCache(ttl=10, stale_ttl=10)
+    cache.set("kept", {"id": 1})
+    cache.set("dropped", {"id": 2}, ttl=1)
+    now[0] += 15
+    cache.save(path)
+
+    restored = TTLCache(ttl=10, stale_ttl=10)
+    assert restored.load(path) == 1
+    assert restored.lookup("kept") == (True, {"id": 1}, False)
+    assert restored.get("dropped") is None
+
+
+def test_unreadable_snapshot_is_ignored(tmp_path):
+    path = tmp_path / "broken.json.gz"
+    path.write_bytes(b"not gzip")
+    assert TTLCache().load(str(path)) == 0
+    assert TTLCache().load(str(tmp_path / "missing.json.gz")) == 0
+
+
+def test_tmdb_snapshot_is_written_off_the_event_loop(tmp_path):
+    client = TMDBClient(api_key="test", cache_path=str(tmp_path / "tmdb.json.gz"), snapshot_interval=0)
+    writers = []
+    saved = threading.Event()
+    original_save = client.cache.save
+
+    def save(path):
+        writers.append(threading.current_thread())
+        original_save(path)
+        saved.set()
+
+    client.cache.save = save
+
+    async def store():
+        client._store("zodiac", {"id": 1})
+        await asyncio.get_running_loop().run_in_executor(None, saved.wait, 5)
+
+    asyncio.run(store())
+    assert writers and writers[0] is not threading.main_thread()
+    assert TTLCache().load(str(tmp_path / "tmdb.json.gz")) == 1
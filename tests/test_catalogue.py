@@ -0,0 +1,112 @@
+import json
+import os
+
+import pytest
+
+from actions import catalogue as catalogue_module
+from actions.catalogue import Catalogue, _CatalogueFile
+
+DATA = {
+    "locations": {
+        "hong kong": {
+            "aliases": ["HK"],
+            "currency": "HKD",
+            "seat_prices": {"VIP": 150, "Standard": 100},
+            "cinemas": {"A": "Golden Harvest G Ocean (Ocean Centre)", "b": "The Sky (Olympian City)"},
+        },
+        "singapore": {
+            "aliases": ["sg"],
+            "currency": "SGD",
+            "seat_prices": {"Standard": 70},
+            "cinemas": {"a": "Golden Mile Tower"},
+        },
+    },
+    "showtimes": {"Zodiac": ["07:00 PM", "10:00 AM", "1:00 PM"]},
+    "hall": {"seats_per_row": 4, "rows": [["A", "standard"], ["B", "vip"]]},
+}
+
+
+@pytest.fixture
+def catalogue():
+    return Catalogue(DATA)
+
+
+def test_locations_and_aliases(catalogue):
+    assert catalogue.locations == ("hong kong", "singapore")
+    assert catalogue.resolve_location(" hk ") == "hong kong"
+    assert catalogue.resolve_location("Singapore") == "singapore"
+    assert catalogue.resolve_location("mars") is None
+    assert catalogue.resolve_location(None) is None
+
+
+def test_cinemas_are_keyed_by_lowercase_letter(catalogue):
+    assert dict(catalogue.cinemas("HK")) == {
+        "a": "Golden Harvest G Ocean (Ocean Centre)",
+        "b": "The Sky (Olympian City)",
+    }
+    assert catalogue.cinema("hong kong", " B ") == "The Sky (Olympian City)"
+    assert catalogue.cinema("hong kong", "z") is None
+    assert catalogue.cinemas("mars") is None
+
+
+def test_showtimes_are_sorted_and_formatted(catalogue):
+    assert catalogue.showtimes("Zodiac") == ("10:00 AM", "01:00 PM", "07:00 PM")
+    assert list(catalogue.showtime_minutes["Zodiac"]) == [600, 780, 1140]
+    assert catalogue.showtimes("Unknown") is None
+    assert catalogue.showtimes(None) is None
+
+
+def test_seat_prices(catalogue):
+    assert catalogue.seat_price("HK", "vip") == 150
+    assert catalogue.seat_price("sg", "VIP") is None
+    assert catalogue.seat_types("singapore") == ["Standard"]
+    assert catalogue.currencies["singapore"] == "SGD"
+
+
+def test_fuzzy_cinema_and_location_lookup(catalogue):
+    assert catalogue.cinema_indexes["hong kong"].best("olympain city").label == "b"
+    assert catalogue.location_index.best("singapor").label == "singapore"
+
+
+def test_views_are_read_only(catalogue):
+    with pytest.raises(TypeError):
+        catalogue.location_aliases["mars"] = "mars"
+
+
+def _write(path, data, mtime):
+    path.write_text(json.dumps(data))
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_reloads_when_the_file_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalogue_module, "RELOAD_CHECK_INTERVAL", 0.0)
+    path = tmp_path / "catalogue.json"
+    _write(path, DATA, 1_000_000_000)
+    catalogue_file = _CatalogueFile(str(path))
+    first = catalogue_file.get()
+    assert catalogue_file.get() is first
+
+    changed = json.loads(json.dumps(DATA))
+    changed["showtimes"]["Se7en"] = ["09:30 PM"]
+    _write(path, changed, 2_000_000_000)
+    assert catalogue_file.get().showtimes("Se7en") == ("09:30 PM",)
+
+
+def test_keeps_the_loaded_catalogue_when_the_file_breaks(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalogue_module, "RELOAD_CHECK_INTERVAL", 0.0)
+    path = tmp_path / "catalogue.json"
+    _write(path, DATA, 1_000_000_000)
+    catalogue_file = _CatalogueFile(str(path))
+    first = catalogue_file.get()
+
+    path.write_text("{not json")
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    assert catalogue_file.get() is first
+
+    path.unlink()
+    assert catalogue_file.get() is first
+
+
+def test_first_load_errors_are_raised(tmp_path):
+    with pytest.raises(OSError):
+        _CatalogueFile(str(tmp_path / "missing.json")).get()
@@ -0,0 +1,89 @@
+import threading
+
+import numpy as np
+import pytest
+
+from transcriber.audio import PCMAudio, PreparedAudio
+from transcriber.backends import AudioConfig
+from transcriber.chunking import plan_chunks, stitch, transcribe_chunked, transcribe_long
+
+RATE = 8000
+
+
+def _speech_with_pauses(seconds, pause_every=7.0, extra=b""):
+    """A tone broken by a 0.5 s pause every `pause_every` seconds."""
+    t = np.arange(int(seconds * RATE)) / RATE
+    samples = 8000 * np.sin(2 * np.pi * 220 * t)
+    samples[(t % pause_every) > pause_every - 0.5] = 0
+    return PCMAudio(memoryview(samples.astype("<i2").tobytes() + extra), RATE)
+
+
+def test_short_audio_is_one_chunk():
+    audio = _speech_with_pauses(5)
+    assert plan_chunks(audio, max_seconds=10) == [(0, 5 * RATE)]
+
+
+def test_chunks_cover_the_audio_with_overlap_and_cut_in_pauses():
+    audio = _speech_with_pauses(30)
+    chunks = plan_chunks(audio, max_seconds=10, overlap_seconds=0.5, search_seconds=5)
+    assert chunks[0][0] == 0 and chunks[-1][1] == 30 * RATE
+    for (_, end), (start, _) in zip(chunks, chunks[1:]):
+        cut = (end + start) // 2
+        assert end - start == RATE  # 0.5 s either side of the cut
+        assert (cut / RATE) % 7.0 >= 6.5  # inside a pause
+    assert all(end - start <= 11 * RATE for start, end in chunks)
+
+
+def test_plan_chunks_ignores_a_dangling_odd_byte():
+    audio = _speech_with_pauses(30, extra=b"\x01")
+    chunks = plan_chunks(audio, max_seconds=10)
+    assert chunks[-1][1] == 30 * RATE
+
+
+
+@pytest.mark.parametrize("max_seconds, overlap_seconds", [(0.5, 1.0), (2.0, 1.0)])
+def test_chunks_must_be_longer_than_their_overlap(max_seconds, overlap_seconds):
+    with pytest.raises(ValueError):
+        plan_chunks(PCMAudio(bytes(160000), 16000), max_seconds=max_seconds, overlap_seconds=overlap_seconds)
+
+
+def test_short_chunks_still_advance():
+    chunks = plan_chunks(PCMAudio(bytes(160000), 16000), max_seconds=0.5, overlap_seconds=0.2)
+    assert chunks[0][0] == 0 and chunks[-1][1] == 80000
+    assert all(start < end for start, end in chunks)
+
+
+@pytest.mark.parametrize("transcripts, expected", [
+    (["book two tickets for", "tickets for Zodiac tonight"], "book two tickets for Zodiac tonight"),
+    (["Hello, there", "there. How are you"], "Hello, there How are you"),
+    (["no overlap", "at all"], "no overlap at all"),
+    (["only one", None, ""], "only one"),
+])
+def test_stitch(transcripts, expected):
+    assert stitch(transcripts) == expected
+
+
+def test_transcribe_chunked_recognizes_chunks_concurrently():
+    audio = _speech_with_pauses(30)
+    threads = set()
+
+    def recognize(chunk):
+        threads.add(threading.current_thread().name)
+        return f"chunk of {round(chunk.duration)}"
+
+    text = transcribe_chunked(audio, recognize, max_seconds=10)
+    assert text.startswith("chunk of")
+    assert len(threads) > 1
+
+
+def test_transcribe_long_sends_linear16_chunks():
+    audio = _speech_with_pauses(30)
+    prepared = PreparedAudio(audio.data, AudioConfig("LINEAR16", RATE), "passthrough", audio.duration)
+    configs = []
+
+    def recognize(content, config):
+        configs.append(config)
+        return "words"
+
+    assert transcribe_long(audio.data, "wav", prepared, recognize, max_seconds=10) == "words"
+    assert len(configs) > 1 and {config.encoding for config in configs} == {"LINEAR16"}
@@ -0,0 +1,171 @@
+import pytest
+
+pytest.importorskip("rasa")
+
+from rasa.shared.nlu.constants import ENTITIES, TEXT  # noqa: E402
+from rasa.shared.nlu.training_data.message import Message  # noqa: E402
+from rasa.shared.nlu.training_data.training_data import TrainingData  # noqa: E402
+
+import custom_components  # noqa: E402
+from custom_components import CleanInput, normalize_text, normalize_with_offsets  # noqa: E402
+
+
+def _entity(text, value, entity):
+    start = text.index(value)
+    return {"start": start, "end": start + len(value), "value": value, "entity": entity}
+
+
+def _clean(text, entities):
+    message = Message(data={TEXT: text, ENTITIES: entities})
+    CleanInput({}).process_training_data(TrainingData(training_examples=[message]))
+    return message.get(TEXT), message.get(ENTITIES)
+
+
+def test_normalize_text():
+    assert normalize_text("  Please book   Zodiac, kindly?  ") == "book zodiac,"
+    assert normalize_text("pls 2 SEATS.") == "2 seats"
+
+
+def test_offsets_follow_the_normalized_text():
+    text = "Please  reserve for me at Hong Kong."
+    clean, positions = normalize_with_offsets(text)
+    assert clean == normalize_text(text) == "reserve for me at hong kong"
+    assert positions[0] is None
+    assert clean[positions[text.index("Hong")]] == "h"
+
+
+def test_entity_spans_are_remapped():
+    text = "Please reserve for me at Hong Kong."
+    clean, entities = _clean(text, [_entity(text, "Hong Kong", "location")])
+    assert clean == "reserve for me at hong kong"
+    assert clean[entities[0]["start"]:entities[0]["end"]] == "hong kong"
+    assert entities[0]["value"] == "Hong Kong"
+
+
+def test_several_entities_around_dropped_words():
+    text = "VIP  seats pls, for Zodiac please?"
+    clean, entities = _clean(text, [_entity(text, "VIP", "seat_type"), _entity(text, "Zodiac", "movie")])
+    assert clean == "vip seats , for zodiac"
+    assert [clean[e["start"]:e["end"]] for e in entities] == ["vip", "zodiac"]
+
+
+def test_example_is_kept_when_an_entity_would_vanish():
+    text = "book it please"
+    clean, entities = _clean(text, [_entity(text, "please", "politeness")])
+    assert clean == text
+    assert entities[0]["start"] == text.index("please")
+
+
+def test_unannotated_examples_are_normalized():
+    clean, entities = _clean("Please show me MORE.", None)
+    assert clean == "show me more"
+    assert entities is None
+
+
+
+def test_worker_processes_keep_entity_spans(monkeypatch):
+    pools = []
+
+    class RecordingPool(custom_components.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(kwargs)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(custom_components, "ProcessPoolExecutor", RecordingPool)
+    texts = [f"Please book {n} seats at Hong Kong. for Zodiac{n} pls" for n in range(5000)]
+    messages = [
+        Message(data={
+            TEXT: text,
+            ENTITIES: [_entity(text, "Hong Kong", "location"), _entity(text, f"Zodiac{n}", "movie")],
+        })
+        for n, text in enumerate(texts)
+    ]
+    messages.append(Message(data={TEXT: "Please show me MORE."}))
+    component = CleanInput({"batch_workers": 2, "parallel_min_examples": 4096})
+    component.process_training_data(TrainingData(training_examples=messages))
+
+    assert pools == [{"max_workers": 2}]
+    for n, message in enumerate(messages[:-1]):
+        clean = message.get(TEXT)
+        assert clean == f"book {n} seats at hong kong for zodiac{n}"
+        assert [clean[e["start"]:e["end"]] for e in message.get(ENTITIES)] == ["hong kong", f"zodiac{n}"]
+    assert messages[-1].get(TEXT) == "show me more"
+
+
+@pytest.fixture
+def router():
+    from custom_components import ReplyIntentRouter
+
+    return ReplyIntentRouter({})
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("Movie 3", "set_movie"),
+    ("movie 12", "set_movie"),
+    ("show me more", "set_movie"),
+    ("7 pm", "set_showtime"),
+    ("showtime 2", "set_showtime"),
+    ("cinema b", "select_cinema"),
+    ("2 tickets", "select_number_of_seats"),
+    ("A1, A2 and B3", "select_seat_numbers"),
+    ("Yes, confirm", "confirm_booking"),
+    ("english", "english"),
+])
+def test_routes_unambiguous_replies(router, text, intent):
+    assert router.route(text)["intent"] == intent
+
+
+@pytest.mark.parametrize("text", ["1", "2", "3", "a", "b", "option 2", "select 4", "I'd like movie 2 please"])
+def test_leaves_context_dependent_replies_to_the_model(router, text):
+    assert router.route(text) is None
+
+
+@pytest.mark.parametrize("text, active_slot, intent", [
+    ("1", "movie", "set_movie"),
+    ("2", "showtime", "set_showtime"),
+    ("b", "cinema", "select_cinema"),
+    ("C.", "cinema", "select_cinema"),
+    ("3", "number_of_seats", "select_number_of_seats"),
+    ("2 tickets", "number_of_seats", "select_number_of_seats"),
+    ("vip", "cinema", "select_seat"),
+])
+def test_bare_replies_follow_the_requested_slot(router, text, active_slot, intent):
+    assert router.route(text, active_slot)["intent"] == intent
+
+
+@pytest.mark.parametrize("text, active_slot", [("a", "movie"), ("2", "cinema"), ("d", "cinema"), ("2", "location")])
+def test_bare_replies_that_do_not_fit_the_requested_slot(router, text, active_slot):
+    assert router.route(text, active_slot) is None
+
+
+class _Tracker:
+    def __init__(self, slots):
+        self.slots = slots
+
+    def get_slot(self, name):
+        return self.slots.get(name)
+
+
+def test_process_reads_the_requested_slot_from_the_tracker(router):
+    message = Message(data={TEXT: "2", "intent": {"name": "greet", "confidence": 0.4}})
+    router.process([message], _Tracker({"requested_slot": "movie"}))
+    assert message.get("intent") == {"name": "set_movie", "confidence": 1.0}
+
+
+def test_entities_point_into_the_original_text(router):
+    text = "  Hong Kong!"
+    routed = router.route(text)
+    entity = routed["entities"][0]
+    assert routed["intent"] == "select_location"
+    assert text[entity["start"]:entity["end"]] == "Hong Kong"
+
+
+def test_process_overrides_only_on_a_hit(router):
+    hit = Message(data={TEXT: "vip seats", "intent": {"name": "greet", "confidence": 0.4}})
+    miss = Message(data={TEXT: "2", "intent": {"name": "set_showtime", "confidence": 0.9}})
+    router.process([hit, miss])
+    assert hit.get("intent") == {"name": "select_seat", "confidence": 1.0}
+    assert hit.get(ENTITIES)[0]["value"] == "vip"
+    assert miss.get("intent") == {"name": "set_showtime", "confidence": 0.9}
+    assert router.stats()["hits"] == 1
+    assert "pipeline_start" not in hit.data and "pipeline_start" not in miss.data
@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+from actions.fuzzy import FuzzyIndex, FuzzyMatch, _words, allowed_distance, bounded_distance
+
+LOCATIONS = {
+    "hong kong": "hong kong",
+    "hk": "hong kong",
+    "singapore": "singapore",
+    "kuala lumpur": "malaysia",
+    "malaysia": "malaysia",
+    "pavilion": "pavilion",
+    "olympian city": "olympian city",
+}
+
+
+@pytest.fixture
+def index():
+    return FuzzyIndex(LOCATIONS)
+
+
+@pytest.mark.parametrize("name, allowed", [("hk", 0), ("mall", 1), ("pavilion", 2), ("kuala lumpur", 2)])
+def test_allowed_distance(name, allowed):
+    assert allowed_distance(name) == allowed
+
+
+@pytest.mark.parametrize("a, b, limit, distance", [
+    ("pavilion", "pavilion", 2, 0),
+    ("pavillion", "pavilion", 2, 1),
+    ("olympain", "olympian", 2, 1),  # a swap is one edit
+    ("singapor", "singapore", 2, 1),
+    ("kitten", "sitting", 3, 3),
+    ("kitten", "sitting", 2, 3),  # gives up at limit + 1
+    ("a", "abcdef", 2, 3),
+])
+def test_bounded_distance(a, b, limit, distance):
+    assert bounded_distance(a, b, limit) == distance
+
+
+@pytest.mark.parametrize("text, label, distance", [
+    ("I'm in Singapor", "singapore", 1),
+    ("the pavillion please", "pavilion", 1),
+    ("OLYMPAIN CITY!", "olympian city", 1),
+    ("kuala lumpor", "malaysia", 1),
+    ("hong kong", "hong kong", 0),
+])
+def test_best(index, text, label, distance):
+    match = index.best(text)
+    assert (match.label, match.distance) == (label, distance)
+
+
+def test_short_names_need_an_exact_match(index):
+    assert index.best("hk") == FuzzyMatch("hk", "hong kong", 0)
+    assert index.best("hx") is None
+
+
+def test_search_keeps_one_match_per_label(index):
+    matches = index.search("hong kong or hk, or maybe malaysia")
+    assert [(m.label, m.distance) for m in matches] == [("hong kong", 0), ("malaysia", 0)]
+    assert matches[0].name == "hong kong"
+
+
+def test_best_is_none_on_a_tie():
+    index = FuzzyIndex([("cinema one", "a"), ("cinema ono", "b")])
+    assert index.best("cinema onu") is None
+    assert index.best("cinema one").label == "a"
+
+
+def test_duplicates_and_empty_names_are_skipped():
+    index = FuzzyIndex([("Hong Kong", "hk"), ("hong  kong", "hk"), ("!!", "x")])
+    assert len(index) == 1
+
+
+def _naive_search(names, text, max_distance=2):
+    words = _words(text)
+    max_words = max(name.count(" ") + 1 for name in names)
+    best = {}
+    for start in range(len(words)):
+        for end in range(start + 1, min(start + max_words, len(words)) + 1):
+            window = " ".join(words[start:end])
+            for name, label in names.items():
+                allowed = allowed_distance(name, max_distance)
+                distance = bounded_distance(window, name, allowed)
+                if distance <= allowed and (label not in best or distance < best[label]):
+                    best[label] = distance
+    return best
+
+
+def _typo(word, rng):
+    i = rng.randrange(len(word))
+    kind = rng.choice("dis")
+    if kind == "d":
+        return word[:i] + word[i + 1:]
+    letter = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    return word[:i] + letter + word[i + (kind == "s"):]
+
+
+def test_search_agrees_with_a_full_scan(index):
+    rng = random.Random(7)
+    names = {" ".join(_words(name)): label for name, label in LOCATIONS.items()}
+    for _ in range(300):
+        name = rng.choice(list(names))
+        text = f"take me to {_typo(_typo(name, rng), rng) if rng.random() < 0.5 else _typo(name, rng)} now"
+        found = {m.label: m.distance for m in index.search(text, limit=10)}
+        assert found == _naive_search(names, text), text
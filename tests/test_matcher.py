@@ -0,0 +1,40 @@
+from actions.matcher import KeywordMatcher, Match
+
+
+def test_finds_every_keyword_on_word_boundaries():
+    matcher = KeywordMatcher({"my": "malaysia", "malaysia": "malaysia", "hong kong": "hong kong"})
+    assert matcher.find_all("My mystery trip: Hong Kong or MALAYSIA") == [
+        Match(0, 2, "my", "malaysia"),
+        Match(17, 26, "hong kong", "hong kong"),
+        Match(30, 38, "malaysia", "malaysia"),
+    ]
+
+
+def test_keyword_inside_a_word_does_not_match():
+    matcher = KeywordMatcher({"cn": "chinese", "book": "booking"})
+    assert matcher.find_all("cinema bookings cnn") == []
+    assert matcher.first("cn please") == Match(0, 2, "cn", "chinese")
+
+
+def test_overlapping_keywords_longest_first():
+    matcher = KeywordMatcher({"couple": "couple", "couple seat": "couple", "seat": "seat"})
+    matches = matcher.find_all("a couple seat")
+    assert [m.keyword for m in matches] == ["couple seat", "couple", "seat"]
+    assert matcher.first("a couple seat").keyword == "couple seat"
+
+
+def test_whitespace_and_punctuation():
+    matcher = KeywordMatcher([("v.i.p", "vip"), ("credit card", "online")])
+    assert matcher.find_labels("V.I.P, paid by credit\tcard") == ["vip", "online"]
+
+
+def test_failure_links_recover_partial_matches():
+    matcher = KeywordMatcher({"abcd": "long", "bc": "short"})
+    assert matcher.find_all("abc bc") == [Match(4, 6, "bc", "short")]
+
+
+def test_labels_and_empty_input():
+    matcher = KeywordMatcher([("yes", "accept"), ("", "ignored"), ("ok", "accept")])
+    assert len(matcher) == 2
+    assert matcher.find_labels("yes ok yes") == ["accept"]
+    assert matcher.first("") is None
@@ -0,0 +1,183 @@
+import asyncio
+import io
+import wave
+
+import pytest
+from aiohttp import web
+
+from actions import metrics
+from actions.cache import TTLCache
+from actions.metrics import Histogram, Registry
+from actions.tmdb import TMDBClient
+from transcriber import FakeRecognizer
+from transcriber.service import TranscriptionService
+
+pytest.importorskip("rasa_sdk")
+
+from rasa_sdk import Action  # noqa: E402
+from rasa_sdk.events import SlotSet, UserUtteranceReverted  # noqa: E402
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    hist = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        hist.observe(value)
+    assert hist.cumulative() == [("0.1", 2), ("1.0", 3), ("+Inf", 4)]
+    assert (hist.count, hist.sum) == (4, 3.65)
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    registry.observe_action("action_x", 0.002, [], None)
+    registry.observe_action("action_x", 0.2, [], "KeyError")
+    lines = registry.render().splitlines()
+
+    assert "# TYPE action_latency_seconds histogram" in lines
+    assert 'action_latency_seconds_bucket{action="action_x",le="0.001"} 0' in lines
+    assert 'action_latency_seconds_bucket{action="action_x",le="0.0025"} 1' in lines
+    assert 'action_latency_seconds_bucket{action="action_x",le="+Inf"} 2' in lines
+    assert 'action_latency_seconds_count{action="action_x"} 2' in lines
+    assert "# TYPE action_errors_total counter" in lines
+    assert 'action_errors_total{action="action_x",error="KeyError"} 1' in lines
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.observe_action('say "hi"\\\n', 0.0, [], None)
+    assert 'action="say \\"hi\\"\\\\\\n"' in registry.render()
+
+
+def test_events_are_counted_by_type():
+    registry = Registry()
+    registry.observe_action("action_x", 0.0, [
+        SlotSet("movie", "Zodiac"), SlotSet("showtime", None), UserUtteranceReverted(), {"no": "type"},
+    ], None)
+    assert registry.events == {
+        ("action_x", "slot"): 2, ("action_x", "rewind"): 1, ("action_x", "unknown"): 1,
+    }
+    assert 'action_events_total{action="action_x",event="rewind"} 1' in registry.render()
+
+
+class _SyncAction(Action):
+    def name(self):
+        return "action_sync"
+
+    def run(self, dispatcher, tracker, domain):
+        return [SlotSet("movie", "Zodiac")]
+
+
+class _FailingAction(Action):
+    def name(self):
+        return "action_failing"
+
+    async def run(self, dispatcher, tracker, domain):
+        raise KeyError("movie")
+
+
+class _OutboundAction(Action):
+    """Calls TMDB and the recognizer, like the real actions do."""
+
+    def __init__(self, base_url, service):
+        self.base_url = base_url
+        self.service = service
+
+    def name(self):
+        return "action_outbound"
+
+    async def run(self, dispatcher, tracker, domain):
+        client = TMDBClient(api_key="test", base_url=self.base_url, cache=TTLCache())
+        try:
+            await client.search_movies(["Zodiac", "Se7en"])
+        finally:
+            await client.close()
+        await self.service.transcribe_async(_wav())
+        return [UserUtteranceReverted()]
+
+
+def _wav() -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(bytes(3200))
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def fresh(monkeypatch):
+    """A clean registry, and everything instrument_actions patches put back afterwards."""
+    for cls in (_SyncAction, _FailingAction, _OutboundAction):
+        monkeypatch.setattr(cls, "run", cls.run)
+    monkeypatch.setattr(TMDBClient, "_fetch", TMDBClient._fetch)
+    monkeypatch.setattr(TranscriptionService, "transcribe", TranscriptionService.transcribe)
+    monkeypatch.setattr(TranscriptionService, "transcribe_async", TranscriptionService.transcribe_async)
+    monkeypatch.setattr(metrics, "registry", Registry())
+    monkeypatch.setattr(metrics, "start_server", lambda: None)
+
+
+def test_disabled_leaves_actions_alone(fresh, monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    run, fetch = _SyncAction.run, TMDBClient._fetch
+    metrics.instrument_actions([_SyncAction, object()])
+    assert _SyncAction.run is run
+    assert TMDBClient._fetch is fetch
+
+
+def test_enabled_records_latency_events_and_errors(fresh, monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    metrics.instrument_actions([_SyncAction, _FailingAction])
+    metrics.instrument_actions([_SyncAction])
+    assert _SyncAction.run.instrumented and not getattr(_SyncAction.run.__wrapped__, "instrumented", False)
+
+    assert _SyncAction().run(None, None, {}) == [SlotSet("movie", "Zodiac")]
+    with pytest.raises(KeyError):
+        asyncio.run(_FailingAction().run(None, None, {}))
+
+    text = metrics.registry.render()
+    assert 'action_latency_seconds_count{action="action_sync"} 1' in text
+    assert 'action_latency_seconds_count{action="action_failing"} 1' in text
+    assert 'action_events_total{action="action_sync",event="slot"} 1' in text
+    assert 'action_errors_total{action="action_failing",error="KeyError"} 1' in text
+
+
+def test_outbound_calls_are_timed_per_action(fresh, monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    metrics.instrument_actions([_OutboundAction])
+    service = TranscriptionService(lambda: FakeRecognizer("hello"), workers=1, trim_silence=False)
+
+    async def handler(request):
+        return web.json_response({"results": [{"title": request.query["query"]}]})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/3/search/movie", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        host, port = runner.addresses[0][:2]
+        try:
+            return await _OutboundAction(f"http://{host}:{port}/3", service).run(None, None, {})
+        finally:
+            await runner.cleanup()
+
+    try:
+        assert asyncio.run(scenario()) == [UserUtteranceReverted()]
+    finally:
+        service.close()
+
+    registry = metrics.registry
+    assert registry.outbound["tmdb"].count == 2
+    assert registry.outbound["recognizer"].count == 1
+    assert registry.action_outbound["action_outbound", "tmdb"][0] == 2
+    assert registry.action_outbound["action_outbound", "recognizer"][0] == 1
+    text = registry.render()
+    assert 'outbound_call_seconds_count{target="tmdb"} 2' in text
+    assert 'action_outbound_calls_total{action="action_outbound",target="recognizer"} 1' in text
+    assert 'action_events_total{action="action_outbound",event="rewind"} 1' in text
+
+
+def test_outbound_outside_an_action_is_labelled_none(fresh):
+    with metrics.outbound("tmdb"):
+        pass
+    assert metrics.registry.action_outbound["none", "tmdb"][0] == 1
@@ -0,0 +1,62 @@
+import pytest
+
+from actions.movies import Movie, MovieIndex, tokens
+
+
+def _movie(title, year=None, **fields):
+    return Movie.from_dict({"title": title, "year": year, **fields})
+
+
+@pytest.fixture
+def index():
+    return MovieIndex([
+        _movie("Zodiac", 2007, genres=["crime", "thriller"], cast=["Jake Gyllenhaal"]),
+        _movie("Prisoners", 2013, genres=["crime", "thriller"], cast=["Hugh Jackman", "Jake Gyllenhaal"]),
+        _movie("Se7en", 1995, aliases=["Seven"], genres=["crime"]),
+        _movie("Seven Samurai", 1954, genres=["action"]),
+        _movie("Spirited Away", 2001, aliases=["Sen to Chihiro no Kamikakushi"], genres=["animation"]),
+    ])
+
+
+def test_tokens():
+    assert tokens("Ocean's Eleven") == ["oceans", "eleven"]
+    assert tokens("Mad Max: Fury Road") == ["mad", "max", "fury", "road"]
+
+
+def test_search_ranks_by_field_and_catalogue_order(index):
+    assert [m.title for m in index.search("gyllenhaal")] == ["Zodiac", "Prisoners"]
+    assert [m.title for m in index.search("crime jackman")] == ["Prisoners"]
+    assert [m.title for m in index.search("thrillers")] == ["Zodiac", "Prisoners"]
+    assert [m.title for m in index.search("zodi")] == ["Zodiac"]
+
+
+def test_exact_alias_comes_first(index):
+    assert index.search("seven")[0].title == "Se7en"
+
+
+def test_search_within_and_pages(index):
+    assert [m.title for m in index.search("crime", within=["Se7en"])] == ["Se7en"]
+    page = index.page(None, page=1, page_size=2)
+    assert [m.title for m in page.movies] == ["Se7en", "Seven Samurai"] and page.has_more
+
+
+@pytest.mark.parametrize("info, matches", [
+    ({"title": "Zodiac", "release_date": "2007-03-02"}, True),
+    ({"title": "zodiac!", "release_date": "2007"}, True),
+    ({"title": "Zodiac", "release_date": "2014-01-01"}, False),
+    ({"title": "Zodiac", "release_date": ""}, False),
+    ({"title": "Zodiac Killer", "release_date": "2007-03-02"}, False),
+    ({"title": "The Zodiac", "release_date": "2007-03-02"}, True),
+])
+def test_tmdb_hit_must_match_title_and_year(info, matches):
+    assert _movie("Zodiac", 2007).matches(info) is matches
+
+
+def test_tmdb_hit_may_match_an_alias_or_original_title():
+    spirited_away = _movie("Spirited Away", 2001, aliases=["Sen to Chihiro no Kamikakushi"])
+    assert spirited_away.matches({"title": "Sen to Chihiro no Kamikakushi", "release_date": "2001-07-20"})
+    assert spirited_away.matches({"title": "Chihiro", "original_title": "Spirited Away", "release_date": "2001"})
+
+
+def test_tmdb_hit_without_a_known_year_matches_on_title():
+    assert _movie("Zodiac").matches({"title": "Zodiac"})
@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+import pytest
+
+from actions import recommender as recommender_module
+from actions.movies import Movie, MovieIndex
+from actions.recommender import Recommender, load_embeddings, movie_text
+
+VOCABULARY = ["crime", "detective", "killer", "space", "alien", "robot", "love", "music"]
+
+
+class FakeVectors:
+    """Bag-of-words vectors over a tiny vocabulary, standing in for spaCy."""
+
+    model = "fake"
+
+    def __init__(self):
+        self.embedded = 0
+
+    def embed(self, text):
+        words = text.lower().replace(".", " ").split()
+        return np.array([words.count(word) for word in VOCABULARY], dtype=np.float32)
+
+    def embed_many(self, texts):
+        self.embedded += len(texts)
+        return np.vstack([self.embed(text) for text in texts])
+
+
+def _movie(title, overview, genres, language="english"):
+    return Movie.from_dict({"title": title, "overview": overview, "genres": genres, "language": language})
+
+
+@pytest.fixture
+def index():
+    return MovieIndex([
+        _movie("Zodiac", "A detective hunts a killer.", ["crime"]),
+        _movie("Se7en", "Two detective partners chase a killer.", ["crime"]),
+        _movie("Alien", "An alien stalks a space crew.", ["space"]),
+        _movie("Arrival", "An alien ship lands.", ["space"], language="french"),
+        _movie("La La Land", "Love and music.", ["music"]),
+    ])
+
+
+@pytest.fixture
+def recommender(index, tmp_path):
+    vectors = FakeVectors()
+    return Recommender(index, load_embeddings(index, vectors, str(tmp_path)), vectors.embed)
+
+
+def test_movie_text():
+    assert movie_text(_movie("Zodiac", "A detective.", ["crime", "mystery"])) == "A detective. crime mystery"
+
+
+def test_embeddings_are_unit_length_and_cached(index, tmp_path):
+    vectors = FakeVectors()
+    matrix = load_embeddings(index, vectors, str(tmp_path))
+    assert isinstance(matrix, np.memmap) and matrix.shape == (5, len(VOCABULARY))
+    assert np.allclose(np.linalg.norm(matrix, axis=1), 1.0)
+
+    again = load_embeddings(index, vectors, str(tmp_path))
+    assert vectors.embedded == 5
+    assert np.array_equal(matrix, again)
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".npy")]) == 1
+
+
+def test_similar_to_excludes_the_movie_itself(recommender, index):
+    assert [m.title for m in recommender.similar_to(index.get("Zodiac"), k=1)] == ["Se7en"]
+    assert [m.title for m in recommender.similar_to(index.get("Alien"), k=2)][0] == "Arrival"
+
+
+def test_language_filter(recommender, index):
+    assert [m.title for m in recommender.similar_to(index.get("Alien"), k=1, language="French")] == ["Arrival"]
+    assert recommender.for_text("alien", k=5, language="french") == [index.get("Arrival")]
+
+
+def test_for_text(recommender):
+    assert [m.title for m in recommender.for_text("something with love and music", k=1)] == ["La La Land"]
+    assert recommender.for_text("nothing known here") == []
+
+
+def test_matrix_must_match_the_index(index):
+    with pytest.raises(ValueError):
+        Recommender(index, np.zeros((2, len(VOCABULARY)), dtype=np.float32), FakeVectors().embed)
+
+
+@pytest.fixture
+def fresh_singleton(monkeypatch, index):
+    monkeypatch.setattr(recommender_module, "_recommender", None)
+    monkeypatch.setattr(recommender_module, "_unavailable", False)
+    monkeypatch.setattr(recommender_module, "SpacyVectors", lambda model: FakeVectors())
+    monkeypatch.setattr(recommender_module, "get_movie_index", lambda: index)
+
+
+def test_get_recommender_builds_once(fresh_singleton, monkeypatch, tmp_path):
+    monkeypatch.setenv("RECOMMENDER_CACHE_DIR", str(tmp_path))
+    recommender = recommender_module.get_recommender()
+    assert isinstance(recommender, Recommender)
+    assert recommender_module.get_recommender() is recommender
+
+
+@pytest.mark.parametrize("error", [OSError("read-only file system"), ValueError("corrupt .npy")])
+def test_get_recommender_survives_embedding_errors(fresh_singleton, monkeypatch, error):
+    def fail(*args):
+        raise error
+
+    monkeypatch.setattr(recommender_module, "load_embeddings", fail)
+    assert recommender_module.get_recommender() is None
+    assert recommender_module._unavailable
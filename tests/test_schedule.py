@@ -0,0 +1,85 @@
+from datetime import date
+
+import pytest
+
+from actions.schedule import Schedule, screening_id
+
+DAY = date(2024, 3, 1)
+
+CINEMAS = [
+    ("hong kong", "a", "Cinema A"),
+    ("hong kong", "b", "Cinema B"),
+    ("london", "a", "Cinema L"),
+]
+
+# (movie id, cinema id, start minute, screen)
+ROWS = [
+    (0, 0, 600, 1),
+    (0, 1, 660, 1),
+    (0, 0, 900, 1),
+    (0, 1, 600, 2),
+    (0, 2, 600, 1),
+    (1, 0, 720, 2),
+]
+
+
+@pytest.fixture
+def schedule():
+    return Schedule(["Zodiac", "Heat"], CINEMAS, ROWS)
+
+
+def test_next_screenings_in_location_are_sorted_by_start(schedule):
+    screenings = schedule.next_screenings("Zodiac", "hong kong", day=DAY)
+    assert [(s.start, s.cinema) for s in screenings] == [(600, "a"), (600, "b"), (660, "b"), (900, "a")]
+    assert all(s.location == "hong kong" and s.movie == "Zodiac" for s in screenings)
+
+
+def test_next_screenings_after_and_limit(schedule):
+    screenings = schedule.next_screenings("Zodiac", "hong kong", after=601, limit=1, day=DAY)
+    assert [(s.start, s.cinema) for s in screenings] == [(660, "b")]
+
+
+def test_next_screenings_at_one_cinema(schedule):
+    screenings = schedule.next_screenings("Zodiac", "hong kong", cinema="a", day=DAY)
+    assert [s.start for s in screenings] == [600, 900]
+    assert {s.cinema_name for s in screenings} == {"Cinema A"}
+
+
+@pytest.mark.parametrize("movie, location, cinema", [
+    ("Alien", "hong kong", None),
+    ("Zodiac", "paris", None),
+    ("Zodiac", "hong kong", "z"),
+])
+def test_unknown_movie_location_or_cinema(schedule, movie, location, cinema):
+    assert schedule.next_screenings(movie, location, cinema=cinema, day=DAY) == []
+
+
+def test_screenings_at_exact_start(schedule):
+    screenings = schedule.screenings_at("Zodiac", "hong kong", 600, day=DAY)
+    assert sorted(s.cinema for s in screenings) == ["a", "b"]
+    assert schedule.screenings_at("Zodiac", "hong kong", 601, day=DAY) == []
+    assert schedule.screenings_at("Heat", "london", 720, day=DAY) == []
+
+
+def test_screening_ids_include_the_day(schedule):
+    today = schedule.next_screenings("Zodiac", "london", day=DAY)[0]
+    tomorrow = schedule.next_screenings("Zodiac", "london", day=date(2024, 3, 2))[0]
+    assert today.day == "2024-03-01"
+    assert today.screening_id == screening_id("london", "a", 1, 600, "2024-03-01")
+    assert today.screening_id != tomorrow.screening_id
+
+
+def test_day_defaults_to_today(schedule):
+    screening = schedule.next_screenings("Heat", "hong kong")[0]
+    assert screening.day == date.today().isoformat()
+
+
+def test_from_catalogue_screens_every_movie_everywhere():
+    class FakeCatalogue:
+        showtime_minutes = {"Zodiac": [600, 780], "Heat": [660]}
+        locations = ["hong kong"]
+        cinemas_by_location = {"hong kong": {"a": "Cinema A", "b": "Cinema B"}}
+
+    schedule = Schedule.from_catalogue(FakeCatalogue())
+    assert len(schedule) == 6
+    assert [s.screen for s in schedule.next_screenings("Heat", "hong kong", day=DAY)] == [2, 2]
@@ -0,0 +1,118 @@
+from datetime import date, timedelta
+
+import pytest
+
+from actions import seats as seats_module
+from actions.seats import (
+    FREE,
+    HELD,
+    SOLD,
+    InMemorySeatInventory,
+    SeatInventory,
+    SeatMap,
+    SeatsUnavailable,
+    SQLiteSeatInventory,
+)
+
+TODAY = date.today().isoformat()
+YESTERDAY = (date.today() - timedelta(days=1)).isoformat()
+SCREENING = f"{TODAY}|hong kong|a|1|600"
+
+
+@pytest.fixture
+def hall():
+    return SeatMap([("A", "standard"), ("B", "standard"), ("C", "premium")], 4)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def inventory(request, tmp_path):
+    if request.param == "memory":
+        return InMemorySeatInventory(12)
+    return SQLiteSeatInventory(str(tmp_path / "seats.db"))
+
+
+def test_seat_map_codes(hall):
+    assert hall.index("a1") == 0
+    assert hall.index("C4") == 11
+    assert hall.index("D1") is None
+    assert hall.index("A5") is None
+    assert hall.code(5) == "B2"
+    assert hall.seat_type(8) == "premium"
+    assert hall.find_codes("a1, b02 and c3 please") == ["A1", "B2", "C3"]
+
+
+def test_seat_inventory_is_abstract():
+    with pytest.raises(TypeError):
+        SeatInventory()
+
+
+def test_hold_commit_and_occupancy(inventory):
+    hold_id = inventory.hold(SCREENING, [0, 1])
+    assert not inventory.is_free(SCREENING, 0)
+    assert inventory.occupancy(SCREENING, 12)[:4] == bytes([HELD, HELD, FREE, FREE])
+    assert inventory.commit(hold_id)
+    assert inventory.occupancy(SCREENING, 12)[:4] == bytes([SOLD, SOLD, FREE, FREE])
+    assert not inventory.commit(hold_id)
+
+
+def test_hold_is_all_or_nothing(inventory):
+    inventory.hold(SCREENING, [1])
+    with pytest.raises(SeatsUnavailable) as error:
+        inventory.hold(SCREENING, [0, 1, 2])
+    assert error.value.seats == [1]
+    assert inventory.is_free(SCREENING, 0) and inventory.is_free(SCREENING, 2)
+
+
+def test_release_frees_seats(inventory):
+    hold_id = inventory.hold(SCREENING, [3])
+    inventory.release(hold_id)
+    assert inventory.is_free(SCREENING, 3)
+    assert not inventory.commit(hold_id)
+
+
+def test_expired_hold_reads_free_and_cannot_commit(inventory):
+    hold_id = inventory.hold(SCREENING, [2], ttl=-1)
+    assert inventory.is_free(SCREENING, 2)
+    assert inventory.occupancy(SCREENING, 12) == bytes(12)
+    assert not inventory.commit(hold_id)
+    inventory.hold(SCREENING, [2])
+
+
+def test_holding_no_seats_is_an_error(inventory):
+    with pytest.raises(ValueError):
+        inventory.hold(SCREENING, [])
+
+
+def test_screenings_on_other_days_are_separate(inventory):
+    inventory.commit(inventory.hold(SCREENING, [0]))
+    assert inventory.is_free(SCREENING.replace(TODAY, "2099-01-01"), 0)
+
+
+def test_sweep_drops_expired_holds_and_empty_or_past_halls(monkeypatch):
+    inventory = InMemorySeatInventory(12)
+    expired = inventory.hold(SCREENING, [0], ttl=-1)
+    live = inventory.hold(f"{TODAY}|hong kong|b|1|600", [1])
+    inventory.commit(inventory.hold(f"{YESTERDAY}|hong kong|a|1|600", [2]))
+    monkeypatch.setattr(seats_module, "SWEEP_INTERVAL", 0.0)
+    inventory._next_sweep = 0.0
+
+    inventory.hold(f"{TODAY}|london|a|1|600", [3])
+
+    assert expired not in inventory._holds and live in inventory._holds
+    assert set(inventory._halls) == {f"{TODAY}|hong kong|b|1|600", f"{TODAY}|london|a|1|600"}
+    assert not inventory.commit(expired)
+    assert inventory.commit(live)
+
+
+def test_halls_grow_when_the_catalogue_adds_seats(monkeypatch):
+    monkeypatch.delenv("SEAT_INVENTORY_DB", raising=False)
+    monkeypatch.setattr(seats_module, "_inventory", None)
+    inventory = seats_module.get_inventory(4)
+    inventory.hold(SCREENING, [0])
+
+    assert seats_module.get_inventory(12) is inventory
+    inventory.hold(SCREENING, [11])
+    inventory.hold(f"{TODAY}|hong kong|b|1|600", [10])
+    assert inventory.occupancy(SCREENING, 12) == bytes([HELD] + [FREE] * 10 + [HELD])
+    assert inventory.occupancy(SCREENING, 4) == bytes([HELD, FREE, FREE, FREE])
+    assert inventory.is_free(f"{TODAY}|hong kong|b|1|600", 11)
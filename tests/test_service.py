@@ -0,0 +1,144 @@
+import io
+import threading
+import time
+import wave
+
+import pytest
+
+from transcriber import FakeRecognizer
+from transcriber.service import DeadlineExceeded, QueueFull, TranscriptionService
+
+
+def _wav(seconds=0.5, rate=16000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(bytes(int(seconds * rate) * 2))
+    return buffer.getvalue()
+
+
+class BlockingRecognizer(FakeRecognizer):
+    """Holds every recognition until `release` is set."""
+
+    def __init__(self, transcript="two tickets"):
+        super().__init__(transcript)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def recognize(self, content, config, timeout=None):
+        self.started.set()
+        self.release.wait(5)
+        return super().recognize(content, config, timeout)
+
+
+@pytest.fixture
+def blocking():
+    return BlockingRecognizer()
+
+
+@pytest.fixture
+def make_service():
+    services = []
+
+    def make(factory, **options):
+        services.append(TranscriptionService(factory, trim_silence=False, **options))
+        return services[-1]
+
+    yield make
+    for service in services:
+        service.close(wait=False)
+
+
+@pytest.fixture
+def single(make_service, blocking):
+    return make_service(lambda: blocking, workers=1, max_queue=1, block_timeout=0.05)
+
+
+def test_transcribes_with_a_backend(single, blocking):
+    blocking.release.set()
+    assert single.transcribe(_wav()) == "two tickets"
+    assert single.stats()["completed"] == 1
+
+
+def test_queue_full_after_block_timeout(single, blocking):
+    running = single.submit(_wav())
+    queued = single.submit(_wav())
+    started = time.monotonic()
+    with pytest.raises(QueueFull):
+        single.submit(_wav())
+    assert time.monotonic() - started >= 0.05
+    assert single.stats()["rejected"] == 1
+
+    blocking.release.set()
+    assert running.result(5) == queued.result(5) == "two tickets"
+
+
+def test_stats_count_queued_and_running_jobs(single, blocking):
+    running = single.submit(_wav())
+    assert blocking.started.wait(5)
+    queued = single.submit(_wav())
+    stats = single.stats()
+    assert (stats["running"], stats["queue_depth"]) == (1, 1)
+
+    blocking.release.set()
+    running.result(5), queued.result(5)
+    stats = single.stats()
+    assert (stats["running"], stats["queue_depth"], stats["completed"]) == (0, 0, 2)
+
+
+def test_deadline_passes_while_queued(single, blocking):
+    running = single.submit(_wav())
+    assert blocking.started.wait(5)
+    queued = single.submit(_wav(), deadline=0.05)
+    time.sleep(0.1)
+    blocking.release.set()
+
+    assert running.result(5) == "two tickets"
+    with pytest.raises(DeadlineExceeded):
+        queued.result(5)
+    assert single.stats()["expired"] == 1
+    assert blocking.calls == 1
+
+
+def test_backends_are_pooled_and_reused(make_service):
+    created = []
+
+    def factory():
+        created.append(FakeRecognizer("hello"))
+        return created[-1]
+
+    service = make_service(factory, workers=3)
+    for _ in range(5):
+        assert service.transcribe(_wav()) == "hello"
+    assert len(created) == 1 and created[0].calls == 5
+    assert service.stats()["backends"] == 1
+
+
+def test_waits_for_a_pooled_backend_until_the_deadline(make_service, blocking):
+    service = make_service(lambda: blocking, workers=1)
+    backend = service._borrow_backend(time.monotonic() + 1)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        service._borrow_backend(time.monotonic() + 0.05)
+    assert 0.04 <= time.monotonic() - started < 1
+    service._backends.put(backend)
+    assert service._borrow_backend(time.monotonic() + 0.05) is backend
+
+
+def test_failed_backend_creation_frees_its_slot(make_service):
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("no credentials")
+        return FakeRecognizer("hello")
+
+    service = make_service(factory, workers=1)
+    with pytest.raises(RuntimeError):
+        service.transcribe(_wav())
+    assert service.stats()["backends"] == 0
+    assert service.transcribe(_wav()) == "hello"
+    assert service.stats()["backends"] == 1
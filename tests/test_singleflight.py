@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from actions.singleflight import SingleFlight
+
+
+def _slow(calls, result="hit", delay=0.05, error=None):
+    async def call():
+        calls.append(result)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return result
+    return call
+
+
+def test_concurrent_calls_share_one_flight():
+    flights = SingleFlight()
+    calls = []
+
+    async def main():
+        return await asyncio.gather(*(flights.do("zodiac", _slow(calls)) for _ in range(10)))
+
+    assert asyncio.run(main()) == ["hit"] * 10
+    assert calls == ["hit"]
+    assert flights.stats() == {"calls": 1, "coalesced": 9, "in_flight": 0}
+
+
+def test_different_keys_fly_separately():
+    flights = SingleFlight()
+    calls = []
+
+    async def main():
+        return await asyncio.gather(flights.do("a", _slow(calls, "a")), flights.do("b", _slow(calls, "b")))
+
+    assert asyncio.run(main()) == ["a", "b"]
+    assert sorted(calls) == ["a", "b"]
+
+
+def test_later_calls_start_a_new_flight():
+    flights = SingleFlight()
+    calls = []
+
+    async def main():
+        await flights.do("zodiac", _slow(calls, delay=0))
+        await flights.do("zodiac", _slow(calls, delay=0))
+
+    asyncio.run(main())
+    assert len(calls) == 2 and flights.coalesced == 0
+
+
+def test_errors_reach_every_waiter():
+    flights = SingleFlight()
+    calls = []
+
+    async def main():
+        return await asyncio.gather(
+            *(flights.do("zodiac", _slow(calls, error=ValueError("bad page"))) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_caller_does_not_cancel_the_flight():
+    flights = SingleFlight()
+    calls = []
+
+    async def main():
+        first = asyncio.ensure_future(flights.do("zodiac", _slow(calls)))
+        second = asyncio.ensure_future(flights.do("zodiac", _slow(calls)))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "hit"
+    assert calls == ["hit"]
+
+
+def test_flights_are_kept_per_loop():
+    flights = SingleFlight()
+    calls = []
+    for _ in range(2):
+        asyncio.run(flights.do("zodiac", _slow(calls, delay=0)))
+    assert len(calls) == 2 and flights.stats()["in_flight"] == 0
@@ -0,0 +1,86 @@
+import pytest
+
+from actions.timeparse import (
+    TimeQuery,
+    first_in_range,
+    format_minutes,
+    last_in_range,
+    minutes_array,
+    nearest,
+    parse_clock,
+    parse_time_expression,
+    resolve,
+)
+
+# 10:00 AM, 01:00 PM, 04:00 PM, 07:00 PM
+SHOWTIMES = minutes_array(["07:00 PM", "10:00 AM", "04:00 PM", "01:00 PM"])
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("7 pm", TimeQuery("exact", 19 * 60, 19 * 60)),
+    ("7:30 p.m.", TimeQuery("exact", 19 * 60 + 30, 19 * 60 + 30)),
+    ("12 am", TimeQuery("exact", 0, 0)),
+    ("17:00", TimeQuery("exact", 17 * 60, 17 * 60)),
+    ("5:00", TimeQuery("exact", 5 * 60, 5 * 60, ambiguous=True)),
+    ("around 5pm", TimeQuery("approx", 17 * 60, 17 * 60)),
+    ("5pm-ish", TimeQuery("approx", 17 * 60, 17 * 60)),
+    ("after 2pm", TimeQuery("range", 14 * 60 + 1, 24 * 60)),
+    ("before 5pm", TimeQuery("before", 0, 17 * 60)),
+    ("by 5pm", TimeQuery("before", 0, 17 * 60)),
+    ("in the evening", TimeQuery("range", 17 * 60, 21 * 60)),
+    ("the earliest one", TimeQuery("earliest")),
+    ("the last one", TimeQuery("latest")),
+])
+def test_parse_time_expression(text, expected):
+    assert parse_time_expression(text) == expected
+
+
+@pytest.mark.parametrize("text", ["13 pm", "25:00", "7:75 pm", "no idea", "2"])
+def test_not_a_time(text):
+    assert parse_time_expression(text) is None
+
+
+def test_clock_round_trip():
+    assert parse_clock("07:00 PM") == 19 * 60
+    assert format_minutes(19 * 60) == "07:00 PM"
+    assert format_minutes(0) == "12:00 AM"
+    assert format_minutes(12 * 60 + 5) == "12:05 PM"
+    with pytest.raises(ValueError):
+        parse_clock("evening")
+
+
+def test_minutes_array_is_sorted():
+    assert list(SHOWTIMES) == [600, 780, 960, 1140]
+
+
+def test_bisect_helpers():
+    assert nearest(SHOWTIMES, 0) == 0
+    assert nearest(SHOWTIMES, 2000) == 3
+    assert nearest(SHOWTIMES, 900) == 2
+    assert nearest([], 900) is None
+    assert first_in_range(SHOWTIMES, 700, 1000) == 1
+    assert last_in_range(SHOWTIMES, 700, 1000) == 2
+    assert first_in_range(SHOWTIMES, 1150, 1440) is None
+    assert last_in_range(SHOWTIMES, 0, 600) is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("7 pm", 3),
+    ("7:00", 3),
+    ("8 pm", None),
+    ("around 3:30 pm", 2),
+    ("around 11 pm", None),
+    ("after 1pm", 2),
+    ("before 5pm", 2),
+    ("until 4pm", 1),
+    ("before 10am", None),
+    ("this afternoon", 1),
+    ("earliest", 0),
+    ("latest", 3),
+])
+def test_resolve(text, expected):
+    assert resolve(SHOWTIMES, parse_time_expression(text)) == expected
+
+
+def test_resolve_without_showtimes():
+    assert resolve([], TimeQuery("earliest")) is None
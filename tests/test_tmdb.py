@@ -0,0 +1,81 @@
+import asyncio
+
+from aiohttp import web
+
+from actions.cache import TTLCache
+from actions.tmdb import TMDBClient
+
+
+async def _serve(handler):
+    app = web.Application()
+    app.router.add_get("/3/search/movie", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}/3"
+
+
+async def _search(handler, queries):
+    runner, base_url = await _serve(handler)
+    client = TMDBClient(api_key="test", base_url=base_url, cache=TTLCache())
+    try:
+        return await client.search_movies(queries), client
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+def test_returns_first_hit():
+    async def handler(request):
+        return web.json_response({"results": [{"title": request.query["query"]}, {"title": "other"}]})
+
+    results, client = asyncio.run(_search(handler, ["Zodiac", "Se7en"]))
+    assert results == [{"title": "Zodiac"}, {"title": "Se7en"}]
+    assert client.cache.get("zodiac") == {"title": "Zodiac"}
+
+
+def test_html_error_page_falls_back_to_none():
+    async def handler(request):
+        return web.Response(text="<html>Bad gateway</html>", content_type="text/html")
+
+    results, _ = asyncio.run(_search(handler, ["Zodiac"]))
+    assert results == [None]
+
+
+def test_unexpected_json_falls_back_to_none():
+    async def handler(request):
+        return web.json_response(["not", "a", "search", "result"])
+
+    results, _ = asyncio.run(_search(handler, ["Zodiac"]))
+    assert results == [None]
+
+
+def test_http_error_falls_back_to_none():
+    async def handler(request):
+        raise web.HTTPServiceUnavailable()
+
+    results, client = asyncio.run(_search(handler, ["Zodiac"]))
+    assert results == [None]
+    assert len(client.cache) == 0
+
+
+def test_new_loop_closes_previous_session():
+    async def handler(request):
+        return web.json_response({"results": [{"title": request.query["query"]}]})
+
+    async def search(client, query):
+        runner, base_url = await _serve(handler)
+        client.base_url = base_url
+        try:
+            return await client.search_movie(query), client._session
+        finally:
+            await runner.cleanup()
+
+    client = TMDBClient(api_key="test", base_url="http://127.0.0.1:9/3", cache=TTLCache())
+    _, first = asyncio.run(search(client, "Zodiac"))
+    result, second = asyncio.run(search(client, "Se7en"))
+    assert result == {"title": "Se7en"}
+    assert first is not second
+    assert first.closed
+    asyncio.run(client.close())
@@ -0,0 +1,107 @@
+import asyncio
+import struct
+import threading
+import wave
+
+import pytest
+
+from transcriber import AudioConfig, FakeRecognizer, Hypothesis, RecognizerBackend
+from transcriber.transcriber import astream_transcription, config_for_path, iter_chunks, stream_transcription
+
+
+def _ogg_page(packet: bytes) -> bytes:
+    """A first Ogg page carrying one packet (checksum left blank)."""
+    header = b"OggS" + bytes([0, 2]) + struct.pack("<qIII", 0, 1, 0, 0) + bytes([1, len(packet)])
+    return header + packet
+
+
+def _opus_head() -> bytes:
+    return b"OpusHead" + bytes([1, 1]) + struct.pack("<HIhB", 312, 16000, 0, 0)
+
+
+def test_recognizer_backend_is_abstract():
+    with pytest.raises(TypeError):
+        RecognizerBackend()
+
+
+def test_config_for_wav_uses_its_rate(tmp_path):
+    path = str(tmp_path / "clip.wav")
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(bytes(320))
+    assert config_for_path(path) == AudioConfig("LINEAR16", 16000, "en-US")
+
+
+def test_config_for_ogg_opus(tmp_path):
+    path = tmp_path / "note.ogg"
+    path.write_bytes(_ogg_page(_opus_head()))
+    assert config_for_path(str(path)).encoding == "OGG_OPUS"
+
+
+def test_config_for_ogg_vorbis_is_rejected(tmp_path):
+    path = tmp_path / "song.ogg"
+    path.write_bytes(_ogg_page(b"\x01vorbis" + bytes(22)))
+    with pytest.raises(ValueError, match="only Ogg Opus"):
+        config_for_path(str(path))
+
+
+def test_iter_chunks_splits_bytes():
+    assert [bytes(chunk) for chunk in iter_chunks(b"abcdefg", 3)] == [b"abc", b"def", b"g"]
+
+
+def test_stream_transcription_reveals_words():
+    recognizer = FakeRecognizer("two tickets please", bytes_per_word=4)
+    hypotheses = list(stream_transcription(bytes(12), AudioConfig(), recognizer, chunk_size=4))
+    assert [(h.text, h.is_final) for h in hypotheses] == [
+        ("two", False), ("two tickets", False), ("two tickets please", False), ("two tickets please", True),
+    ]
+
+
+class _EndlessRecognizer(FakeRecognizer):
+    """Streams a hypothesis per chunk for as long as chunks keep coming."""
+
+    def __init__(self):
+        super().__init__("")
+        self.closed = threading.Event()
+
+    def streaming_recognize(self, chunks, config):
+        try:
+            for _ in chunks:
+                yield Hypothesis("still talking", False)
+        finally:
+            self.closed.set()
+
+
+def _endless_audio():
+    while True:
+        yield bytes(16)
+
+
+def test_astream_stops_the_pump_when_the_consumer_stops():
+    recognizer = _EndlessRecognizer()
+
+    async def consume():
+        stream = astream_transcription(_endless_audio(), AudioConfig(), recognizer)
+        async for hypothesis in stream:
+            assert hypothesis.text == "still talking"
+            break
+        await stream.aclose()
+        # The stream is closed while the loop is still running
+        return await asyncio.get_running_loop().run_in_executor(None, recognizer.closed.wait, 2)
+
+    assert asyncio.run(consume())
+
+
+def test_astream_raises_recognizer_errors():
+    class Failing(FakeRecognizer):
+        def streaming_recognize(self, chunks, config):
+            raise RuntimeError("boom")
+            yield
+
+    async def consume():
+        return [h async for h in astream_transcription(b"abc", AudioConfig(), Failing())]
+
+    with pytest.raises(RuntimeError, match="boom"):
+        asyncio.run(consume())
@@ -0,0 +1,96 @@
+import struct
+
+import pytest
+
+from transcriber import FakeRecognizer
+from transcriber.cache import TranscriptionCache, audio_key
+from transcriber.service import TranscriptionService
+
+
+def _wav(samples: bytes, rate=16000, extra_chunk=b"") -> bytes:
+    """A 16-bit mono WAV; `extra_chunk` goes in a LIST chunk before the data."""
+    fmt = struct.pack("<HHIIHH", 1, 1, rate, rate * 2, 2, 16)
+    chunks = b"fmt " + struct.pack("<I", len(fmt)) + fmt
+    if extra_chunk:
+        chunks += b"LIST" + struct.pack("<I", len(extra_chunk)) + extra_chunk
+    chunks += b"data" + struct.pack("<I", len(samples)) + samples
+    return b"RIFF" + struct.pack("<I", 4 + len(chunks)) + b"WAVE" + chunks
+
+
+def test_audio_key_depends_on_content_and_config():
+    assert audio_key(b"abc", "en-US") == audio_key(bytearray(b"abc"), "en-US")
+    assert audio_key(b"abc", "en-US") != audio_key(b"abc", "ja-JP")
+    assert audio_key(b"abc", "en-US") != audio_key(b"abd", "en-US")
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TranscriptionCache(maxsize=2)
+    cache.store("a", "one")
+    cache.store("b", "two")
+    assert cache.lookup("a") == (True, "one")
+    cache.store("c", "three")
+
+    assert cache.lookup("b") == (False, None)
+    assert cache.lookup("a") == (True, "one")
+    assert cache.lookup("c") == (True, "three")
+    assert cache.stats() == {"size": 2, "hits": 3, "disk_hits": 0, "misses": 1, "evictions": 1}
+
+
+def test_empty_results_are_cached():
+    cache = TranscriptionCache()
+    cache.store("silence", None)
+    assert cache.lookup("silence") == (True, None)
+    assert cache.lookup("unknown") == (False, None)
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / "transcripts.db")
+    first = TranscriptionCache(path=path)
+    first.store("a", "two tickets")
+    first.store("silence", None)
+
+    second = TranscriptionCache(path=path)
+    assert second.lookup("a") == (True, "two tickets")
+    assert second.lookup("silence") == (True, None)
+    assert second.lookup("a") == (True, "two tickets")
+    assert second.stats()["disk_hits"] == 2 and second.stats()["hits"] == 1
+
+    second.clear()
+    assert TranscriptionCache(path=path).lookup("a") == (False, None)
+
+
+@pytest.fixture
+def recognizer():
+    return FakeRecognizer("two tickets")
+
+
+@pytest.fixture
+def service(recognizer):
+    service = TranscriptionService(lambda: recognizer, workers=2, trim_silence=False, cache=TranscriptionCache())
+    yield service
+    service.close(wait=False)
+
+
+def test_service_dedupes_the_same_audio_in_another_wrapper(service, recognizer):
+    samples = bytes(range(256)) * 64
+    plain, tagged = _wav(samples), _wav(samples, extra_chunk=b"INFOISFT\x04\x00\x00\x00test")
+    assert plain != tagged
+
+    assert service.transcribe(plain) == "two tickets"
+    # Different bytes, same audio and config: answered by the decoded-audio key
+    assert service.transcribe(tagged) == "two tickets"
+    assert recognizer.calls == 1
+    assert service.stats()["cached"] == 1
+
+    # The raw key of the re-wrapped file was stored too, so it skips the queue
+    future = service.submit(tagged)
+    assert future.done() and future.result() == "two tickets"
+    assert service.stats()["cached"] == 2
+
+
+def test_service_keys_include_the_language(service, recognizer):
+    clip = _wav(bytes(3200))
+    service.transcribe(clip)
+    service.transcribe(clip, language_code="ja-JP")
+    service.transcribe(clip)
+    assert recognizer.calls == 2
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from transcriber.audio import PCMAudio
+from transcriber.vad import frame_features, speech_mask, trim_silence
+
+RATE = 16000
+
+
+def _tone(seconds, amplitude=8000, frequency=220):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype("<i2")
+
+
+def _silence(seconds):
+    return np.zeros(int(seconds * RATE), dtype="<i2")
+
+
+def _pcm(*parts, extra=b""):
+    return PCMAudio(memoryview(np.concatenate(parts).tobytes() + extra), RATE)
+
+
+def test_frame_features():
+    energy_db, zcr = frame_features(np.concatenate([_silence(0.02), _tone(0.02)]), 320)
+    assert energy_db[0] < -90 and energy_db[1] > -20
+    assert zcr[0] == 0 and zcr[1] > 0
+
+
+def test_speech_mask_flags_the_tone_with_hangover():
+    mask, frame_length = speech_mask(np.concatenate([_silence(1), _tone(0.5), _silence(1)]), RATE)
+    assert frame_length == 320
+    speech = np.flatnonzero(mask)
+    # 25 tone frames from frame 50, widened by 10 frames of hangover each side
+    assert (speech[0], speech[-1]) == (40, 84)
+
+
+def test_trim_silence_drops_edges_and_shortens_pauses():
+    audio = _pcm(_silence(1), _tone(0.5), _silence(2), _tone(0.5), _silence(1))
+    result = trim_silence(audio)
+    # Each tone keeps 0.2 s of hangover either side; the pause shrinks to 0.3 s
+    assert result.audio.duration == pytest.approx(0.9 + 0.3 + 0.9, abs=0.02)
+    assert result.removed_seconds == pytest.approx(audio.duration - result.audio.duration)
+    assert [round(start, 1) for start, _ in result.segments] == [0.8, 3.3]
+
+
+def test_trim_silence_keeps_a_silent_clip():
+    audio = _pcm(_silence(1))
+    result = trim_silence(audio)
+    assert result.audio is audio and result.removed_seconds == 0.0 and result.segments == []
+
+
+def test_trim_silence_ignores_a_dangling_odd_byte():
+    result = trim_silence(_pcm(_silence(1), _tone(0.5), _silence(1), extra=b"\x01"))
+    assert len(result.audio.data) % 2 == 0
+    assert result.audio.duration == pytest.approx(0.9, abs=0.02)
@@ -1 +1,7 @@
-from .transcriber import transcribe_audio
\ No newline at end of file
+from .transcriber import transcribe_audio, transcribe_bytes, stream_transcription, astream_transcription
+from .backends import AudioConfig, Hypothesis, RecognizerBackend, GoogleRecognizer, FakeRecognizer
+from .audio import AudioFormatError, PCMAudio, PreparedAudio, decode_to_pcm, prepare_audio, negotiation_stats
+from .service import TranscriptionService, QueueFull, DeadlineExceeded, get_service
+from .cache import TranscriptionCache
+from .vad import TrimResult, speech_mask, trim_silence
+from .chunking import plan_chunks, stitch, transcribe_chunked
@@ -0,0 +1,196 @@
+import io
+import struct
+import threading
+from typing import Any, Dict, NamedTuple, Optional, Text, Union
+
+from pydub import AudioSegment
+
+from .backends import AudioConfig
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+
+class AudioFormatError(ValueError):
+    """The audio claims a format but its headers are broken or truncated."""
+
+
+class PCMAudio(NamedTuple):
+    """Decoded audio as 16-bit little-endian mono samples (LINEAR16)."""
+    data: memoryview
+    sample_rate: int
+
+    @property
+    def duration(self) -> float:
+        return len(self.data) / (2 * self.sample_rate) if self.sample_rate else 0.0
+
+
+def _wav_pcm(view: memoryview) -> Optional[PCMAudio]:
+    """The sample data of a 16-bit mono PCM WAV as a slice of `view`, or None
+    if the file is anything else and needs converting. Raises
+    `AudioFormatError` if the fmt chunk is cut short."""
+    if len(view) < 12 or view[0:4] != b"RIFF" or view[8:12] != b"WAVE":
+        return None
+    offset, fmt = 12, None
+    while offset + 8 <= len(view):
+        chunk_id = bytes(view[offset:offset + 4])
+        (size,) = struct.unpack_from("<I", view, offset + 4)
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            if size < 16 or body + 16 > len(view):
+                raise AudioFormatError(f"WAV fmt chunk is truncated ({min(size, len(view) - body)} of 16 bytes)")
+            fmt = struct.unpack_from("<HHIIHH", view, body)
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            audio_format, channels, sample_rate, _, _, bits = fmt
+            if audio_format != 1 or channels != 1 or bits != 16:
+                return None
+            return PCMAudio(view[body:min(body + size, len(view))], sample_rate)
+        offset = body + size + (size & 1)
+    return None
+
+
+def decode_to_pcm(content: BytesLike, audio_format: Optional[str] = None) -> PCMAudio:
+    """Decode audio bytes to LINEAR16 mono entirely in memory.
+
+    A 16-bit mono WAV is not copied at all: the samples are a view into
+    `content`. Anything else is decoded by pydub through in-memory buffers
+    (ffmpeg reads stdin and writes stdout), keeping its real sample rate.
+    """
+    view = memoryview(content)
+    if audio_format is None and view[0:4] == b"RIFF":
+        audio_format = "wav"
+    if audio_format == "wav":
+        pcm = _wav_pcm(view)
+        if pcm is not None:
+            return pcm
+    segment = AudioSegment.from_file(io.BytesIO(view), format=audio_format)
+    segment = segment.set_sample_width(2).set_channels(1)
+    return PCMAudio(memoryview(segment.raw_data), segment.frame_rate)
+
+
+# Sample rates the recognizer accepts for OGG_OPUS; Opus itself decodes at 48k
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+
+class PreparedAudio(NamedTuple):
+    """Audio ready for the recognizer, and how it got there."""
+    content: BytesLike
+    config: AudioConfig
+    path: Text  # "passthrough" or "transcode"
+    duration: float
+    trimmed_seconds: float = 0.0
+
+
+def _opus_info(view: memoryview):
+    """(sample rate, duration) of a mono Ogg Opus stream, else None."""
+    if len(view) < 47 or view[0:4] != b"OggS":
+        return None
+    # First page: 27-byte header, segment table, then the 19-byte OpusHead packet
+    head = 27 + view[26]
+    if len(view) < head + 19 or view[head:head + 8] != b"OpusHead" or view[head + 9] != 1:
+        return None
+    pre_skip, input_rate = struct.unpack_from("<HI", view, head + 10)
+    # The last page's granule position counts 48 kHz samples. Without a
+    # whole page header in the last 64 KiB the stream is damaged, so leave
+    # it to the decoder rather than guess its length.
+    tail = max(len(view) - 65536, 0)
+    last_page = bytes(view[tail:]).rfind(b"OggS")
+    if last_page == -1 or tail + last_page + 14 > len(view):
+        return None
+    (granule,) = struct.unpack_from("<q", view, tail + last_page + 6)
+    rate = input_rate if input_rate in OPUS_SAMPLE_RATES else 48000
+    return rate, max(granule - pre_skip, 0) / 48000
+
+
+def _flac_info(view: memoryview):
+    """(sample rate, duration) of a mono FLAC stream, else None."""
+    if len(view) < 42 or view[0:4] != b"fLaC" or view[4] & 0x7F != 0:
+        return None
+    # STREAMINFO: 20-bit rate, 3-bit channels - 1, 5-bit bps - 1, 36-bit samples
+    (packed,) = struct.unpack_from(">Q", view, 18)
+    rate = packed >> 44
+    channels = ((packed >> 41) & 0x7) + 1
+    samples = packed & 0xFFFFFFFFF
+    if channels != 1 or not rate:
+        return None
+    return rate, samples / rate
+
+
+class NegotiationStats:
+    """Which path clips took and how many bytes passthrough saved compared
+    with sending them as LINEAR16."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        self.clips = {"passthrough": 0, "transcode": 0}
+        self.encodings: Dict[Text, int] = {}
+        self.bytes_sent = 0
+        self.bytes_saved = 0
+        self.seconds_trimmed = 0.0
+
+    def record(self, prepared: PreparedAudio) -> None:
+        sent = len(prepared.content)
+        linear16 = int(prepared.duration * prepared.config.sample_rate_hertz) * 2
+        with self._lock:
+            self.clips[prepared.path] += 1
+            self.encodings[prepared.config.encoding] = self.encodings.get(prepared.config.encoding, 0) + 1
+            self.bytes_sent += sent
+            if prepared.path == "passthrough" and prepared.config.encoding != "LINEAR16":
+                self.bytes_saved += max(linear16 - sent, 0)
+            self.seconds_trimmed += prepared.trimmed_seconds
+
+    def stats(self) -> Dict[Text, Any]:
+        with self._lock:
+            return {
+                "clips": dict(self.clips),
+                "encodings": dict(self.encodings),
+                "bytes_sent": self.bytes_sent,
+                "bytes_saved": self.bytes_saved,
+                "seconds_trimmed": self.seconds_trimmed,
+            }
+
+
+negotiation_stats = NegotiationStats()
+
+
+def prepare_audio(
+    content: BytesLike,
+    audio_format: Optional[Text] = None,
+    language_code: Text = "en-US",
+    trim: bool = False,
+) -> PreparedAudio:
+    """Pick the cheapest encoding the recognizer accepts for `content`.
+
+    The container is recognised from its magic bytes, not the file name.
+    Mono Ogg Opus and FLAC, and 16-bit mono WAV, are sent unchanged;
+    anything else (Vorbis, stereo, MP3, ...) is transcoded to LINEAR16.
+
+    With `trim`, silence is cut from LINEAR16 audio before it is sent.
+    Compressed passthrough clips are left alone: decoding them just to
+    trim would cost more upload than the silence does.
+    """
+    view = memoryview(content)
+    prepared = None
+    for encoding, info in (("OGG_OPUS", _opus_info), ("FLAC", _flac_info)):
+        found = info(view)
+        if found:
+            rate, duration = found
+            prepared = PreparedAudio(view, AudioConfig(encoding, rate, language_code), "passthrough", duration)
+            break
+    if prepared is None:
+        wav = _wav_pcm(view) if view[0:4] == b"RIFF" else None
+        path = "passthrough" if wav is not None else "transcode"
+        pcm = wav or decode_to_pcm(view, audio_format)
+        trimmed = 0.0
+        if trim:
+            from .vad import trim_silence
+            pcm, trimmed, _ = trim_silence(pcm)
+        prepared = PreparedAudio(
+            pcm.data, AudioConfig("LINEAR16", pcm.sample_rate, language_code), path, pcm.duration, trimmed,
+        )
+    negotiation_stats.record(prepared)
+    return prepared
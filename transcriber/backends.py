@@ -0,0 +1,123 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Text
+
+
+class AudioConfig(NamedTuple):
+    """What the recognizer needs to know about the audio it is sent."""
+    encoding: Text = "LINEAR16"
+    sample_rate_hertz: int = 48000
+    language_code: Text = "en-US"
+
+
+class Hypothesis(NamedTuple):
+    """One recognition result from a stream.
+
+    Interim hypotheses may still change; a final one will not. `elapsed` is
+    filled in by `stream_transcription` with the seconds since streaming
+    started.
+    """
+    text: Text
+    is_final: bool
+    stability: float = 0.0
+    elapsed: float = 0.0
+
+
+class RecognizerBackend(ABC):
+    """A speech recognizer: whole clips via `recognize`, or chunks as they
+    arrive via `streaming_recognize`."""
+
+    @abstractmethod
+    def recognize(self, content: bytes, config: AudioConfig, timeout: Optional[float] = None) -> Optional[Text]:
+        ...
+
+    @abstractmethod
+    def streaming_recognize(self, chunks: Iterable[bytes], config: AudioConfig) -> Iterator[Hypothesis]:
+        ...
+
+
+class GoogleRecognizer(RecognizerBackend):
+    """Google Cloud Speech-to-Text. The client is created on first use,
+    once even when several chunk threads ask for it at the same time."""
+
+    def __init__(self, client=None):
+        self._client = client
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from google.cloud import speech_v1p1beta1 as speech
+                    self._client = speech.SpeechClient()
+        return self._client
+
+    @staticmethod
+    def _recognition_config(config: AudioConfig):
+        from google.cloud import speech_v1p1beta1 as speech
+        return speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding[config.encoding],
+            sample_rate_hertz=config.sample_rate_hertz,
+            language_code=config.language_code,
+        )
+
+    def recognize(self, content: bytes, config: AudioConfig, timeout: Optional[float] = None) -> Optional[Text]:
+        from google.cloud import speech_v1p1beta1 as speech
+        response = self.client.recognize(
+            config=self._recognition_config(config),
+            audio=speech.RecognitionAudio(content=bytes(content)),
+            timeout=timeout,
+        )
+        if not response.results:
+            return None
+        return " ".join(result.alternatives[0].transcript.strip() for result in response.results if result.alternatives)
+
+    def streaming_recognize(self, chunks: Iterable[bytes], config: AudioConfig) -> Iterator[Hypothesis]:
+        from google.cloud import speech_v1p1beta1 as speech
+        streaming_config = speech.StreamingRecognitionConfig(
+            config=self._recognition_config(config),
+            interim_results=True,
+        )
+        requests = (speech.StreamingRecognizeRequest(audio_content=bytes(chunk)) for chunk in chunks)
+        for response in self.client.streaming_recognize(config=streaming_config, requests=requests):
+            for result in response.results:
+                if result.alternatives:
+                    yield Hypothesis(result.alternatives[0].transcript, result.is_final, result.stability)
+
+
+class FakeRecognizer(RecognizerBackend):
+    """Offline stand-in that "hears" a fixed transcript.
+
+    While streaming it reveals one more word for every `bytes_per_word` bytes
+    received, as interim hypotheses, and the full text as the final one.
+    `latency` seconds are spent per recognition call to mimic a network hop.
+    """
+
+    def __init__(self, transcript: Text = "", bytes_per_word: int = 16000, latency: float = 0.0):
+        self.transcript = transcript
+        self.bytes_per_word = bytes_per_word
+        self.latency = latency
+        self.calls = 0
+
+    def recognize(self, content: bytes, config: AudioConfig, timeout: Optional[float] = None) -> Optional[Text]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.transcript or None
+
+    def streaming_recognize(self, chunks: Iterable[bytes], config: AudioConfig) -> Iterator[Hypothesis]:
+        self.calls += 1
+        words: List[Text] = self.transcript.split()
+        received = shown = 0
+        for chunk in chunks:
+            received += len(chunk)
+            heard = min(len(words), received // self.bytes_per_word)
+            if heard > shown:
+                shown = heard
+                yield Hypothesis(" ".join(words[:shown]), False, 0.5)
+        if self.latency:
+            time.sleep(self.latency)
+        if words:
+            yield Hypothesis(self.transcript, True, 1.0)
@@ -0,0 +1,183 @@
+"""Transcribe a directory (or manifest) of voice notes into a JSONL file.
+
+    python -m transcriber.batch voice_notes/ --output transcripts.jsonl --workers 8
+
+Each line of the output holds one clip: its path, transcript, duration and
+how it was sent. The output doubles as the checkpoint: on a rerun, clips
+already in it are skipped and clips that failed are retried. When a path
+has several records the last one wins, and a run that retried clips
+rewrites the file with one line per path. A manifest is a text file of
+paths, or a JSONL file with a "path" per line.
+
+For an offline dry run, `--fake "some words"` swaps the recognizer for a
+`FakeRecognizer` that answers with those words.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+from typing import Any, Dict, Iterator, Optional, Set, Text
+
+from .audio import prepare_audio
+from .backends import FakeRecognizer, GoogleRecognizer, RecognizerBackend
+from .chunking import MAX_CHUNK_SECONDS, transcribe_long
+
+AUDIO_EXTENSIONS = (".ogg", ".opus", ".wav", ".flac", ".mp3", ".m4a", ".webm")
+
+# Set in each worker process by _init_worker
+_backend: Optional[RecognizerBackend] = None
+_language_code = "en-US"
+_trim = True
+
+
+def iter_sources(source: Text) -> Iterator[Text]:
+    """Audio paths under a directory (sorted, recursive) or listed in a manifest."""
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    yield os.path.join(root, name)
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding="utf-8") as manifest:
+        for line in manifest:
+            line = line.strip()
+            if not line:
+                continue
+            path = json.loads(line)["path"] if line.startswith("{") else line
+            yield path if os.path.isabs(path) else os.path.join(base, path)
+
+
+def _read_records(output: Text) -> Iterator[Dict[Text, Any]]:
+    with open(output, encoding="utf-8") as results:
+        for line in results:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interrupted run
+
+
+def load_checkpoint(output: Text) -> Set[Text]:
+    """Paths whose last record in `output` is a success."""
+    done = set()
+    if not os.path.exists(output):
+        return done
+    for record in _read_records(output):
+        if "error" in record:
+            done.discard(record["path"])
+        else:
+            done.add(record["path"])
+    return done
+
+
+def compact(output: Text) -> None:
+    """Rewrite `output` keeping only the last record of each path."""
+    latest: Dict[Text, Dict[Text, Any]] = {}
+    for record in _read_records(output):
+        latest.pop(record["path"], None)  # re-insert so the order follows the last record
+        latest[record["path"]] = record
+    temporary = f"{output}.tmp"
+    with open(temporary, "w", encoding="utf-8") as results:
+        for record in latest.values():
+            results.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(temporary, output)
+
+
+def _init_worker(fake_transcript: Optional[Text], language_code: Text, trim: bool) -> None:
+    global _backend, _language_code, _trim
+    _backend = FakeRecognizer(fake_transcript) if fake_transcript is not None else GoogleRecognizer()
+    _language_code = language_code
+    _trim = trim
+
+
+def transcribe_file(path: Text) -> Dict[Text, Any]:
+    """Transcribe one clip in a worker process; errors are returned, not raised."""
+    started = time.perf_counter()
+    record: Dict[Text, Any] = {"path": path}
+    try:
+        with open(path, "rb") as audio_file:
+            content = audio_file.read()
+        audio_format = os.path.splitext(path)[1][1:].lower() or None
+        audio = prepare_audio(content, audio_format, _language_code, trim=_trim)
+        if audio.duration > MAX_CHUNK_SECONDS:
+            transcript = transcribe_long(content, audio_format, audio, _backend.recognize)
+        else:
+            transcript = _backend.recognize(audio.content, audio.config)
+        record.update({
+            "transcript": transcript,
+            "duration": round(audio.duration + audio.trimmed_seconds, 3),
+            "trimmed_seconds": round(audio.trimmed_seconds, 3),
+            "encoding": audio.config.encoding,
+            "sent_as": audio.path,
+        })
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def run(
+    source: Text,
+    output: Text,
+    workers: Optional[int] = None,
+    fake_transcript: Optional[Text] = None,
+    language_code: Text = "en-US",
+    trim: bool = True,
+) -> Dict[Text, Any]:
+    """Transcribe every pending clip from `source`, appending to `output`."""
+    done = load_checkpoint(output)
+    sources = list(iter_sources(source))
+    pending = [path for path in sources if path not in done]
+    # Failed clips tried again leave two records behind unless compacted
+    retried = bool(pending) and os.path.exists(output) and not set(pending).isdisjoint(
+        record["path"] for record in _read_records(output)
+    )
+    summary = {"skipped": len(sources) - len(pending), "clips": 0, "failed": 0, "audio_seconds": 0.0}
+    started = time.perf_counter()
+
+    with open(output, "a", encoding="utf-8") as results, Pool(
+        processes=workers, initializer=_init_worker, initargs=(fake_transcript, language_code, trim),
+    ) as pool:
+        for record in pool.imap_unordered(transcribe_file, pending):
+            results.write(json.dumps(record, ensure_ascii=False) + "\n")
+            # Flushed per clip so an interrupted run resumes where it stopped
+            results.flush()
+            if "error" in record:
+                summary["failed"] += 1
+                print(f"Failed {record['path']}: {record['error']}", file=sys.stderr)
+            else:
+                summary["clips"] += 1
+                summary["audio_seconds"] += record["duration"]
+    if retried:
+        compact(output)
+
+    elapsed = time.perf_counter() - started
+    summary["elapsed"] = elapsed
+    summary["clips_per_second"] = summary["clips"] / elapsed if elapsed else 0.0
+    summary["audio_seconds_per_second"] = summary["audio_seconds"] / elapsed if elapsed else 0.0
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory of audio files, or a manifest listing them")
+    parser.add_argument("--output", default="transcripts.jsonl", help="JSONL results file, also the checkpoint")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--language", default="en-US")
+    parser.add_argument("--no-trim", action="store_true", help="send silence as well")
+    parser.add_argument("--fake", metavar="TRANSCRIPT", help="use an offline fake recognizer")
+    args = parser.parse_args()
+
+    summary = run(args.source, args.output, args.workers, args.fake, args.language, not args.no_trim)
+    print(f"clips:               {summary['clips']:8d}  ({summary['skipped']} already done, {summary['failed']} failed)")
+    print(f"elapsed:             {summary['elapsed']:8.2f} s")
+    print(f"throughput:          {summary['clips_per_second']:8.2f} clips/s")
+    print(f"audio throughput:    {summary['audio_seconds_per_second']:8.2f} audio s/s")
+
+
+if __name__ == "__main__":
+    main()
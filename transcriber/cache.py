@@ -0,0 +1,96 @@
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Text, Tuple
+
+from .audio import BytesLike
+
+
+def audio_key(content: BytesLike, *config: Any) -> Text:
+    """Content hash of audio bytes plus whatever else changes the result
+    (encoding, sample rate, language)."""
+    digest = hashlib.blake2b(content, digest_size=16)
+    digest.update(repr(config).encode())
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """Transcripts by audio hash: an LRU of `maxsize` entries in memory,
+    backed by an SQLite file at `path` when given.
+
+    Empty results (silence, noise) are cached too, as None; they cost a
+    recognition call just the same.
+    """
+
+    def __init__(self, maxsize: int = 2048, path: Optional[Text] = None):
+        self.maxsize = maxsize
+        self.path = path
+        self._entries: "OrderedDict[Text, Optional[Text]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path:
+            self._connection().execute(
+                "CREATE TABLE IF NOT EXISTS transcripts (key TEXT PRIMARY KEY, text TEXT) WITHOUT ROWID"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def lookup(self, key: Text) -> Tuple[bool, Optional[Text]]:
+        """`(found, transcript)`; the transcript may be None when found."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+        if self.path:
+            row = self._connection().execute("SELECT text FROM transcripts WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._remember(key, row[0])
+                with self._lock:
+                    self.disk_hits += 1
+                return True, row[0]
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def store(self, key: Text, transcript: Optional[Text]) -> None:
+        self._remember(key, transcript)
+        if self.path:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO transcripts (key, text) VALUES (?, ?)", (key, transcript)
+            )
+
+    def _remember(self, key: Text, transcript: Optional[Text]) -> None:
+        with self._lock:
+            self._entries[key] = transcript
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.path:
+            self._connection().execute("DELETE FROM transcripts")
+
+    def stats(self) -> Dict[Text, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
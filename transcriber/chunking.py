@@ -0,0 +1,129 @@
+import re
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Text, Tuple
+
+import numpy as np
+
+from .audio import BytesLike, PCMAudio, PreparedAudio, decode_to_pcm
+from .backends import AudioConfig
+from .vad import frame_features
+
+# Synchronous recognition takes about a minute of audio; stay under it
+MAX_CHUNK_SECONDS = 50.0
+
+_WORD = re.compile(r"[\w']+")
+
+
+def plan_chunks(
+    audio: PCMAudio,
+    max_seconds: float = MAX_CHUNK_SECONDS,
+    overlap_seconds: float = 1.0,
+    search_seconds: float = 10.0,
+    frame_ms: int = 20,
+) -> List[Tuple[int, int]]:
+    """Sample ranges `[start, end)` covering `audio` in chunks of at most
+    `max_seconds` plus overlap.
+
+    Each cut is placed at the quietest frame in the last `search_seconds`
+    before the limit, so it normally falls in a pause; neighbouring chunks
+    then share `overlap_seconds` either side of the cut in case it did
+    split a word. `max_seconds` has to exceed twice the overlap, or the
+    cuts could not move forward.
+    """
+    if max_seconds <= 2 * overlap_seconds:
+        raise ValueError(f"max_seconds ({max_seconds}) must exceed twice overlap_seconds ({overlap_seconds})")
+    # A dangling odd byte is half a sample; int16 views need whole ones
+    samples = np.frombuffer(audio.data[:len(audio.data) & ~1], dtype="<i2")
+    rate = audio.sample_rate
+    limit = int(max_seconds * rate)
+    if len(samples) <= limit:
+        return [(0, len(samples))]
+
+    frame_length = max(1, rate * frame_ms // 1000)
+    energy_db, _ = frame_features(samples, frame_length)
+    overlap = int(overlap_seconds * rate)
+    search = max(1, int(search_seconds * 1000 / frame_ms))
+
+    cuts = []
+    start = 0
+    while len(samples) - start > limit:
+        # Leave room for the overlap on both sides of the cut
+        last_frame = (start + limit - overlap) // frame_length
+        first_frame = max(start // frame_length + 1, last_frame - search)
+        window = energy_db[first_frame:last_frame]
+        cut = (first_frame + int(np.argmin(window))) * frame_length if len(window) else start + limit - overlap
+        cuts.append(cut)
+        start = cut
+
+    bounds = [0] + cuts + [len(samples)]
+    return [
+        (max(0, bounds[i] - overlap) if i else 0, min(len(samples), bounds[i + 1] + overlap))
+        for i in range(len(bounds) - 1)
+    ]
+
+
+def stitch(transcripts: Sequence[Optional[Text]], max_overlap_words: int = 12) -> Text:
+    """Join chunk transcripts, dropping words repeated across a boundary.
+
+    The longest run of words (up to `max_overlap_words`) that ends one
+    transcript and starts the next, compared case- and punctuation-
+    insensitively, is kept only once.
+    """
+    words: List[Text] = []
+    for transcript in transcripts:
+        if not transcript:
+            continue
+        incoming = transcript.split()
+        keys = [" ".join(_WORD.findall(word.lower())) for word in incoming]
+        tail = [" ".join(_WORD.findall(word.lower())) for word in words[-max_overlap_words:]]
+        shared = 0
+        for size in range(min(len(tail), len(keys)), 0, -1):
+            if tail[-size:] == keys[:size]:
+                shared = size
+                break
+        words.extend(incoming[shared:])
+    return " ".join(words)
+
+
+def transcribe_chunked(
+    audio: PCMAudio,
+    recognize: Callable[[PCMAudio], Optional[Text]],
+    executor: Optional[Executor] = None,
+    **plan_options,
+) -> Optional[Text]:
+    """Recognize the chunks of `audio` concurrently and stitch the results.
+
+    `recognize` is called once per chunk, possibly from several threads at
+    once. Without an `executor`, one thread per chunk is used.
+    """
+    chunks = [
+        PCMAudio(audio.data[start * 2:end * 2], audio.sample_rate)
+        for start, end in plan_chunks(audio, **plan_options)
+    ]
+    if len(chunks) == 1:
+        return recognize(chunks[0])
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=len(chunks), thread_name_prefix="transcribe-chunk") as pool:
+            transcripts = list(pool.map(recognize, chunks))
+    else:
+        transcripts = list(executor.map(recognize, chunks))
+    return stitch(transcripts) or None
+
+
+def transcribe_long(
+    content: BytesLike,
+    audio_format: Optional[Text],
+    audio: PreparedAudio,
+    recognize: Callable[[BytesLike, AudioConfig], Optional[Text]],
+    executor: Optional[Executor] = None,
+    max_seconds: float = MAX_CHUNK_SECONDS,
+) -> Optional[Text]:
+    """`transcribe_chunked` for a prepared clip; `content` is the original
+    file, which long compressed clips are decoded from since chunks have
+    to be cut from samples."""
+    if audio.config.encoding == "LINEAR16":
+        pcm = PCMAudio(memoryview(audio.content), audio.config.sample_rate_hertz)
+    else:
+        pcm = decode_to_pcm(content, audio_format)
+    config = AudioConfig("LINEAR16", pcm.sample_rate, audio.config.language_code)
+    return transcribe_chunked(pcm, lambda chunk: recognize(chunk.data, config), executor, max_seconds=max_seconds)
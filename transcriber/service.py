@@ -0,0 +1,270 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Text
+
+from .audio import BytesLike, prepare_audio
+from .backends import AudioConfig, GoogleRecognizer, RecognizerBackend
+from .cache import TranscriptionCache, audio_key
+from .chunking import MAX_CHUNK_SECONDS, transcribe_long
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("queue", "prepare", "recognize", "total")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class TranscriptionService:
+    """Transcribes many clips concurrently with long-lived recognizer clients.
+
+    `workers` threads each borrow one of `workers` pooled backends, so
+    clients (and their gRPC channels and credentials) are built once. At
+    most `max_queue` jobs wait behind the running ones; past that `submit`
+    blocks for up to `block_timeout` seconds and then raises `QueueFull`.
+    A job still waiting when its deadline passes is dropped with
+    `DeadlineExceeded`; a running one gets the remaining time as its
+    recognizer timeout.
+
+    With a `cache`, a clip seen before is answered without queueing: first
+    by a hash of the bytes as received, then, after decoding, by a hash of
+    the audio actually sent plus its config, which also catches the same
+    audio re-wrapped in a different file.
+
+    Clips longer than `max_chunk_seconds` are split at pauses and the
+    pieces recognized in parallel on the same backend pool.
+    """
+
+    def __init__(
+        self,
+        backend_factory: Callable[[], RecognizerBackend] = GoogleRecognizer,
+        workers: int = 4,
+        max_queue: int = 32,
+        deadline: float = 30.0,
+        block_timeout: Optional[float] = 1.0,
+        language_code: Text = "en-US",
+        timing_window: int = 1024,
+        cache: Optional[TranscriptionCache] = None,
+        trim_silence: bool = True,
+        max_chunk_seconds: float = MAX_CHUNK_SECONDS,
+    ):
+        self.deadline = deadline
+        self.max_chunk_seconds = max_chunk_seconds
+        self.trim_silence = trim_silence
+        self.cache = cache
+        self.block_timeout = block_timeout
+        self.language_code = language_code
+        self._backend_factory = backend_factory
+        self._backends: "queue.LifoQueue[RecognizerBackend]" = queue.LifoQueue()
+        self._backends_created = 0
+        self._max_backends = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcribe")
+        self._chunk_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcribe-chunk")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self.counters = {"completed": 0, "cached": 0, "failed": 0, "expired": 0, "rejected": 0}
+        self._timings = {stage: deque(maxlen=timing_window) for stage in STAGES}
+
+    def _borrow_backend(self, expires: float) -> RecognizerBackend:
+        try:
+            return self._backends.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._backends_created < self._max_backends
+            if create:
+                self._backends_created += 1
+        if create:
+            try:
+                return self._backend_factory()
+            except BaseException:
+                with self._lock:
+                    self._backends_created -= 1
+                raise
+        try:
+            return self._backends.get(timeout=max(expires - time.monotonic(), 0.0))
+        except queue.Empty:
+            raise DeadlineExceeded("Deadline passed while waiting for a recognizer") from None
+
+    def submit(
+        self,
+        content: BytesLike,
+        audio_format: Optional[Text] = None,
+        deadline: Optional[float] = None,
+        language_code: Optional[Text] = None,
+    ) -> Future:
+        """Queue a clip; the future resolves to the transcript (or None)."""
+        language_code = language_code or self.language_code
+        raw_key = None
+        if self.cache is not None:
+            raw_key = audio_key(content, language_code)
+            found, transcription = self.cache.lookup(raw_key)
+            if found:
+                self._count("cached")
+                future: Future = Future()
+                future.set_result(transcription)
+                return future
+
+        if not self._slots.acquire(timeout=self.block_timeout):
+            with self._lock:
+                self.counters["rejected"] += 1
+            raise QueueFull(f"Transcription queue is full ({self._queued} waiting)")
+
+        submitted = time.monotonic()
+        expires = submitted + (self.deadline if deadline is None else deadline)
+        with self._lock:
+            self._queued += 1
+        try:
+            future = self._executor.submit(
+                self._run, content, audio_format, language_code, raw_key, submitted, expires,
+            )
+        except BaseException:
+            with self._lock:
+                self._queued -= 1
+            self._slots.release()
+            raise
+        future.add_done_callback(self._job_done)
+        return future
+
+    def _job_done(self, future: Future) -> None:
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+        self._slots.release()
+
+    def _run(
+        self,
+        content: BytesLike,
+        audio_format: Optional[Text],
+        language_code: Text,
+        raw_key: Optional[Text],
+        submitted: float,
+        expires: float,
+    ) -> Optional[Text]:
+        started = time.monotonic()
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            if started >= expires:
+                raise DeadlineExceeded(f"Job waited {started - submitted:.2f}s, past its deadline")
+            audio = prepare_audio(content, audio_format, language_code, trim=self.trim_silence)
+            prepared = time.monotonic()
+            if prepared >= expires:
+                raise DeadlineExceeded("Deadline passed while preparing audio")
+
+            key = None
+            if self.cache is not None:
+                key = audio_key(audio.content, audio.config)
+                found, transcription = self.cache.lookup(key)
+                if found:
+                    self.cache.store(raw_key, transcription)
+                    self._count("cached")
+                    return transcription
+
+            if audio.duration > self.max_chunk_seconds:
+                transcription = transcribe_long(
+                    content, audio_format, audio,
+                    lambda chunk, config: self._recognize(chunk, config, expires),
+                    self._chunk_executor, self.max_chunk_seconds,
+                )
+            else:
+                transcription = self._recognize(audio.content, audio.config, expires)
+            finished = time.monotonic()
+            if self.cache is not None:
+                self.cache.store(key, transcription)
+                self.cache.store(raw_key, transcription)
+        except DeadlineExceeded:
+            self._count("expired")
+            raise
+        except Exception:
+            self._count("failed")
+            logger.exception("Transcription failed")
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+
+        with self._lock:
+            self.counters["completed"] += 1
+            for stage, seconds in zip(STAGES, (
+                started - submitted, prepared - started, finished - prepared, finished - submitted,
+            )):
+                self._timings[stage].append(seconds)
+        return transcription
+
+    def _recognize(self, content: BytesLike, config: AudioConfig, expires: float) -> Optional[Text]:
+        backend = self._borrow_backend(expires)
+        try:
+            return backend.recognize(content, config, timeout=max(expires - time.monotonic(), 0.1))
+        finally:
+            self._backends.put(backend)
+
+    def _count(self, counter: Text) -> None:
+        with self._lock:
+            self.counters[counter] += 1
+
+    def transcribe(self, content: BytesLike, audio_format: Optional[Text] = None,
+                   deadline: Optional[float] = None, language_code: Optional[Text] = None) -> Optional[Text]:
+        return self.submit(content, audio_format, deadline, language_code).result()
+
+    async def transcribe_async(self, content: BytesLike, audio_format: Optional[Text] = None,
+                               deadline: Optional[float] = None, language_code: Optional[Text] = None) -> Optional[Text]:
+        # Waiting for a queue slot blocks, so do it off the event loop
+        loop = asyncio.get_running_loop()
+        future = await loop.run_in_executor(None, self.submit, content, audio_format, deadline, language_code)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[Text, Any]:
+        with self._lock:
+            stats: Dict[Text, Any] = {
+                "queue_depth": self._queued,
+                "running": self._running,
+                "backends": self._backends_created,
+                **self.counters,
+            }
+            if self.cache is not None:
+                stats["cache"] = self.cache.stats()
+            for stage, samples in self._timings.items():
+                ordered = sorted(samples)
+                stats[f"{stage}_p50_ms"] = _percentile(ordered, 0.50) * 1000
+                stats[f"{stage}_p95_ms"] = _percentile(ordered, 0.95) * 1000
+        return stats
+
+    def close(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+        self._chunk_executor.shutdown(wait=wait)
+
+
+def _percentile(ordered, fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+_service: Optional[TranscriptionService] = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> TranscriptionService:
+    """Return the process-wide transcription service. Transcripts are also
+    kept on disk when $TRANSCRIPTION_CACHE_DB names an SQLite file."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = TranscriptionService(cache=TranscriptionCache(path=os.getenv("TRANSCRIPTION_CACHE_DB")))
+    return _service
@@ -1,36 +1,50 @@
-from google.cloud import speech_v1p1beta1 as speech
-from pydub import AudioSegment
+import asyncio
 import os
+import threading
+import time
+import wave
+from typing import AsyncIterator, Iterable, Iterator, Optional, Union
 
-def transcribe_audio(file_path):
+from .audio import BytesLike, prepare_audio
+from .backends import AudioConfig, GoogleRecognizer, Hypothesis, RecognizerBackend
+from .service import get_service
+
+# About 85 ms of 48 kHz 16-bit mono audio per streaming request
+DEFAULT_CHUNK_SIZE = 8192
+
+AudioSource = Union[str, bytes, Iterable[bytes]]
+
+
+def transcribe_audio(file_path, backend: Optional[RecognizerBackend] = None):
+    """Transcribe an audio file. The file is only read, never modified or
+    removed; conversion happens in memory."""
+    print(f"Transcribing audio from: {file_path}")
     try:
-        print(f"Transcribing audio from: {file_path}")
-        
-        # Convert OGG to WAV
-        if file_path.endswith(".ogg"):
-            wav_path = file_path.replace(".ogg", ".wav")
-            audio = AudioSegment.from_ogg(file_path)
-            audio = audio.set_sample_width(2)  # Set sample width to 16 bits
-            audio.export(wav_path, format="wav")
-            file_path = wav_path  # Update file path to the new WAV file
-
-        # Initialize Google Speech-to-Text client
-        client = speech.SpeechClient()
         with open(file_path, "rb") as audio_file:
             audio_content = audio_file.read()
-        
-        # Configure recognition settings
-        audio = speech.RecognitionAudio(content=audio_content)
-        config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-            sample_rate_hertz=48000,
-            language_code="en-US",
-        )
-
-        # Send audio to Google Speech-to-Text
-        response = client.recognize(config=config, audio=audio)
-        if response.results:
-            transcription = response.results[0].alternatives[0].transcript
+    except OSError as e:
+        print(f"Error during transcription: {e}")
+        return None
+    return transcribe_bytes(audio_content, os.path.splitext(file_path)[1][1:].lower() or None, backend)
+
+
+def transcribe_bytes(
+    content: BytesLike,
+    audio_format: Optional[str] = None,
+    backend: Optional[RecognizerBackend] = None,
+    language_code: str = "en-US",
+):
+    """Transcribe audio held in memory; `audio_format` is e.g. "ogg" or "wav"."""
+    try:
+        if backend is None:
+            # Pooled Google clients, bounded concurrency
+            transcription = get_service().transcribe(content, audio_format, language_code=language_code)
+        else:
+            # Send compressed audio as-is when the recognizer supports it,
+            # otherwise decode to LINEAR16 at the clip's own sample rate
+            audio = prepare_audio(content, audio_format, language_code)
+            transcription = backend.recognize(audio.content, audio.config)
+        if transcription:
             print(f"Transcription result: {transcription}")
             return transcription
         else:
@@ -39,7 +53,135 @@ def transcribe_audio(file_path):
     except Exception as e:
         print(f"Error during transcription: {e}")
         return None
+
+
+def _is_ogg_opus(path: str) -> bool:
+    """Whether the file's first Ogg page holds an OpusHead packet (and not,
+    say, a Vorbis header)."""
+    with open(path, "rb") as audio_file:
+        page = audio_file.read(27 + 255 + 8)
+    if len(page) < 27 or page[0:4] != b"OggS":
+        return False
+    head = 27 + page[26]
+    return page[head:head + 8] == b"OpusHead"
+
+
+def config_for_path(path: str, language_code: str = "en-US") -> AudioConfig:
+    """Streaming config for a file, sent as-is: WAV is LINEAR16 at its own
+    rate, OGG/Opus voice notes are OGG_OPUS at 48 kHz. Other Ogg codecs
+    (Vorbis) are rejected, as the recognizer cannot stream them."""
+    if path.endswith(".wav"):
+        with wave.open(path, "rb") as wav:
+            return AudioConfig("LINEAR16", wav.getframerate(), language_code)
+    if path.endswith((".ogg", ".opus")):
+        if not _is_ogg_opus(path):
+            raise ValueError(
+                f"Cannot stream {path}: only Ogg Opus can be streamed as-is; "
+                f"transcribe it whole or convert it to Opus, WAV or FLAC first"
+            )
+        return AudioConfig("OGG_OPUS", 48000, language_code)
+    if path.endswith(".flac"):
+        return AudioConfig("FLAC", 0, language_code)
+    raise ValueError(f"Cannot stream {path}: unsupported audio format")
+
+
+def iter_chunks(source: AudioSource, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Split a path or a bytes object into chunks; an iterable of chunks
+    (audio still arriving) is passed through."""
+    if isinstance(source, str):
+        with open(source, "rb") as audio_file:
+            while True:
+                chunk = audio_file.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for offset in range(0, len(view), chunk_size):
+            yield view[offset:offset + chunk_size]
+    else:
+        yield from source
+
+
+def stream_transcription(
+    source: AudioSource,
+    config: Optional[AudioConfig] = None,
+    backend: Optional[RecognizerBackend] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[Hypothesis]:
+    """Send audio to the recognizer chunk by chunk and yield interim and
+    final hypotheses as they come back.
+
+    `source` is a file path, the audio bytes, or an iterable yielding chunks
+    as they are received. `config` is required unless `source` is a path.
+    """
+    if config is None:
+        if not isinstance(source, str):
+            raise ValueError("An AudioConfig is required unless streaming from a file")
+        config = config_for_path(source)
+    backend = backend or GoogleRecognizer()
+
+    started = time.perf_counter()
+    for hypothesis in backend.streaming_recognize(iter_chunks(source, chunk_size), config):
+        yield hypothesis._replace(elapsed=time.perf_counter() - started)
+
+
+async def astream_transcription(
+    source: AudioSource,
+    config: Optional[AudioConfig] = None,
+    backend: Optional[RecognizerBackend] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> AsyncIterator[Hypothesis]:
+    """`stream_transcription` for async callers. The blocking recognizer
+    stream runs in a thread and hands hypotheses over through a queue.
+
+    When the consumer stops early (breaks, is cancelled or closes the
+    iterator) the thread stops sending audio and closes the stream.
+    """
+    if config is None:
+        if not isinstance(source, str):
+            raise ValueError("An AudioConfig is required unless streaming from a file")
+        config = config_for_path(source)
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+    stop = threading.Event()
+
+    def chunks():
+        for chunk in iter_chunks(source, chunk_size):
+            if stop.is_set():
+                return
+            yield chunk
+
+    def post(item):
+        if stop.is_set():
+            return
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            stop.set()  # the loop is closed, nobody is listening
+
+    def pump():
+        hypotheses = stream_transcription(chunks(), config, backend, chunk_size)
+        try:
+            for hypothesis in hypotheses:
+                if stop.is_set():
+                    break
+                post(hypothesis)
+        except Exception as e:
+            post(e)
+        finally:
+            hypotheses.close()
+            post(done)
+
+    threading.Thread(target=pump, name="transcription-stream", daemon=True).start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
     finally:
-        # Clean up temporary files
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        stop.set()
@@ -0,0 +1,93 @@
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+
+from .audio import PCMAudio
+
+
+class TrimResult(NamedTuple):
+    audio: PCMAudio
+    removed_seconds: float
+    segments: List[Tuple[float, float]]  # speech (start, end) in the original, seconds
+
+
+def frame_features(samples: np.ndarray, frame_length: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-frame energy (dBFS) and zero-crossing rate of int16 samples."""
+    count = len(samples) // frame_length
+    frames = samples[:count * frame_length].reshape(count, frame_length).astype(np.float32) / 32768.0
+    energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame_length
+    return energy_db, zcr
+
+
+def speech_mask(
+    samples: np.ndarray,
+    sample_rate: int,
+    frame_ms: int = 20,
+    threshold_db: float = 12.0,
+    floor_db: float = -55.0,
+    zcr_threshold: float = 0.25,
+    hangover_ms: int = 200,
+) -> Tuple[np.ndarray, int]:
+    """Boolean speech flag per frame, and the frame length in samples.
+
+    Voiced frames stand `threshold_db` above the noise floor (10th percentile
+    of frame energy) or within 25 dB of the loudest frame. Quieter frames
+    with a high zero-crossing rate count as unvoiced speech ("s", "f").
+    Frames below `floor_db` are never speech. Flags are extended by
+    `hangover_ms` either side so word edges survive.
+    """
+    frame_length = max(1, sample_rate * frame_ms // 1000)
+    energy_db, zcr = frame_features(samples, frame_length)
+    if not len(energy_db):
+        return np.zeros(0, dtype=bool), frame_length
+
+    noise_floor = np.percentile(energy_db, 10)
+    audible = energy_db > floor_db
+    voiced = (energy_db > noise_floor + threshold_db) | (energy_db > energy_db.max() - 25.0)
+    unvoiced = (energy_db > noise_floor + threshold_db / 2) & (zcr > zcr_threshold)
+    mask = audible & (voiced | unvoiced)
+
+    hangover = hangover_ms // frame_ms
+    if hangover:
+        mask = np.convolve(mask, np.ones(2 * hangover + 1), mode="same") > 0
+    return mask, frame_length
+
+
+def trim_silence(audio: PCMAudio, max_pause_ms: int = 300, **options) -> TrimResult:
+    """Drop leading/trailing silence and shorten pauses to `max_pause_ms`.
+
+    Returns the original audio untouched when no speech is found, so a
+    quiet clip is still sent rather than silently discarded.
+    """
+    # A dangling odd byte is half a sample; int16 views need whole ones
+    samples = np.frombuffer(audio.data[:len(audio.data) & ~1], dtype="<i2")
+    mask, frame_length = speech_mask(samples, audio.sample_rate, **options)
+    if not mask.any():
+        return TrimResult(audio, 0.0, [])
+
+    # Runs of speech frames as [start, end) frame indexes
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.view(np.int8), [0]))))
+    runs = edges.reshape(-1, 2)
+
+    pause = max_pause_ms * audio.sample_rate // 1000
+    pieces = []
+    previous_end = None
+    for start, end in runs * frame_length:
+        if previous_end is not None:
+            gap = start - previous_end
+            if gap > pause:
+                # Keep the edges of a long pause, drop its middle
+                pieces.append(samples[previous_end:previous_end + pause // 2])
+                pieces.append(samples[start - (pause - pause // 2):start])
+            else:
+                pieces.append(samples[previous_end:start])
+        pieces.append(samples[start:min(end, len(samples))])
+        previous_end = min(end, len(samples))
+
+    trimmed = np.concatenate(pieces)
+    removed = (len(samples) - len(trimmed)) / audio.sample_rate
+    segments = [(start / audio.sample_rate, min(end, len(samples)) / audio.sample_rate)
+                for start, end in runs * frame_length]
+    return TrimResult(PCMAudio(memoryview(trimmed.tobytes()), audio.sample_rate), removed, segments)